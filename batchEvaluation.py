@@ -0,0 +1,182 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# batchEvaluation.py
+
+import chess
+import numpy as np
+from myChess import MyChess
+from evaluation import add_eval, getBoardValue, ADDER_TABLE, PIECE_KEYS
+from endgameBitbases import MAX_PIECES
+from random import Random
+from time import perf_counter
+import sys
+
+# ADDER_TABLE as a (12 * 64) vector, so that a batch of (N, 12 * 64) piece planes can be scored with one dot product
+ADDER_WEIGHTS = np.array(ADDER_TABLE, dtype=np.float32)
+
+# Positions are scored in chunks of this many, which bounds the size of the unpacked planes (and keeps float32 sums
+# exact, since no single position's score comes close to 2 ** 24)
+CHUNK_SIZE = 8192
+
+
+# -----------------------------------------------------------------------------------------------------------
+# Batched Evaluation
+# -----------------------------------------------------------------------------------------------------------
+
+
+# Returns the 12 piece bitboards of the given chess.Board, in the order of evaluation.PIECE_KEYS
+def getPieceBitboards(board):
+    return [board.pieces_mask(piece_type, color) for (piece_type, color) in PIECE_KEYS]
+
+
+# Packs the given chess.Boards into an (N, 12) array of uint64 piece bitboards
+def packBoards(boards):
+    return np.array([getPieceBitboards(board) for board in boards], dtype=np.uint64).reshape(-1, 12)
+
+
+# Unpacks an (N, 12) array of piece bitboards into (N, 12, 64) piece planes, where planes[n, piece, square] is 1 if
+# that piece is on that square in position n
+def unpackBitboards(packed):
+    as_bytes = np.ascontiguousarray(packed, dtype='<u8').view(np.uint8).reshape(-1, 12, 8)
+    return np.unpackbits(as_bytes, axis=-1, bitorder='little')
+
+
+# Returns getBoardValue (material plus Adder bonus, positive for white) for each position in the given (N, 12) array
+# of piece bitboards, as an int64 array of length N
+def batchBitboardValue(packed):
+    values = np.empty(len(packed), dtype=np.int64)
+    for start in range(0, len(packed), CHUNK_SIZE):
+        planes = unpackBitboards(packed[start:start + CHUNK_SIZE]).reshape(-1, 12 * 64)
+        values[start:start + CHUNK_SIZE] = planes.astype(np.float32) @ ADDER_WEIGHTS
+    return values
+
+
+# Returns getBoardValue for each of the given chess.Boards, as an int64 array
+def batchBoardValue(boards):
+    return batchBitboardValue(packBoards(boards))
+
+
+# Returns whether add_eval of the given chess state must be computed on its own rather than in a batch: finished games,
+# and positions with few enough pieces that the endgame bitbases (if any) may override the score
+def needsAddEval(chess_state):
+    if chess_state.node_status().game_over:
+        return True
+    return chess_state.bitbases is not None and chess.popcount(chess_state.board.occupied) <= MAX_PIECES
+
+
+# Returns add_eval for each of the given chess states (MyChess objects) from the given color's point of view, as a
+# list of ints. Finished games and positions the bitbases may cover are scored by add_eval itself (see needsAddEval);
+# the rest are scored together.
+def batchAddEval(chess_states, color):
+    values = [None] * len(chess_states)
+    live_indices = []
+    for (index, chess_state) in enumerate(chess_states):
+        if needsAddEval(chess_state):
+            values[index] = add_eval(chess_state, color)
+        else:
+            live_indices.append(index)
+
+    if live_indices:
+        scores = batchBoardValue([chess_states[index].board for index in live_indices])
+        for (index, score) in zip(live_indices, scores.tolist()):
+            values[index] = score if color else -score
+    return values
+
+
+# Returns add_eval of each of the given FENs from the given color's point of view, as a list of ints
+def batchEvalFens(fens, color=chess.WHITE):
+    return batchAddEval([MyChess(chess.Board(fen)) for fen in fens], color)
+
+
+# Returns add_eval (from the given color's point of view) of the position after each of the given legal moves from
+# the given chess state, as a list of ints. The moves are pushed and popped on chess_state, so it is left unchanged.
+# As in batchAddEval, children that need it are scored by add_eval itself.
+def batchChildValues(chess_state, moves, color):
+    values = [None] * len(moves)
+    live_indices = []
+    packed = np.empty((len(moves), 12), dtype=np.uint64)
+
+    for (index, move) in enumerate(moves):
+        chess_state.push(move)
+        if needsAddEval(chess_state):
+            values[index] = add_eval(chess_state, color)
+        else:
+            packed[len(live_indices)] = getPieceBitboards(chess_state.board)
+            live_indices.append(index)
+        chess_state.pop()
+
+    if live_indices:
+        scores = batchBitboardValue(packed[:len(live_indices)])
+        for (index, score) in zip(live_indices, scores.tolist()):
+            values[index] = score if color else -score
+    return values
+
+
+# -----------------------------------------------------------------------------------------------------------
+# Benchmark
+# -----------------------------------------------------------------------------------------------------------
+
+
+# Returns n positions (as chess.Boards) taken from random games, using the given seed
+def randomPositions(n, seed=0):
+    rng = Random(seed)
+    positions = []
+    board = chess.Board()
+    while len(positions) < n:
+        moves = list(board.legal_moves)
+        if not moves or board.ply() >= 120:
+            board = chess.Board()
+            continue
+        board.push(rng.choice(moves))
+        positions.append(board.copy(stack=False))
+    return positions
+
+
+# Times scoring the same positions one at a time (getBoardValue) and as a batch (batchBoardValue, including packing
+# the bitboards), for each batch size in sizes. Prints and returns a list of
+# (n, per-position positions/sec, batched positions/sec).
+def benchmark(sizes=(1, 32, 1024, 100000), seed=0, min_time=0.5):
+    results = []
+    all_positions = randomPositions(max(sizes), seed)
+    print("{:>8} {:>16} {:>16} {:>8}".format("N", "single pos/s", "batched pos/s", "speedup"))
+
+    for n in sizes:
+        positions = all_positions[:n]
+
+        # Repeat small sizes until min_time has passed, so the timings aren't dominated by timer resolution
+        single_count, start = 0, perf_counter()
+        while True:
+            single_values = [getBoardValue(board) for board in positions]
+            single_count += n
+            single_time = perf_counter() - start
+            if single_time >= min_time:
+                break
+
+        batch_count, start = 0, perf_counter()
+        while True:
+            batch_values = batchBoardValue(positions)
+            batch_count += n
+            batch_time = perf_counter() - start
+            if batch_time >= min_time:
+                break
+
+        if batch_values.tolist() != single_values:
+            raise AssertionError("batched and single evaluations disagree at N = {}".format(n))
+
+        single_rate = single_count / single_time
+        batch_rate = batch_count / batch_time
+        results.append((n, single_rate, batch_rate))
+        print("{:>8} {:>16.0f} {:>16.0f} {:>7.2f}x".format(n, single_rate, batch_rate, batch_rate / single_rate))
+
+    return results
+
+
+# Run with no arguments to benchmark batched vs. single evaluation, or with a file of FENs (one per line) to print
+# the add_eval score (from white's point of view) of each one
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as fen_file:
+            fens = [line.strip() for line in fen_file if line.strip()]
+        for (fen, value) in zip(fens, batchEvalFens(fens)):
+            print("{}\t{}".format(value, fen))
+    else:
+        benchmark()
@@ -3,18 +3,49 @@ from searchAgents import minimaxAgent, alphaBetaPruningAgent, nullMoveAlphaBetaA
 from random import randint
 from evaluation import evaluate, add_eval
 from chessGUI import chessGUI
+from searchLimits import SearchLimits, StopToken
+from threading import Thread
+import argparse
 
 # a class that represents a bot that you can play with
 class chessBot:
-    def __init__(self, chess_state: MyChess= None, bot=None, eval_func=evaluate, depth=1, player_turn: bool=True):
+    # tt is an optional transpositionTable.TranspositionTable for the bot's search to use, and limits is an optional
+    # searchLimits.SearchLimits to bound each of the bot's moves by time or nodes
+    # book is an optional openingBook.OpeningBook that is checked for a move before searching, with book_mode as
+    # its selection mode ("weighted" or "best")
+    # bitbases is an optional endgameBitbases.EndgameBitbases for the bot's search to stop at known endgame results
+    # stats is an optional searchStats.SearchStats that the bot's search fills in on every move; give it a callback
+    # to log or export the statistics of each move
+    # profiler is an optional searchProfiler.SearchProfiler wrapped around every search the bot makes, so that a
+    # whole game can be profiled (save it afterwards with profiler.save)
+    # If ponder is True, the bot thinks during the player's turn (see start_pondering)
+    def __init__(self, chess_state: MyChess= None, bot=None, eval_func=evaluate, depth=1, player_turn: bool=True,
+                 tt=None, limits=None, book=None, book_mode="weighted", bitbases=None, stats=None, profiler=None,
+                 ponder=False):
         if bot is None or player_turn is None:
             raise ValueError("Error: chessBot configuration is invalid: Given bot is None")
 
         self.chess_state = chess_state if chess_state is not None else MyChess()
-        self.bot = bot(self.chess_state, eval_func, depth)
+        self.bot = bot(self.chess_state, eval_func, depth, tt, bitbases=bitbases, stats=stats)
         # self.player_turn represents the color that you (the player) are playing as;
         # the bot will play the opposite color
         self.player_turn = player_turn
+        self.limits = limits
+        self.book = book
+        self.book_mode = book_mode
+        self.profiler = profiler
+        self.ponder = ponder
+        # The StopToken of the bot's current (or last) search, and the thread and result of a search started with
+        # start_search
+        self.search_token = StopToken()
+        self.search_thread = None
+        self.search_move = None
+        # The running (or finished) ponder search: its thread, the StopToken of its reply prediction and search
+        # (which stop_pondering stops), the FEN it expects after the player's move, and the move it found there
+        self.ponder_thread = None
+        self.ponder_token = None
+        self.ponder_fen = None
+        self.ponder_move = None
 
     def get_state(self):
         return self.chess_state
@@ -22,16 +53,143 @@ class chessBot:
     def get_player(self):
         return self.player_turn
 
-    # Makes a move based on the current gamestate and agent. Returns the executed move.
-    def make_move(self):
-        move = self.bot.get_action(self.chess_state)
+    # Makes a move based on the current gamestate and agent, playing from the opening book while the position is in
+    # it. If the bot pondered on the player's move, its result is used; then, if self.ponder, the bot starts pondering
+    # on the player's reply. Returns the executed move.
+    # The search can be stopped from another thread with stop (or with stop_token, a searchLimits.StopToken, if given),
+    # and then plays the best move it has found so far.
+    def make_move(self, stop_token=None):
+        self.search_token = stop_token if stop_token is not None else StopToken()
+        # Every search runs with limits, so that it has a stop token and returns its best move so far when stopped
+        limits = self.limits.copy(self.search_token) if self.limits is not None \
+            else SearchLimits(depth=self.bot.max_depth, stop_token=self.search_token)
+        move = None
+        if self.book is not None:
+            book_move = self.book.choose_move(self.chess_state.board, self.book_mode)
+            move = book_move.uci() if book_move is not None else None
+        if move is None:
+            move = self.finish_pondering()
+        else:
+            self.stop_pondering()
+        if move is None and self.profiler is not None:
+            with self.profiler:
+                move = self.bot.get_action(self.chess_state, limits=limits)
+        elif move is None:
+            move = self.bot.get_action(self.chess_state, limits=limits)
         self.chess_state.execute_move(move)
+        if self.ponder:
+            self.start_pondering()
         return move
 
-def main():
+    # Starts make_move in a background thread, so that the caller stays responsive while the bot thinks. Check
+    # is_searching to see if it is done, and get the move with wait_for_move; stop ends the search early.
+    def start_search(self):
+        self.search_move = None
+        self.search_token = StopToken()
+        self.search_thread = Thread(target=self.run_search, args=(self.search_token,), daemon=True)
+        self.search_thread.start()
+
+    # Body of the search thread started by start_search
+    def run_search(self, stop_token):
+        self.search_move = self.make_move(stop_token)
+
+    # Returns whether a search started with start_search is still running
+    def is_searching(self):
+        return self.search_thread is not None and self.search_thread.is_alive()
+
+    # Waits for the search started with start_search to finish (stopping it after timeout seconds, if given), and
+    # returns the move it made
+    def wait_for_move(self, timeout=None):
+        if self.search_thread is None:
+            return self.search_move
+        self.search_thread.join(timeout)
+        if self.search_thread.is_alive():
+            self.stop()
+            self.search_thread.join()
+        self.search_thread = None
+        return self.search_move
+
+    # Stops the bot's current search (which then plays the best move it has found so far) and any pondering, without
+    # waiting for them to end. Safe to call from any thread, at any time.
+    def stop(self):
+        self.search_token.stop()
+        # Read once, since the ponder thread may be replaced while this runs
+        ponder_token = self.ponder_token
+        if ponder_token is not None:
+            ponder_token.stop()
+
+    # Starts pondering in a background thread, while it is the player's turn: the bot predicts the player's move (with
+    # a search one ply shallower than its own), and searches the position after it as it would on its turn.
+    # Only one search runs at a time, and the bot's agent must not be used elsewhere until make_move or
+    # stop_pondering is called.
+    def start_pondering(self):
+        self.stop_pondering()
+        if self.chess_state.is_game_over():
+            return
+
+        # Search as deep (or for as many nodes) as a normal move, but without the time limit: the player's thinking
+        # time is the limit, and a ponder hit gets the time limit from then on (see finish_pondering)
+        depth = self.bot.max_depth
+        nodes = None
+        if self.limits is not None:
+            depth = self.limits.get_max_depth(self.bot.max_depth)
+            nodes = self.limits.nodes
+        predict_depth = max(1, min(depth, self.bot.max_depth) - 1)
+        self.ponder_token = StopToken()
+        self.ponder_thread = Thread(target=self.ponder_search, daemon=True,
+                                    args=(MyChess(self.chess_state.board.copy()),
+                                          SearchLimits(depth=predict_depth, stop_token=self.ponder_token),
+                                          SearchLimits(depth=depth, nodes=nodes, stop_token=self.ponder_token)))
+        self.ponder_thread.start()
+
+    # Body of the ponder thread: predicts the player's move from the given state with predict_limits, then searches
+    # the resulting position with search_limits
+    def ponder_search(self, ponder_state, predict_limits, search_limits):
+        reply = self.bot.get_action(ponder_state, limits=predict_limits)
+        ponder_state.execute_move(reply)
+        if search_limits.stop_token.stopped or ponder_state.is_game_over():
+            return
+        self.ponder_fen = ponder_state.board.fen()
+        self.ponder_move = self.bot.get_action(ponder_state, limits=search_limits)
+
+    # Stops the ponder search, if any, and waits for it to end
+    def stop_pondering(self):
+        if self.ponder_thread is None:
+            return
+        self.ponder_token.stop()
+        self.ponder_thread.join()
+        self.ponder_thread = None
+        self.ponder_token = None
+        self.ponder_fen = None
+        self.ponder_move = None
+
+    # Returns the ponder search's move if the player made the predicted move (a ponder hit), or None otherwise (a miss,
+    # whose search is stopped). On a hit, a search that is still running continues, for up to the bot's time limit if
+    # it has one, or else until it finishes.
+    def finish_pondering(self):
+        if self.ponder_thread is None:
+            return None
+        if self.ponder_fen != self.chess_state.board.fen():
+            self.stop_pondering()
+            return None
+
+        if self.limits is not None and self.limits.movetime is not None:
+            self.ponder_thread.join(self.limits.movetime)
+            self.ponder_token.stop()
+        self.ponder_thread.join()
+        move = self.ponder_move
+        self.stop_pondering()
+        return move
+
+# Usage:
+#   python chessBot.py [--ponder]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play against the bot")
+    parser.add_argument("--ponder", action="store_true", help="let the bot think during your turn")
+    args = parser.parse_args(argv)
     white, black = True, False
 
-    chess_bot = chessBot(MyChess(), quietSearch, add_eval, 2, white)
+    chess_bot = chessBot(MyChess(), quietSearch, add_eval, 2, white, ponder=args.ponder)
     #gui = chessGUI.twoPlayerChessGUI()
 
     gui = chessGUI.onePlayerChessGUI(chess_bot)
@@ -1,8 +1,6 @@
 import pygame
 from myChess import MyChess
 from os import path
-from threading import Thread
-from queue import Queue
 
 
 # A class for a rudimentary GUI.
@@ -119,32 +117,40 @@ class chessGUI:
             pygame.time.wait(1500)
             self.update_GUI_with_move(bot_move)
             pygame.display.update()
+        # Otherwise, a pondering bot starts thinking while the player makes the first move (after its own moves,
+        # make_move starts pondering by itself)
+        elif self.chess_bot is not None and self.chess_bot.ponder:
+            self.chess_bot.start_pondering()
 
-        # Threads are used here since asking the bot to make a move takes a long time, and waiting to draw the move
-        # on the GUI causes lag and an incorrect image.
-        bot_move_q = Queue()
-        bot_move_thread = None
+        # The bot searches in a background thread (see chessBot.start_search) since asking the bot to make a move takes
+        # a long time, and waiting to draw the move on the GUI causes lag and an incorrect image.
+        bot_searching = False
 
         while True:
 
             # Check if it's the bot's turn. If so, let the bot execute its move, and update the GUI.
             if self.is_bot_move and (self.chess_bot is not None) and (not self.chess_state.is_game_over()):
-                # bot_move = self.chess_bot.make_move()
-                if bot_move_thread is None:
-                    bot_move_thread = Thread(target=self.get_bot_move, args=(bot_move_q,))
-                    bot_move_thread.start()
+                if not bot_searching:
+                    self.chess_bot.start_search()
+                    bot_searching = True
 
-                # On future frames, check if the thread is still running. If so, continue to the next iteration. If
+                # On future frames, check if the search is still running. If so, continue to the next iteration. If
                 # not, retrieve the move that the bot performed, and update the GUI.
-                elif not bot_move_thread.is_alive():
-                    bot_move_thread.join()
-                    bot_move = bot_move_q.get()
+                elif not self.chess_bot.is_searching():
+                    bot_move = self.chess_bot.wait_for_move()
                     self.update_GUI_with_move(bot_move)
                     self.play_sound(chessGUI.P_MVMT)
                     self.is_bot_move = False
-                    bot_move_thread = None
+                    bot_searching = False
                     pygame.display.update()
 
+                # Closing the window stops the search instead of waiting for it to finish
+                if pygame.event.get(pygame.QUIT):
+                    self.chess_bot.stop()
+                    self.chess_bot.wait_for_move()
+                    pygame.quit()
+                    return
+
                 # Skip event processing in for loop below, so the bot and GUI can update on this tick
                 pygame.event.pump()
                 continue
@@ -201,6 +207,10 @@ class chessGUI:
                         # print(self.chess_state)
 
                 elif event.type == pygame.QUIT:
+                    # Don't leave the bot pondering in the background
+                    if self.chess_bot is not None:
+                        self.chess_bot.stop()
+                        self.chess_bot.stop_pondering()
                     pygame.quit()
                     return
 
@@ -359,10 +369,6 @@ class chessGUI:
         else:
             return None
 
-    # Tells the bot to make it's move, and stores the move inside of return_val, which should be a queue.Queue
-    def get_bot_move(self, return_q: Queue):
-        return_q.put(self.chess_bot.make_move())
-
     # Given an pos in the form of (file, rank), converts it to screen coordinates.
     def file_rank_to_screen_pos(self, pos):
         xx, yy, = pos
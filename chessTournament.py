@@ -1,28 +1,300 @@
 # Authors: Drake Moore, John Lam, Nathan Cheng
-# chessbot.py
+# chessTournament.py
 
+import chess
+import chess.pgn
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from evaluation import add_eval, evaluate
 from myChess import MyChess
-from chessBot import chessBot
-from searchAgents import alphaBetaPruningAgent, minimaxAgent, quietSearch, nullMoveAlphaBetaAgent
+from searchAgents import minimaxAgent, alphaBetaPruningAgent, principalVariationAgent, quietSearch, \
+    nullMoveAlphaBetaAgent
+from searchLimits import SearchLimits
+from searchProfiler import SearchProfiler, MODES, EXTENSIONS, DEFAULT_INTERVAL, pstatsCategories, \
+    collapsedCategories, readCollapsed, printCategories
+from math import log10, sqrt
+import argparse
+import os
+import pstats
+import random
+import sys
 
-chess_state = MyChess()
-whiteBot = chessBot(chess_state, quietSearch, add_eval, 4, True)
-blackBot = chessBot(chess_state, alphaBetaPruningAgent, add_eval, 4, False)
+# The agents and evaluation functions that can be named in a player spec (see parse_player)
+AGENTS = {
+    "minimax": minimaxAgent,
+    "alphabeta": alphaBetaPruningAgent,
+    "pvs": principalVariationAgent,
+    "quiet": quietSearch,
+    "nullmove": nullMoveAlphaBetaAgent,
+}
+EVAL_FUNCS = {
+    "add_eval": add_eval,
+    "evaluate": evaluate,
+}
 
+# Opening lines (as space separated UCI moves) the games start from. Each opening is played twice, once with each
+# player as white, so that neither player gets the better side of more openings.
+OPENINGS = [
+    "",
+    "e2e4 e7e5 g1f3 b8c6",
+    "e2e4 c7c5 g1f3 d7d6",
+    "e2e4 e7e6 d2d4 d7d5",
+    "e2e4 c7c6 d2d4 d7d5",
+    "d2d4 d7d5 c2c4 e7e6",
+    "d2d4 g8f6 c2c4 g7g6",
+    "d2d4 g8f6 c2c4 e7e6",
+    "c2c4 e7e5 b1c3 g8f6",
+    "g1f3 d7d5 g2g3 g8f6",
+]
 
-movenum = 0
-while True:
-    if chess_state.is_game_over():
-        break
+# Games still going after this many plies are scored as draws
+MAX_PLIES = 300
 
-    whiteBot.make_move()
-    if chess_state.is_game_over():
-        break
-    blackBot.make_move()
-    movenum += 1
-    print("Move {0}".format(movenum))
-    print(chess_state.get_pgn())
 
-print(chess_state.board.outcome())
-print(chess_state.get_pgn())
+# One side of a match: which agent to search with, its evaluation function and depth, and an optional time limit
+# (in seconds) per move. name is used when printing results.
+class Player():
+    def __init__(self, name, agent=alphaBetaPruningAgent, eval_func=add_eval, depth=3, movetime=None):
+        self.name = name
+        self.agent = agent
+        self.eval_func = eval_func
+        self.depth = depth
+        self.movetime = movetime
+
+    # Builds an agent for this player to play the given game with
+    def make_agent(self, chess_state: MyChess):
+        return self.agent(chess_state, self.eval_func, self.depth)
+
+    # Returns the search limits for one move, or None to search to self.depth
+    def make_limits(self):
+        if self.movetime is None:
+            return None
+        return SearchLimits(depth=self.depth, movetime=self.movetime)
+
+
+# Parses a player spec of the form "agent[:depth[:eval]]" (e.g. "quiet:4" or "alphabeta:3:evaluate") into a Player.
+# agent is a key of AGENTS and eval is a key of EVAL_FUNCS (add_eval if not given).
+def parse_player(spec, movetime=None):
+    parts = spec.split(":")
+    if parts[0] not in AGENTS:
+        raise ValueError("unknown agent '{}' (expected one of {})".format(parts[0], ", ".join(AGENTS)))
+    depth = int(parts[1]) if len(parts) > 1 else 3
+    eval_name = parts[2] if len(parts) > 2 else "add_eval"
+    if eval_name not in EVAL_FUNCS:
+        raise ValueError("unknown eval '{}' (expected one of {})".format(eval_name, ", ".join(EVAL_FUNCS)))
+    return Player(spec, AGENTS[parts[0]], EVAL_FUNCS[eval_name], depth, movetime)
+
+
+# Returns the board at the start of a game: the given opening, followed by random_plies random legal moves chosen
+# with the given seed (so that both games of a pair start from the same position)
+def starting_board(opening, seed, random_plies=0):
+    board = chess.Board()
+    for move in opening.split():
+        board.push_uci(move)
+
+    rng = random.Random(seed)
+    for _ in range(random_plies):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        board.push(rng.choice(moves))
+    return board
+
+
+# Plays a single game between white and black (Players) from the given starting board, in a worker process.
+# seed seeds the random module, so any randomness in the agents is the same each time the game is played.
+# Returns a tuple of (result, termination, moves), where result is "1-0", "0-1" or "1/2-1/2", termination describes
+# how the game ended, and moves is the list of UCI moves played (including the opening).
+# If profile_paths is given, each side's searches are profiled (in the searchProfiler mode profile_mode) and written
+# to profile_paths[chess.WHITE] and profile_paths[chess.BLACK].
+def play_game(white, black, board, seed, profile_paths=None, profile_mode="cprofile"):
+    random.seed(seed)
+    chess_state = MyChess(board)
+    agents = {
+        chess.WHITE: white.make_agent(chess_state),
+        chess.BLACK: black.make_agent(chess_state),
+    }
+    players = {chess.WHITE: white, chess.BLACK: black}
+    profilers = None
+    if profile_paths is not None:
+        profilers = {chess.WHITE: SearchProfiler(profile_mode), chess.BLACK: SearchProfiler(profile_mode)}
+
+    while not chess_state.is_game_over():
+        if chess_state.board.ply() >= MAX_PLIES:
+            break
+        turn = chess_state.get_turn()
+        if profilers is not None:
+            with profilers[turn]:
+                move = agents[turn].get_action(chess_state, limits=players[turn].make_limits())
+        else:
+            move = agents[turn].get_action(chess_state, limits=players[turn].make_limits())
+        chess_state.execute_move(move)
+
+    if profilers is not None:
+        for (color, profiler) in profilers.items():
+            profiler.save(profile_paths[color])
+    if not chess_state.is_game_over():
+        return "1/2-1/2", "max plies", [move.uci() for move in chess_state.board.move_stack]
+    outcome = chess_state.board.outcome()
+    return outcome.result(), outcome.termination.name.lower(), [move.uci() for move in chess_state.board.move_stack]
+
+
+# Returns the paths of the profiles of game number (as written by play_game), by color, in the given directory
+def profile_paths(directory, number, mode):
+    return {color: os.path.join(directory, "game{:03d}_{}{}".format(number, chess.COLOR_NAMES[color],
+                                                                     EXTENSIONS[mode]))
+            for color in chess.COLORS}
+
+
+# Returns the Elo difference of a player with the given score (the fraction of points won, between 0 and 1)
+def elo_difference(score):
+    if score <= 0.0:
+        return float('-inf')
+    if score >= 1.0:
+        return float('inf')
+    return -400.0 * log10(1.0 / score - 1.0)
+
+
+# Returns (elo, margin): the Elo difference of a player with the given wins, draws and losses, and the margin of its
+# 95% confidence interval (estimated from the variance of the per-game scores)
+def elo_estimate(wins, draws, losses):
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, float('inf')
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1.0 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    deviation = 1.96 * sqrt(variance / games)
+    low = elo_difference(score - deviation)
+    high = elo_difference(score + deviation)
+    # A one-sided result (or a near one) has no finite upper or lower bound
+    if low == float('-inf') or high == float('inf'):
+        return elo_difference(score), float('inf')
+    return elo_difference(score), (high - low) / 2.0
+
+
+# Plays a tournament of paired games between player_a and player_b (Players) across a pool of worker processes.
+# Each of the given openings (by default OPENINGS, repeated as needed) is played twice with the colors swapped, so
+# the number of games is rounded up to an even number. Both games of the n-th pair are seeded with seed + n.
+# Prints one line per game as it finishes, with the running W/D/L and Elo difference of player_a, and returns a dict
+# of the final totals. If pgn_path is given, every game is also written there in PGN format.
+# If profile_dir is given, every search is profiled in the searchProfiler mode profile_mode, one file per game and
+# side is written there (see profile_paths), and the time each player spent in each category is printed at the end.
+def run_tournament(player_a, player_b, games=20, workers=None, openings=None, random_plies=0, seed=0,
+                   pgn_path=None, out=sys.stdout, profile_dir=None, profile_mode="cprofile"):
+    openings = openings if openings is not None else OPENINGS
+    pairs = (games + 1) // 2
+    workers = workers if workers is not None else os.cpu_count()
+
+    # Each job is (game number, opening index, white, black, starting board, seed)
+    jobs = []
+    for pair in range(pairs):
+        opening_index = pair % len(openings)
+        pair_seed = seed + pair
+        board = starting_board(openings[opening_index], pair_seed, random_plies)
+        jobs.append((len(jobs) + 1, opening_index, player_a, player_b, board, pair_seed))
+        jobs.append((len(jobs) + 1, opening_index, player_b, player_a, board.copy(), pair_seed))
+
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+
+    wins, draws, losses = 0, 0, 0
+    finished = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(play_game, white, black, board, game_seed,
+                                   profile_paths(profile_dir, number, profile_mode) if profile_dir else None,
+                                   profile_mode): (number, opening, white, black, board)
+                   for (number, opening, white, black, board, game_seed) in jobs}
+
+        for future in as_completed(futures):
+            number, opening, white, black, board = futures[future]
+            result, termination, moves = future.result()
+            finished.append((number, white, black, result, termination, moves))
+
+            # Score the game from player_a's point of view
+            if result == "1/2-1/2":
+                draws += 1
+            elif (result == "1-0") == (white is player_a):
+                wins += 1
+            else:
+                losses += 1
+
+            elo, margin = elo_estimate(wins, draws, losses)
+            out.write("game {:>3}/{} opening {:>2} {} vs {}: {} ({}, {} plies) | {} +{} ={} -{} Elo {:+.0f} +/- {:.0f}\n"
+                      .format(number, len(jobs), opening, white.name, black.name, result, termination, len(moves),
+                              player_a.name, wins, draws, losses, elo, margin))
+            out.flush()
+
+    if pgn_path is not None:
+        write_pgn(pgn_path, sorted(finished, key=lambda game: game[0]))
+    if profile_dir is not None:
+        for player in (player_a, player_b):
+            paths = [profile_paths(profile_dir, number, profile_mode)[chess.WHITE if white is player else chess.BLACK]
+                     for (number, white, black, _, _, _) in finished]
+            out.write("{} profile:\n".format(player.name))
+            if profile_mode == "cprofile":
+                stats = pstats.Stats(*paths)
+                printCategories(pstatsCategories(stats), out, stats.total_tt)
+            else:
+                printCategories(collapsedCategories(readCollapsed(paths), DEFAULT_INTERVAL), out)
+
+    elo, margin = elo_estimate(wins, draws, losses)
+    return {
+        "games": len(jobs),
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "score": (wins + 0.5 * draws) / len(jobs),
+        "elo": elo,
+        "elo_margin": margin,
+    }
+
+
+# Writes the given finished games (tuples of (number, white, black, result, termination, moves)) to a PGN file
+def write_pgn(path, finished):
+    with open(path, "w") as pgn_file:
+        for (number, white, black, result, termination, moves) in finished:
+            game = chess.pgn.Game()
+            game.headers["Event"] = "chessTournament"
+            game.headers["Round"] = str(number)
+            game.headers["White"] = white.name
+            game.headers["Black"] = black.name
+            game.headers["Result"] = result
+            game.headers["Termination"] = termination
+            node = game
+            for move in moves:
+                node = node.add_variation(chess.Move.from_uci(move))
+            print(game, file=pgn_file, end="\n\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plays a tournament of paired games between two agents")
+    parser.add_argument("player_a", nargs="?", default="quiet:4",
+                        help="agent[:depth[:eval]], agent in {}".format(", ".join(AGENTS)))
+    parser.add_argument("player_b", nargs="?", default="alphabeta:4", help="same format as player_a")
+    parser.add_argument("-n", "--games", type=int, default=20, help="number of games (rounded up to even)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--movetime", type=float, default=None, help="time limit per move in seconds")
+    parser.add_argument("--random-plies", type=int, default=0,
+                        help="random moves played after each opening, chosen by the pair's seed")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first pair of games")
+    parser.add_argument("--pgn", default=None, help="file to write the games to")
+    parser.add_argument("--profile", default=None, metavar="DIR",
+                        help="profile every search, writing one profile per game and side to DIR")
+    parser.add_argument("--profile-mode", choices=MODES, default="cprofile",
+                        help="cprofile writes pstats files, sampling writes collapsed stacks for flame graphs")
+    args = parser.parse_args(argv)
+
+    player_a = parse_player(args.player_a, args.movetime)
+    player_b = parse_player(args.player_b, args.movetime)
+    if player_a.name == player_b.name:
+        player_b.name += "'"
+
+    totals = run_tournament(player_a, player_b, args.games, args.workers, random_plies=args.random_plies,
+                            seed=args.seed, pgn_path=args.pgn, profile_dir=args.profile,
+                            profile_mode=args.profile_mode)
+    print("{} vs {}: +{} ={} -{} score {:.3f} Elo {:+.0f} +/- {:.0f}".format(
+        player_a.name, player_b.name, totals["wins"], totals["draws"], totals["losses"], totals["score"],
+        totals["elo"], totals["elo_margin"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,776 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# compactBoard.py
+
+import chess
+import chess.polyglot
+import sys
+from time import perf_counter
+
+BB_ALL = 0xFFFFFFFFFFFFFFFF
+BB_SQUARES = [1 << square for square in range(64)]
+
+KNIGHT_STEPS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+KING_STEPS = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+
+# The two directions (as (file, rank) steps) of each line a slider moves along
+RANK_DIRECTIONS = [(1, 0), (-1, 0)]
+FILE_DIRECTIONS = [(0, 1), (0, -1)]
+DIAG_DIRECTIONS = [(1, 1), (-1, -1)]
+ANTI_DIAG_DIRECTIONS = [(1, -1), (-1, 1)]
+
+
+# Returns the squares reached from the given square by walking each of the given (file, rank) steps, one step at a
+# time (stopping at the first occupied square, which is included) if slide, or a single step otherwise
+def _walk(square, steps, occupied=0, slide=True):
+    mask = 0
+    for (file_step, rank_step) in steps:
+        file, rank = square & 7, square >> 3
+        while True:
+            file, rank = file + file_step, rank + rank_step
+            if not (0 <= file < 8 and 0 <= rank < 8):
+                break
+            mask |= BB_SQUARES[rank * 8 + file]
+            if not slide or occupied & BB_SQUARES[rank * 8 + file]:
+                break
+    return mask
+
+
+# Returns the squares whose occupancy can change a slider's attacks along the given directions from the given square:
+# every square of the line except the last one in each direction (which is attacked whether or not it is occupied)
+def _relevant_mask(square, directions):
+    mask = 0
+    for (file_step, rank_step) in directions:
+        ray = _walk(square, [(file_step, rank_step)])
+        if not ray:
+            continue
+        # The furthest square is the highest one of a ray toward higher squares, and the lowest one otherwise
+        edge = 1 << (ray.bit_length() - 1) if rank_step * 8 + file_step > 0 else ray & -ray
+        mask |= ray & ~edge
+    return mask
+
+
+# Builds the attack tables of a slider moving along the given line. Returns (masks, tables), where tables[square] maps
+# every subset of masks[square] to the squares attacked from the square with those squares occupied. Looking up
+# tables[square][occupied & masks[square]] does the job of a magic bitboard multiplication, with the dict as the
+# perfect hash.
+def _line_tables(directions):
+    masks = []
+    tables = []
+    for square in range(64):
+        mask = _relevant_mask(square, directions)
+        table = {}
+        subset = 0
+        while True:
+            table[subset] = _walk(square, directions, subset)
+            # The next subset of mask (the Carry-Rippler trick)
+            subset = (subset - mask) & mask
+            if not subset:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+KNIGHT_ATTACKS = [_walk(square, KNIGHT_STEPS, slide=False) for square in range(64)]
+KING_ATTACKS = [_walk(square, KING_STEPS, slide=False) for square in range(64)]
+# Indexed by color (the squares a pawn of that color attacks)
+PAWN_ATTACKS = [[_walk(square, [(-1, -1), (1, -1)], slide=False) for square in range(64)],
+                [_walk(square, [(-1, 1), (1, 1)], slide=False) for square in range(64)]]
+
+RANK_MASKS, RANK_TABLES = _line_tables(RANK_DIRECTIONS)
+FILE_MASKS, FILE_TABLES = _line_tables(FILE_DIRECTIONS)
+DIAG_MASKS, DIAG_TABLES = _line_tables(DIAG_DIRECTIONS)
+ANTI_DIAG_MASKS, ANTI_DIAG_TABLES = _line_tables(ANTI_DIAG_DIRECTIONS)
+
+
+# Returns the squares a rook on the given square attacks, with the given squares occupied
+def rook_attacks(square, occupied):
+    return RANK_TABLES[square][occupied & RANK_MASKS[square]] | FILE_TABLES[square][occupied & FILE_MASKS[square]]
+
+
+# Returns the squares a bishop on the given square attacks, with the given squares occupied
+def bishop_attacks(square, occupied):
+    return DIAG_TABLES[square][occupied & DIAG_MASKS[square]] | \
+        ANTI_DIAG_TABLES[square][occupied & ANTI_DIAG_MASKS[square]]
+
+
+# BETWEEN[a][b] is the squares strictly between a and b, and LINE[a][b] the whole line through both (including them),
+# if a and b share a rank, file or diagonal (both are 0 otherwise)
+BETWEEN = [[0] * 64 for _ in range(64)]
+LINE = [[0] * 64 for _ in range(64)]
+for _square in range(64):
+    for _directions in (RANK_DIRECTIONS, FILE_DIRECTIONS, DIAG_DIRECTIONS, ANTI_DIAG_DIRECTIONS):
+        _line = _walk(_square, _directions) | BB_SQUARES[_square]
+        for _direction in _directions:
+            for _other in chess.scan_forward(_walk(_square, [_direction])):
+                LINE[_square][_other] = _line
+                BETWEEN[_square][_other] = _walk(_square, [_direction], BB_SQUARES[_other]) & ~BB_SQUARES[_other]
+
+# Every move, built once and shared: MOVES[from_square][to_square], and PROMOTIONS[from_square][to_square], the
+# promotions to a queen, rook, bishop and knight (in the order python-chess generates them)
+MOVES = [[chess.Move(from_square, to_square) for to_square in range(64)] for from_square in range(64)]
+PROMOTIONS = [[[chess.Move(from_square, to_square, piece_type)
+                for piece_type in (chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT)]
+               for to_square in range(64)] for from_square in range(64)]
+BB_BACKRANKS = chess.BB_RANK_1 | chess.BB_RANK_8
+
+# Castling, for each color: (rook square, king destination, rook destination, squares that must be empty, squares
+# the king passes that must not be attacked), kingside first
+CASTLING = [
+    [(chess.H8, chess.G8, chess.F8, chess.BB_F8 | chess.BB_G8, chess.BB_F8 | chess.BB_G8),
+     (chess.A8, chess.C8, chess.D8, chess.BB_B8 | chess.BB_C8 | chess.BB_D8, chess.BB_C8 | chess.BB_D8)],
+    [(chess.H1, chess.G1, chess.F1, chess.BB_F1 | chess.BB_G1, chess.BB_F1 | chess.BB_G1),
+     (chess.A1, chess.C1, chess.D1, chess.BB_B1 | chess.BB_C1 | chess.BB_D1, chess.BB_C1 | chess.BB_D1)],
+]
+BB_HOME_RANKS = [chess.BB_RANK_8, chess.BB_RANK_1]
+
+# Polyglot Zobrist keys (as chess.polyglot.zobrist_hash computes them), so a CompactBoard's key matches the key of the
+# same chess.Board: PIECE_KEYS[color][piece_type][square], the key of each castling rights mask, the key of the en
+# passant file, and the key XORed in when white is to move
+_RANDOM = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+PIECE_KEYS = [[[0] * 64] + [[_RANDOM[64 * ((piece_type - 1) * 2 + color) + square] for square in range(64)]
+                            for piece_type in chess.PIECE_TYPES] for color in (chess.BLACK, chess.WHITE)]
+CASTLING_KEYS = {}
+for _rights in range(16):
+    _mask = 0
+    _key = 0
+    for (_bit, (_corner, _index)) in enumerate([(chess.BB_H1, 768), (chess.BB_A1, 769), (chess.BB_H8, 770),
+                                                (chess.BB_A8, 771)]):
+        if _rights >> _bit & 1:
+            _mask |= _corner
+            _key ^= _RANDOM[_index]
+    CASTLING_KEYS[_mask] = _key
+EP_KEYS = [_RANDOM[772 + file] for file in range(8)]
+TURN_KEY = _RANDOM[780]
+
+# Positions to check CompactBoard against chess.Board on, as (FEN, depth): the standard perft positions plus en
+# passant and castling edge cases. Run this file to check them.
+PERFT_POSITIONS = [
+    (chess.STARTING_FEN, 4),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 3),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 5),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 3),
+    ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 3),
+    ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", 3),
+    # En passant that would expose the king along the rank
+    ("8/8/8/K2pP2q/8/8/8/7k w - d6 0 1", 4),
+    # En passant out of check by the double-pushed pawn
+    ("8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1", 4),
+    # Castling through attacked squares
+    ("r3k2r/8/8/8/8/8/8/R2bK2R w KQkq - 0 1", 3),
+    # Promotions with captures, and underpromotions
+    ("n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1", 4),
+]
+
+
+# A compact board for searches: piece bitboards plus a square-indexed array of piece types, legal move generation from
+# the attack tables above (with pins and checks handled by masks instead of trying each move), and make/unmake that
+# keeps the Polyglot Zobrist key up to date. It implements the part of the chess.Board interface the searches,
+# evaluation functions and move ordering use, for standard chess only, and returns the same chess.Move objects, so a
+# MyChess can hold either (see MyChess.search_copy).
+class CompactBoard():
+    __slots__ = ("pawns", "knights", "bishops", "rooks", "queens", "kings", "occupied_co", "occupied", "types", "turn",
+                 "castling_rights", "ep_square", "halfmove_clock", "fullmove_number", "key", "move_stack", "states")
+
+    def __init__(self, fen=chess.STARTING_FEN):
+        self.load(chess.Board(fen))
+
+    # Returns a CompactBoard of the given chess.Board's position, with its moves replayed from the root so that
+    # repetitions of earlier positions are recognized. CompactBoards are copied.
+    @staticmethod
+    def from_board(board):
+        if isinstance(board, CompactBoard):
+            return board.copy()
+        compact = CompactBoard(board.root().fen())
+        for move in board.move_stack:
+            compact.push(move)
+        return compact
+
+    # Sets up the position of the given chess.Board (without its move stack)
+    def load(self, board):
+        if board.chess960:
+            raise ValueError("CompactBoard only supports standard chess")
+        self.pawns = board.pawns
+        self.knights = board.knights
+        self.bishops = board.bishops
+        self.rooks = board.rooks
+        self.queens = board.queens
+        self.kings = board.kings
+        self.occupied_co = [board.occupied_co[chess.BLACK], board.occupied_co[chess.WHITE]]
+        self.occupied = board.occupied
+        self.types = [board.piece_type_at(square) or 0 for square in range(64)]
+        self.turn = board.turn
+        self.castling_rights = board.clean_castling_rights()
+        self.ep_square = board.ep_square
+        self.halfmove_clock = board.halfmove_clock
+        self.fullmove_number = board.fullmove_number
+        self.key = chess.polyglot.zobrist_hash(board)
+        self.move_stack = []
+        # What each move in move_stack changed that pop can't work out: (piece type moved, piece type captured,
+        # whether it was en passant, castling rights, en passant square, halfmove clock, key), all from before it
+        self.states = []
+
+    def copy(self):
+        board = CompactBoard.__new__(CompactBoard)
+        board.pawns = self.pawns
+        board.knights = self.knights
+        board.bishops = self.bishops
+        board.rooks = self.rooks
+        board.queens = self.queens
+        board.kings = self.kings
+        board.occupied_co = list(self.occupied_co)
+        board.occupied = self.occupied
+        board.types = list(self.types)
+        board.turn = self.turn
+        board.castling_rights = self.castling_rights
+        board.ep_square = self.ep_square
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+        board.key = self.key
+        board.move_stack = list(self.move_stack)
+        board.states = list(self.states)
+        return board
+
+    # Returns a chess.Board of the current position (without the move stack)
+    def to_board(self):
+        board = chess.Board.empty()
+        board.set_piece_map(self.piece_map())
+        board.turn = self.turn
+        board.castling_rights = self.castling_rights
+        board.ep_square = self.ep_square
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+        return board
+
+    def fen(self):
+        return self.to_board().fen()
+
+    def __str__(self):
+        return str(self.to_board())
+
+    # -------------------------------------------------------------------------------------------------------------
+    # Pieces
+    # -------------------------------------------------------------------------------------------------------------
+
+    def piece_type_at(self, square):
+        return self.types[square] or None
+
+    def color_at(self, square):
+        if self.occupied_co[chess.WHITE] & BB_SQUARES[square]:
+            return chess.WHITE
+        if self.occupied_co[chess.BLACK] & BB_SQUARES[square]:
+            return chess.BLACK
+        return None
+
+    def piece_at(self, square):
+        piece_type = self.types[square]
+        if not piece_type:
+            return None
+        return chess.Piece(piece_type, bool(self.occupied_co[chess.WHITE] & BB_SQUARES[square]))
+
+    def pieces_mask(self, piece_type, color):
+        if piece_type == chess.PAWN:
+            mask = self.pawns
+        elif piece_type == chess.KNIGHT:
+            mask = self.knights
+        elif piece_type == chess.BISHOP:
+            mask = self.bishops
+        elif piece_type == chess.ROOK:
+            mask = self.rooks
+        elif piece_type == chess.QUEEN:
+            mask = self.queens
+        else:
+            mask = self.kings
+        return mask & self.occupied_co[color]
+
+    def pieces(self, piece_type, color):
+        return chess.SquareSet(self.pieces_mask(piece_type, color))
+
+    # Returns the square of the given color's king, or None
+    def king(self, color):
+        king_mask = self.kings & self.occupied_co[color]
+        return king_mask.bit_length() - 1 if king_mask else None
+
+    def piece_map(self):
+        return {square: self.piece_at(square) for square in chess.scan_reversed(self.occupied)}
+
+    # XORs a piece of the given type and color on or off the given square's bitboards (the types array and key are
+    # left to the caller)
+    def _toggle(self, piece_type, color, square):
+        mask = BB_SQUARES[square]
+        if piece_type == chess.PAWN:
+            self.pawns ^= mask
+        elif piece_type == chess.KNIGHT:
+            self.knights ^= mask
+        elif piece_type == chess.BISHOP:
+            self.bishops ^= mask
+        elif piece_type == chess.ROOK:
+            self.rooks ^= mask
+        elif piece_type == chess.QUEEN:
+            self.queens ^= mask
+        else:
+            self.kings ^= mask
+        self.occupied_co[color] ^= mask
+        self.occupied ^= mask
+
+    # -------------------------------------------------------------------------------------------------------------
+    # Attacks
+    # -------------------------------------------------------------------------------------------------------------
+
+    # Returns the mask of the given color's pieces attacking the given square, with the given squares (by default,
+    # the board's) occupied
+    def attackers_mask(self, color, square, occupied=None):
+        if occupied is None:
+            occupied = self.occupied
+        queens = self.queens
+        rank_file = RANK_TABLES[square][occupied & RANK_MASKS[square]] | \
+            FILE_TABLES[square][occupied & FILE_MASKS[square]]
+        diagonal = DIAG_TABLES[square][occupied & DIAG_MASKS[square]] | \
+            ANTI_DIAG_TABLES[square][occupied & ANTI_DIAG_MASKS[square]]
+        return self.occupied_co[color] & ((KING_ATTACKS[square] & self.kings) |
+                                          (KNIGHT_ATTACKS[square] & self.knights) |
+                                          (rank_file & (self.rooks | queens)) |
+                                          (diagonal & (self.bishops | queens)) |
+                                          (PAWN_ATTACKS[not color][square] & self.pawns))
+
+    def is_attacked_by(self, color, square, occupied=None):
+        return bool(self.attackers_mask(color, square, occupied))
+
+    # Returns the squares attacked by the piece on the given square
+    def attacks_mask(self, square):
+        piece_type = self.types[square]
+        if piece_type == chess.PAWN:
+            return PAWN_ATTACKS[bool(self.occupied_co[chess.WHITE] & BB_SQUARES[square])][square]
+        if piece_type == chess.KNIGHT:
+            return KNIGHT_ATTACKS[square]
+        if piece_type == chess.KING:
+            return KING_ATTACKS[square]
+        attacks = 0
+        if piece_type == chess.BISHOP or piece_type == chess.QUEEN:
+            attacks = bishop_attacks(square, self.occupied)
+        if piece_type == chess.ROOK or piece_type == chess.QUEEN:
+            attacks |= rook_attacks(square, self.occupied)
+        return attacks
+
+    def is_check(self):
+        king = self.king(self.turn)
+        return king is not None and bool(self.attackers_mask(not self.turn, king))
+
+    # Returns the mask of the side to move's pieces pinned to its king (on the given square)
+    def _pinned(self, king):
+        occupied = self.occupied
+        snipers = (((RANK_TABLES[king][0] | FILE_TABLES[king][0]) & (self.rooks | self.queens)) |
+                   ((DIAG_TABLES[king][0] | ANTI_DIAG_TABLES[king][0]) & (self.bishops | self.queens)))
+        pinned = 0
+        for sniper in chess.scan_reversed(snipers & self.occupied_co[not self.turn]):
+            blockers = BETWEEN[king][sniper] & occupied
+            if blockers and not blockers & (blockers - 1):
+                pinned |= blockers
+        return pinned & self.occupied_co[self.turn]
+
+    # -------------------------------------------------------------------------------------------------------------
+    # Move generation. Moves come in the order chess.Board generates them, so searches order ties the same way.
+    # -------------------------------------------------------------------------------------------------------------
+
+    # Generates the legal moves from the squares in from_mask to the squares in to_mask
+    def generate_legal_moves(self, from_mask=BB_ALL, to_mask=BB_ALL):
+        turn = self.turn
+        king_mask = self.kings & self.occupied_co[turn]
+        king = king_mask.bit_length() - 1 if king_mask else None
+        checkers = self.attackers_mask(not turn, king) if king_mask else 0
+        if not checkers:
+            yield from self._generate_moves(king, self._pinned(king) if king_mask else 0, from_mask, to_mask)
+        else:
+            yield from self._generate_evasions(king, checkers, from_mask, to_mask)
+        if self.ep_square is not None and BB_SQUARES[self.ep_square] & to_mask:
+            yield from self._generate_ep(king, from_mask)
+
+    # Generates the legal moves (other than en passant) out of check by the given checkers
+    def _generate_evasions(self, king, checkers, from_mask, to_mask):
+        turn = self.turn
+        king_mask = BB_SQUARES[king]
+        # Evasions: king moves first, then (against a single checker) captures of the checker and blocks
+        if king_mask & from_mask:
+            occupied = self.occupied ^ king_mask
+            for to_square in chess.scan_reversed(KING_ATTACKS[king] & ~self.occupied_co[turn] & to_mask):
+                if not self.attackers_mask(not turn, to_square, occupied):
+                    yield MOVES[king][to_square]
+        if checkers & (checkers - 1):
+            return
+        checker = checkers.bit_length() - 1
+        target = BETWEEN[king][checker] | checkers
+        yield from self._generate_moves(king, self._pinned(king), from_mask & ~self.kings, to_mask & target)
+
+    # Generates the legal moves (other than king moves out of check and en passant) from the squares in from_mask to
+    # the squares in to_mask, given the side to move's king square (or None) and pinned pieces
+    def _generate_moves(self, king, pinned, from_mask, to_mask):
+        turn = self.turn
+        us = self.occupied_co[turn]
+        them = self.occupied_co[not turn]
+        occupied = self.occupied
+        types = self.types
+
+        for from_square in chess.scan_reversed(us & ~self.pawns & from_mask):
+            piece_type = types[from_square]
+            if piece_type == chess.KNIGHT:
+                attacks = KNIGHT_ATTACKS[from_square]
+            elif piece_type == chess.KING:
+                attacks = KING_ATTACKS[from_square]
+            elif piece_type == chess.BISHOP:
+                attacks = bishop_attacks(from_square, occupied)
+            elif piece_type == chess.ROOK:
+                attacks = rook_attacks(from_square, occupied)
+            else:
+                attacks = bishop_attacks(from_square, occupied) | rook_attacks(from_square, occupied)
+            attacks &= ~us & to_mask
+
+            if from_square == king:
+                without_king = occupied ^ BB_SQUARES[king]
+                for to_square in chess.scan_reversed(attacks):
+                    if not self.attackers_mask(not turn, to_square, without_king):
+                        yield MOVES[from_square][to_square]
+                continue
+            if pinned & BB_SQUARES[from_square]:
+                attacks &= LINE[king][from_square]
+            moves = MOVES[from_square]
+            for to_square in chess.scan_reversed(attacks):
+                yield moves[to_square]
+
+        if king is not None and BB_SQUARES[king] & from_mask:
+            yield from self._generate_castling(king, to_mask)
+
+        pawns = self.pawns & us & from_mask
+        if not pawns:
+            return
+
+        pawn_attacks = PAWN_ATTACKS[turn]
+        for from_square in chess.scan_reversed(pawns):
+            targets = pawn_attacks[from_square] & them & to_mask
+            if pinned & BB_SQUARES[from_square]:
+                targets &= LINE[king][from_square]
+            for to_square in chess.scan_reversed(targets):
+                if BB_SQUARES[to_square] & BB_BACKRANKS:
+                    yield from PROMOTIONS[from_square][to_square]
+                else:
+                    yield MOVES[from_square][to_square]
+
+        if turn == chess.WHITE:
+            single_moves = pawns << 8 & ~occupied
+            double_moves = single_moves << 8 & ~occupied & chess.BB_RANK_4
+            step = -8
+        else:
+            single_moves = pawns >> 8 & ~occupied
+            double_moves = single_moves >> 8 & ~occupied & chess.BB_RANK_5
+            step = 8
+
+        for to_square in chess.scan_reversed(single_moves & to_mask):
+            from_square = to_square + step
+            if pinned & BB_SQUARES[from_square] and not LINE[king][from_square] & BB_SQUARES[to_square]:
+                continue
+            if BB_SQUARES[to_square] & BB_BACKRANKS:
+                yield from PROMOTIONS[from_square][to_square]
+            else:
+                yield MOVES[from_square][to_square]
+
+        for to_square in chess.scan_reversed(double_moves & to_mask):
+            from_square = to_square + 2 * step
+            if pinned & BB_SQUARES[from_square] and not LINE[king][from_square] & BB_SQUARES[to_square]:
+                continue
+            yield MOVES[from_square][to_square]
+
+
+    # Generates the legal en passant captures from the squares in from_mask. Each is checked by clearing both pawns
+    # and looking for attacks on the king, which covers pins of the capturer and of the captured pawn alike.
+    def _generate_ep(self, king, from_mask):
+        ep_square = self.ep_square
+        turn = self.turn
+        if BB_SQUARES[ep_square] & self.occupied:
+            return
+        captured = ep_square + (-8 if turn else 8)
+        capturers = self.pawns & self.occupied_co[turn] & from_mask & PAWN_ATTACKS[not turn][ep_square] & \
+            (chess.BB_RANK_5 if turn else chess.BB_RANK_4)
+        for from_square in chess.scan_reversed(capturers):
+            if king is not None:
+                occupied = (self.occupied ^ BB_SQUARES[from_square] ^ BB_SQUARES[captured]) | BB_SQUARES[ep_square]
+                if self.attackers_mask(not turn, king, occupied) & ~BB_SQUARES[captured]:
+                    continue
+            yield MOVES[from_square][ep_square]
+
+    # Generates the legal castling moves (the side to move isn't in check) with a destination in to_mask
+    def _generate_castling(self, king, to_mask):
+        turn = self.turn
+        rights = self.castling_rights & BB_HOME_RANKS[turn]
+        if not rights:
+            return
+        for (rook_square, king_to, _, empty, safe) in CASTLING[turn]:
+            if not rights & BB_SQUARES[rook_square] or not BB_SQUARES[king_to] & to_mask or self.occupied & empty:
+                continue
+            if any(self.attackers_mask(not turn, square) for square in chess.scan_reversed(safe)):
+                continue
+            yield MOVES[king][king_to]
+
+    def generate_legal_captures(self, from_mask=BB_ALL, to_mask=BB_ALL):
+        yield from self.generate_legal_moves(from_mask, to_mask & self.occupied_co[not self.turn])
+        if self.ep_square is not None and BB_SQUARES[self.ep_square] & to_mask:
+            yield from self._generate_ep(self.king(self.turn), from_mask)
+
+    # -------------------------------------------------------------------------------------------------------------
+    # Moves
+    # -------------------------------------------------------------------------------------------------------------
+
+    def is_en_passant(self, move):
+        return (self.ep_square == move.to_square and self.types[move.from_square] == chess.PAWN and
+                abs(move.to_square - move.from_square) in (7, 9) and not self.occupied & BB_SQUARES[move.to_square])
+
+    def is_capture(self, move):
+        return bool(BB_SQUARES[move.to_square] & self.occupied_co[not self.turn]) or self.is_en_passant(move)
+
+    def is_castling(self, move):
+        return self.types[move.from_square] == chess.KING and abs((move.to_square & 7) - (move.from_square & 7)) > 1
+
+    def is_kingside_castling(self, move):
+        return self.is_castling(move) and move.to_square > move.from_square
+
+    def is_queenside_castling(self, move):
+        return self.is_castling(move) and move.to_square < move.from_square
+
+    # Returns the key of the en passant square, if the side to move has a pawn that could capture on it
+    def _ep_key(self):
+        ep_square = self.ep_square
+        if ep_square is not None and \
+                PAWN_ATTACKS[not self.turn][ep_square] & self.pawns & self.occupied_co[self.turn]:
+            return EP_KEYS[ep_square & 7]
+        return 0
+
+    # Makes the given legal move (or a null move, chess.Move.null())
+    def push(self, move):
+        turn = self.turn
+        rights = self.castling_rights
+        key = self.key ^ self._ep_key() ^ CASTLING_KEYS[rights] ^ TURN_KEY
+        state = [0, 0, False, rights, self.ep_square, self.halfmove_clock, self.key]
+        self.move_stack.append(move)
+        self.states.append(state)
+
+        ep_square = self.ep_square
+        self.ep_square = None
+        self.halfmove_clock += 1
+        if turn == chess.BLACK:
+            self.fullmove_number += 1
+
+        if move:
+            types = self.types
+            from_square = move.from_square
+            to_square = move.to_square
+            piece_type = types[from_square]
+            captured = types[to_square]
+            state[0] = piece_type
+            our_keys = PIECE_KEYS[turn]
+
+            if captured:
+                self._toggle(captured, not turn, to_square)
+                key ^= PIECE_KEYS[not turn][captured][to_square]
+                state[1] = captured
+            elif piece_type == chess.PAWN and to_square == ep_square and (to_square - from_square) & 1:
+                captured_square = to_square + (-8 if turn else 8)
+                self._toggle(chess.PAWN, not turn, captured_square)
+                key ^= PIECE_KEYS[not turn][chess.PAWN][captured_square]
+                types[captured_square] = 0
+                state[1] = captured = chess.PAWN
+                state[2] = True
+
+            placed = move.promotion or piece_type
+            self._toggle(piece_type, turn, from_square)
+            self._toggle(placed, turn, to_square)
+            key ^= our_keys[piece_type][from_square] ^ our_keys[placed][to_square]
+            types[from_square] = 0
+            types[to_square] = placed
+
+            if piece_type == chess.KING:
+                rights &= ~BB_HOME_RANKS[turn]
+                if to_square - from_square == 2 or from_square - to_square == 2:
+                    rook_from, rook_to = (from_square + 3, from_square + 1) if to_square > from_square else \
+                        (from_square - 4, from_square - 1)
+                    self._toggle(chess.ROOK, turn, rook_from)
+                    self._toggle(chess.ROOK, turn, rook_to)
+                    key ^= our_keys[chess.ROOK][rook_from] ^ our_keys[chess.ROOK][rook_to]
+                    types[rook_from] = 0
+                    types[rook_to] = chess.ROOK
+            rights &= ~(BB_SQUARES[from_square] | BB_SQUARES[to_square])
+
+            if piece_type == chess.PAWN:
+                self.halfmove_clock = 0
+                if to_square - from_square == 16 or from_square - to_square == 16:
+                    self.ep_square = (from_square + to_square) >> 1
+            elif captured:
+                self.halfmove_clock = 0
+
+        self.castling_rights = rights
+        self.turn = not turn
+        self.key = key ^ CASTLING_KEYS[rights] ^ self._ep_key()
+
+    # Unmakes the last move, and returns it
+    def pop(self):
+        move = self.move_stack.pop()
+        (piece_type, captured, en_passant, rights, ep_square, halfmove_clock, key) = self.states.pop()
+        self.turn = turn = not self.turn
+        if turn == chess.BLACK:
+            self.fullmove_number -= 1
+
+        if move:
+            types = self.types
+            from_square = move.from_square
+            to_square = move.to_square
+            self._toggle(types[to_square], turn, to_square)
+            self._toggle(piece_type, turn, from_square)
+            types[from_square] = piece_type
+            types[to_square] = 0
+
+            if piece_type == chess.KING and (to_square - from_square == 2 or from_square - to_square == 2):
+                rook_from, rook_to = (from_square + 3, from_square + 1) if to_square > from_square else \
+                    (from_square - 4, from_square - 1)
+                self._toggle(chess.ROOK, turn, rook_to)
+                self._toggle(chess.ROOK, turn, rook_from)
+                types[rook_to] = 0
+                types[rook_from] = chess.ROOK
+
+            if en_passant:
+                captured_square = to_square + (-8 if turn else 8)
+                self._toggle(chess.PAWN, not turn, captured_square)
+                types[captured_square] = chess.PAWN
+            elif captured:
+                self._toggle(captured, not turn, to_square)
+                types[to_square] = captured
+
+        self.castling_rights = rights
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.key = key
+        return move
+
+    def peek(self):
+        return self.move_stack[-1]
+
+    def ply(self):
+        return 2 * (self.fullmove_number - 1) + (self.turn == chess.BLACK)
+
+    # Returns the Polyglot Zobrist key of the position (see transpositionTable.zobrist_key)
+    def zobrist_hash(self):
+        return self.key
+
+    # As chess.Board._transposition_key: a hashable key that is equal for positions that count as the same position
+    # for repetitions
+    def _transposition_key(self):
+        return self.key
+
+    # -------------------------------------------------------------------------------------------------------------
+    # Game end
+    # -------------------------------------------------------------------------------------------------------------
+
+    def is_checkmate(self):
+        return self.is_check() and not any(self.generate_legal_moves())
+
+    def is_stalemate(self):
+        return not self.is_check() and not any(self.generate_legal_moves())
+
+    # As chess.Board.is_insufficient_material
+    def is_insufficient_material(self):
+        return all(self.has_insufficient_material(color) for color in chess.COLORS)
+
+    def has_insufficient_material(self, color):
+        ours = self.occupied_co[color]
+        if ours & (self.pawns | self.rooks | self.queens):
+            return False
+        if ours & self.knights:
+            return chess.popcount(ours) <= 2 and not (self.occupied_co[not color] & ~self.kings & ~self.queens)
+        if ours & self.bishops:
+            same_color = not self.bishops & chess.BB_DARK_SQUARES or not self.bishops & chess.BB_LIGHT_SQUARES
+            return same_color and not self.pawns and not self.knights
+        return True
+
+    # Returns whether the position has occurred at least count times, counting only the positions since the last
+    # capture or pawn move (the only ones it can repeat). Positions are compared by Zobrist key.
+    def is_repetition(self, count=3):
+        if self.halfmove_clock < 4 * (count - 1):
+            return False
+        seen = 1
+        for state in reversed(self.states[-self.halfmove_clock:]):
+            if state[6] == self.key:
+                seen += 1
+                if seen >= count:
+                    return True
+        return False
+
+    def is_fivefold_repetition(self):
+        return self.is_repetition(5)
+
+    # As chess.Board.is_game_over without claimed draws
+    def is_game_over(self):
+        return (not any(self.generate_legal_moves()) or self.is_insufficient_material() or
+                self.halfmove_clock >= 150 or self.is_fivefold_repetition())
+
+
+# Returns the number of leaf nodes of the legal move tree of the given board (a CompactBoard or a chess.Board) to the
+# given depth
+def perft(board, depth):
+    if depth == 0:
+        return 1
+    moves = list(board.generate_legal_moves())
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+# Walks the move trees of the given CompactBoard and chess.Board (in the same position) together to the given depth.
+# Returns a description of the first node where they disagree on the legal moves, check or the Zobrist key, or None.
+def find_mismatch(compact, board, depth):
+    compact_moves = list(compact.generate_legal_moves())
+    if compact_moves != list(board.generate_legal_moves()):
+        return "legal moves differ in {}".format(board.fen())
+    if compact.is_check() != board.is_check():
+        return "check differs in {}".format(board.fen())
+    if compact.key != chess.polyglot.zobrist_hash(board):
+        return "Zobrist key differs in {}".format(board.fen())
+    if depth == 0:
+        return None
+    for move in compact_moves:
+        compact.push(move)
+        board.push(move)
+        mismatch = find_mismatch(compact, board, depth - 1)
+        board.pop()
+        compact.pop()
+        if mismatch is not None:
+            return mismatch
+    return None
+
+
+# Checks CompactBoard against chess.Board on PERFT_POSITIONS: their perft counts (and times) and, two plies deep, their
+# moves, checks and keys node by node. Prints a line per position; returns the number of mismatches.
+def check_positions(out=sys.stdout):
+    failures = 0
+    for (fen, depth) in PERFT_POSITIONS:
+        compact = CompactBoard(fen)
+        start = perf_counter()
+        compact_nodes = perft(compact, depth)
+        compact_seconds = perf_counter() - start
+        start = perf_counter()
+        nodes = perft(chess.Board(fen), depth)
+        seconds = perf_counter() - start
+
+        mismatch = find_mismatch(compact, chess.Board(fen), min(depth, 2))
+        if mismatch is None and compact_nodes != nodes:
+            mismatch = "perft {} gives {} nodes, expected {}".format(depth, compact_nodes, nodes)
+        failures += mismatch is not None
+        out.write("{} perft {} {:>9} nodes compact {:>6.2f}s python-chess {:>6.2f}s {}\n".format(
+            "ok  " if mismatch is None else "FAIL", depth, compact_nodes, compact_seconds, seconds, fen))
+        if mismatch is not None:
+            out.write("     {}\n".format(mismatch))
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check_positions() else 0)
@@ -0,0 +1,420 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# endgameBitbases.py
+
+import chess
+import numpy as np
+import os
+import sys
+from time import perf_counter
+
+# The endgames with bitbases, by name, and the strong side's pieces besides its king (in the order they are indexed).
+# The other side always has a bare king, so the strong side can only win or draw.
+ENDGAMES = {
+    "KQK": [chess.QUEEN],
+    "KRK": [chess.ROOK],
+    "KPK": [chess.PAWN],
+    "KBNK": [chess.BISHOP, chess.KNIGHT],
+}
+
+# The order the bitbases are generated in: KPK looks up its promotions in KQK and KRK
+GENERATION_ORDER = ["KQK", "KRK", "KPK", "KBNK"]
+
+# The most pieces (kings included) on a board that any bitbase covers
+MAX_PIECES = 4
+
+# Where the bitbase files are written to and read from by default
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bitbases")
+
+# The file extension of bitbase files
+EXTENSION = ".bitbase"
+
+
+# -----------------------------------------------------------------------------------------------------------
+# Square Tables
+# -----------------------------------------------------------------------------------------------------------
+
+
+# Returns a (64, 64) bool array where table[from, to] is set if the given attack bitboards (indexed by square) include
+# the to square
+def attackTable(attack_bitboards):
+    return np.array([[bool(attack_bitboards[source] & chess.BB_SQUARES[target]) for target in chess.SQUARES]
+                     for source in chess.SQUARES])
+
+
+# Returns a (64, width) int array of the squares in each of the given attack bitboards, padded with -1
+def targetTable(attack_bitboards, width):
+    table = np.full((64, width), -1, dtype=np.int64)
+    for square in chess.SQUARES:
+        targets = list(chess.SquareSet(attack_bitboards[square]))
+        table[square, :len(targets)] = targets
+    return table
+
+
+# Returns a (64, 8, 7) int array where table[square, direction, step] is the square step + 1 steps from square in the
+# given direction, or -1 if it is off the board. Directions 0-3 are rook directions and 4-7 are bishop directions.
+def rayTable():
+    directions = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+    table = np.full((64, 8, 7), -1, dtype=np.int64)
+    for square in chess.SQUARES:
+        for (direction, (file_step, rank_step)) in enumerate(directions):
+            file, rank = chess.square_file(square), chess.square_rank(square)
+            for step in range(7):
+                file, rank = file + file_step, rank + rank_step
+                if not (0 <= file < 8 and 0 <= rank < 8):
+                    break
+                table[square, direction, step] = chess.square(file, rank)
+    return table
+
+
+KING_ATTACKS = attackTable(chess.BB_KING_ATTACKS)
+KNIGHT_ATTACKS = attackTable(chess.BB_KNIGHT_ATTACKS)
+WHITE_PAWN_ATTACKS = attackTable(chess.BB_PAWN_ATTACKS[chess.WHITE])
+KING_TARGETS = targetTable(chess.BB_KING_ATTACKS, 8)
+KNIGHT_TARGETS = targetTable(chess.BB_KNIGHT_ATTACKS, 8)
+RAYS = rayTable()
+ROOK_DIRECTIONS = range(0, 4)
+BISHOP_DIRECTIONS = range(4, 8)
+
+# ROOK_LINES[a, b] / BISHOP_LINES[a, b] are set if a rook / bishop on a would attack b on an empty board
+ROOK_LINES = np.zeros((64, 64), dtype=bool)
+BISHOP_LINES = np.zeros((64, 64), dtype=bool)
+for (direction_range, lines) in ((ROOK_DIRECTIONS, ROOK_LINES), (BISHOP_DIRECTIONS, BISHOP_LINES)):
+    for square in chess.SQUARES:
+        for direction in direction_range:
+            targets = RAYS[square, direction]
+            lines[square, targets[targets >= 0]] = True
+
+# BETWEEN[a, b] is the bitboard of the squares strictly between a and b (0 if they aren't on a line)
+BETWEEN = np.array([[chess.between(a, b) for b in chess.SQUARES] for a in chess.SQUARES], dtype=np.uint64)
+
+# The bitboard of each square
+SQUARE_BITS = np.array(chess.BB_SQUARES, dtype=np.uint64)
+
+# The 8 symmetries of the board, as square -> square maps: identity, mirror files, mirror ranks, both, and each of
+# those followed by flipping the a1-h8 diagonal
+_MIRRORS = [lambda s: s, lambda s: s ^ 7, lambda s: s ^ 56, lambda s: s ^ 63]
+TRANSFORMS = np.array([[mirror(square) for square in chess.SQUARES] for mirror in _MIRRORS] +
+                      [[((mirror(square) & 7) << 3) | (mirror(square) >> 3) for square in chess.SQUARES]
+                       for mirror in _MIRRORS], dtype=np.int64)
+
+
+# Returns if the given piece type on the given squares attacks the given target squares, with the given occupied
+# bitboards (all arrays of the same shape, or scalars)
+def attacks(piece_type, squares, targets, occupied):
+    if piece_type == chess.KING:
+        return KING_ATTACKS[squares, targets]
+    if piece_type == chess.KNIGHT:
+        return KNIGHT_ATTACKS[squares, targets]
+    if piece_type == chess.PAWN:
+        return WHITE_PAWN_ATTACKS[squares, targets]
+
+    clear = (BETWEEN[squares, targets] & occupied) == 0
+    if piece_type == chess.ROOK:
+        return ROOK_LINES[squares, targets] & clear
+    if piece_type == chess.BISHOP:
+        return BISHOP_LINES[squares, targets] & clear
+    return (ROOK_LINES[squares, targets] | BISHOP_LINES[squares, targets]) & clear
+
+
+# -----------------------------------------------------------------------------------------------------------
+# Indexing
+# -----------------------------------------------------------------------------------------------------------
+
+
+# The layout of one endgame's bitbase, with the strong side as white.
+# A position is indexed by (strong king, weak king, strong pieces...), each a square except the strong king, which is
+# first moved into a canonical region by a symmetry of the board: the a1-d1-d4 triangle (10 squares) without pawns,
+# or files a-d (32 squares) with pawns, since pawns can only be mirrored left to right. So a bitbase holds
+# len(king_squares) * 64 ** (len(pieces) + 1) positions per side to move.
+class Endgame():
+    def __init__(self, name):
+        self.name = name
+        self.pieces = ENDGAMES[name]
+
+        if chess.PAWN in self.pieces:
+            transforms = [0, 1]
+            region = [square for square in chess.SQUARES if chess.square_file(square) <= 3]
+        else:
+            transforms = range(8)
+            region = [square for square in chess.SQUARES
+                      if chess.square_rank(square) <= chess.square_file(square) <= 3]
+
+        self.king_squares = np.array(region, dtype=np.int64)
+        # king_transform[square] is the symmetry that moves a strong king on square into the region, and
+        # king_index[square] is the position of a region square in king_squares
+        self.king_transform = np.array([next(t for t in transforms if TRANSFORMS[t, square] in region)
+                                        for square in chess.SQUARES], dtype=np.int64)
+        self.king_index = np.full(64, -1, dtype=np.int64)
+        self.king_index[self.king_squares] = np.arange(len(region))
+
+        self.shape = (len(region),) + (64,) * (len(self.pieces) + 1)
+        self.size = int(np.prod(self.shape))
+        # The number of bytes each side to move takes up in the file
+        self.side_bytes = (self.size + 7) // 8
+
+    # Returns the index of the position with the given strong king, weak king and strong piece squares (in the order
+    # of self.pieces). Works on ints or on numpy arrays of squares.
+    def encode(self, strong_king, weak_king, piece_squares):
+        transform = self.king_transform[strong_king]
+        index = self.king_index[TRANSFORMS[transform, strong_king]]
+        index = index * 64 + TRANSFORMS[transform, weak_king]
+        for square in piece_squares:
+            index = index * 64 + TRANSFORMS[transform, square]
+        return index
+
+    # Returns (strong king, weak king, [strong piece squares]) arrays of every index
+    def decode_all(self):
+        coordinates = np.unravel_index(np.arange(self.size, dtype=np.int64), self.shape)
+        return self.king_squares[coordinates[0]], coordinates[1], list(coordinates[2:])
+
+
+# -----------------------------------------------------------------------------------------------------------
+# Generation
+# -----------------------------------------------------------------------------------------------------------
+
+
+# Returns the path of the given endgame's bitbase in the given directory
+def bitbasePath(name, directory=DEFAULT_DIRECTORY):
+    return os.path.join(directory, name + EXTENSION)
+
+
+# Reads the given endgame's bitbase from the given directory, as a tuple of (strong to move, weak to move) bool
+# arrays where a set entry means the strong side wins
+def readBitbase(name, directory=DEFAULT_DIRECTORY):
+    endgame = Endgame(name)
+    packed = np.fromfile(bitbasePath(name, directory), dtype=np.uint8)
+    strong = np.unpackbits(packed[:endgame.side_bytes], count=endgame.size, bitorder='little').astype(bool)
+    weak = np.unpackbits(packed[endgame.side_bytes:], count=endgame.size, bitorder='little').astype(bool)
+    return strong, weak
+
+
+# Builds the given endgame's bitbase by retrograde analysis, and writes it to the given directory (which must already
+# hold the bitbases of any endgame it promotes into). Returns a dict of statistics.
+# Every position is decided at once with numpy: each pass marks the strong-to-move positions with a move into a
+# position already lost for the weak side, then the weak-to-move positions whose every move leads to a position
+# already won for the strong side, until a pass changes nothing. Positions never marked are draws. The fifty-move
+# rule and castling rights are not considered.
+def generate(name, directory=DEFAULT_DIRECTORY, verbose=True):
+    start = perf_counter()
+    endgame = Endgame(name)
+    strong_king, weak_king, piece_squares = endgame.decode_all()
+    piece_bits = [SQUARE_BITS[square] for square in piece_squares]
+    occupied = SQUARE_BITS[strong_king] | SQUARE_BITS[weak_king]
+    for bits in piece_bits:
+        occupied |= bits
+
+    # Positions with two pieces on a square, touching kings or pawns on the back ranks can't happen
+    valid = ~KING_ATTACKS[strong_king, weak_king] & (strong_king != weak_king)
+    all_squares = [strong_king, weak_king] + piece_squares
+    for i in range(len(all_squares)):
+        for j in range(i + 1, len(all_squares)):
+            valid &= all_squares[i] != all_squares[j]
+    for (piece_type, square) in zip(endgame.pieces, piece_squares):
+        if piece_type == chess.PAWN:
+            valid &= (square >= 8) & (square < 56)
+
+    weak_in_check = np.zeros(endgame.size, dtype=bool)
+    for (piece_type, square) in zip(endgame.pieces, piece_squares):
+        weak_in_check |= attacks(piece_type, square, weak_king, occupied)
+    # The weak king can't be in check with the strong side to move
+    valid_strong = valid & ~weak_in_check
+    valid_weak = valid
+
+    # The weak king's moves. A capture always draws (what is left can't force mate), so a legal capture is an escape.
+    # Each other legal move is stored as the index of the strong-to-move position it leads to, or -1 if illegal.
+    weak_successors = []
+    weak_escape = np.zeros(endgame.size, dtype=bool)
+    weak_has_move = np.zeros(endgame.size, dtype=bool)
+    occupied_without_king = occupied & ~SQUARE_BITS[weak_king]
+    for direction in range(8):
+        targets = KING_TARGETS[weak_king, direction]
+        target = np.where(targets >= 0, targets, 0)
+        legal = valid_weak & (targets >= 0) & ~KING_ATTACKS[strong_king, target]
+        capture = np.zeros(endgame.size, dtype=bool)
+        for (piece_type, square) in zip(endgame.pieces, piece_squares):
+            captured = target == square
+            capture |= captured
+            legal &= captured | ~attacks(piece_type, square, target, occupied_without_king)
+
+        weak_escape |= legal & capture
+        weak_has_move |= legal
+        quiet = legal & ~capture
+        weak_successors.append(np.where(quiet, endgame.encode(strong_king, target, piece_squares), -1)
+                               .astype(np.int32))
+
+    # The strong side's moves, each stored as the index of the weak-to-move position it leads to, or -1 if illegal.
+    # Promotions lead into another bitbase, so they are looked up once into promotion_wins.
+    strong_successors = []
+    promotion_wins = np.zeros(endgame.size, dtype=bool)
+
+    def add_strong_move(legal, new_king, new_squares):
+        strong_successors.append(np.where(legal, endgame.encode(new_king, weak_king, new_squares), -1)
+                                 .astype(np.int32))
+
+    for direction in range(8):
+        targets = KING_TARGETS[strong_king, direction]
+        target = np.where(targets >= 0, targets, 0)
+        legal = valid_strong & (targets >= 0) & ~KING_ATTACKS[weak_king, target] & \
+            ((occupied & SQUARE_BITS[target]) == 0)
+        add_strong_move(legal, target, piece_squares)
+
+    for (index, (piece_type, square)) in enumerate(zip(endgame.pieces, piece_squares)):
+        def moved(target):
+            return piece_squares[:index] + [target] + piece_squares[index + 1:]
+
+        if piece_type == chess.PAWN:
+            push = square + 8
+            single = valid_strong & ((occupied & SQUARE_BITS[np.minimum(push, 63)]) == 0)
+            double = single & (square < 16) & ((occupied & SQUARE_BITS[np.minimum(push + 8, 63)]) == 0)
+            promotes = push >= 56
+            add_strong_move(single & ~promotes, strong_king, moved(np.minimum(push, 63)))
+            add_strong_move(double, strong_king, moved(np.minimum(push + 8, 63)))
+            for promotion_name in ("KQK", "KRK"):
+                promotion = Endgame(promotion_name)
+                weak_lost = readBitbase(promotion_name, directory)[1]
+                lookup = promotion.encode(strong_king, weak_king, [np.minimum(push, 63)])
+                promotion_wins |= single & promotes & weak_lost[lookup]
+            continue
+
+        if piece_type == chess.KNIGHT:
+            target_lists = [KNIGHT_TARGETS[square, k] for k in range(8)]
+        else:
+            directions = {chess.ROOK: ROOK_DIRECTIONS, chess.BISHOP: BISHOP_DIRECTIONS}.get(piece_type, range(8))
+            target_lists = [RAYS[square, direction, step] for direction in directions for step in range(7)]
+
+        for targets in target_lists:
+            target = np.where(targets >= 0, targets, 0)
+            legal = valid_strong & (targets >= 0) & ((occupied & SQUARE_BITS[target]) == 0) & \
+                ((BETWEEN[square, target] & occupied) == 0)
+            add_strong_move(legal, strong_king, moved(target))
+
+    del strong_king, weak_king, piece_squares, piece_bits, occupied, occupied_without_king
+
+    # Weak-to-move positions that are already lost: checkmate
+    strong_wins = valid_strong & promotion_wins
+    weak_lost = valid_weak & weak_in_check & ~weak_has_move
+    passes = 0
+    while True:
+        passes += 1
+        # Index -1 (an illegal move) reads the padding: never a win for the strong side, never an escape for the weak
+        padded = np.append(weak_lost, False)
+        new_strong_wins = promotion_wins.copy()
+        for successors in strong_successors:
+            new_strong_wins |= padded[successors]
+        new_strong_wins &= valid_strong
+
+        padded = np.append(new_strong_wins, True)
+        all_lost = np.ones(endgame.size, dtype=bool)
+        for successors in weak_successors:
+            all_lost &= padded[successors]
+        new_weak_lost = valid_weak & ~weak_escape & np.where(weak_has_move, all_lost, weak_in_check)
+
+        if np.array_equal(new_strong_wins, strong_wins) and np.array_equal(new_weak_lost, weak_lost):
+            break
+        strong_wins, weak_lost = new_strong_wins, new_weak_lost
+
+    os.makedirs(directory, exist_ok=True)
+    with open(bitbasePath(name, directory), "wb") as bitbase_file:
+        np.packbits(strong_wins, bitorder='little').tofile(bitbase_file)
+        np.packbits(weak_lost, bitorder='little').tofile(bitbase_file)
+
+    stats = {
+        "name": name,
+        "positions": endgame.size,
+        "passes": passes,
+        "strong_to_move_legal": int(valid_strong.sum()),
+        "strong_to_move_wins": int(strong_wins.sum()),
+        "weak_to_move_legal": int(valid_weak.sum()),
+        "weak_to_move_losses": int(weak_lost.sum()),
+        "bytes": 2 * endgame.side_bytes,
+        "seconds": perf_counter() - start,
+    }
+    if verbose:
+        print("{name}: {strong_to_move_wins}/{strong_to_move_legal} wins with the strong side to move, "
+              "{weak_to_move_losses}/{weak_to_move_legal} losses with the weak side to move "
+              "({passes} passes, {bytes} bytes, {seconds:.1f}s)".format(**stats))
+    return stats
+
+
+# Generates every bitbase into the given directory, in GENERATION_ORDER
+def generateAll(directory=DEFAULT_DIRECTORY, verbose=True):
+    return [generate(name, directory, verbose) for name in GENERATION_ORDER]
+
+
+# -----------------------------------------------------------------------------------------------------------
+# Probing
+# -----------------------------------------------------------------------------------------------------------
+
+
+# Results of probe_wdl, relative to the side to move
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+
+# Read-only access to the bitbases in a directory. Each file is memory-mapped the first time a position from its
+# endgame is probed; endgames without a file are treated as not covered.
+class EndgameBitbases():
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        self.endgames = {name: Endgame(name) for name in ENDGAMES}
+        # Maps a sorted tuple of the strong side's piece types (besides the king) to its endgame's name
+        self.material = {tuple(sorted(pieces)): name for (name, pieces) in ENDGAMES.items()}
+        # Maps an endgame's name to its memory-mapped file, or None if it has no file
+        self.tables = {}
+
+    # Returns the names of the endgames that have a bitbase file
+    def available(self):
+        return [name for name in ENDGAMES if os.path.exists(bitbasePath(name, self.directory))]
+
+    # Returns the memory-mapped bitbase of the given endgame, or None if it has no file
+    def get_table(self, name):
+        if name not in self.tables:
+            path = bitbasePath(name, self.directory)
+            self.tables[name] = np.memmap(path, dtype=np.uint8, mode='r') if os.path.exists(path) else None
+        return self.tables[name]
+
+    # Returns the result of the given chess.Board with perfect play for the side to move (WIN, DRAW or LOSS), or None
+    # if no bitbase covers it. Positions with insufficient material to mate are draws.
+    def probe_wdl(self, board):
+        if chess.popcount(board.occupied) > MAX_PIECES:
+            return None
+        if board.is_insufficient_material():
+            return DRAW
+
+        white = board.occupied_co[chess.WHITE] & ~board.kings
+        black = board.occupied_co[chess.BLACK] & ~board.kings
+        if white and black:
+            return None
+        strong = chess.WHITE if white else chess.BLACK
+        pieces = tuple(sorted(board.piece_type_at(square) for square in chess.SquareSet(white | black)))
+        name = self.material.get(pieces)
+        table = self.get_table(name) if name is not None else None
+        if table is None:
+            return None
+
+        # The bitbase has the strong side as white, so flip the board if it is black
+        flip = 0 if strong == chess.WHITE else 56
+        endgame = self.endgames[name]
+        squares = [board.pieces(piece_type, strong).pop() ^ flip for piece_type in endgame.pieces]
+        index = int(endgame.encode(board.king(strong) ^ flip, board.king(not strong) ^ flip, squares))
+
+        strong_to_move = board.turn == strong
+        offset = 0 if strong_to_move else endgame.side_bytes
+        if (table[offset + (index >> 3)] >> (index & 7)) & 1:
+            return WIN if strong_to_move else LOSS
+        return DRAW
+
+
+# Usage:
+#   python endgameBitbases.py generate [directory]
+#   python endgameBitbases.py probe fen [directory]
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "generate":
+        generateAll(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DIRECTORY)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "probe":
+        bitbases = EndgameBitbases(sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DIRECTORY)
+        print({WIN: "win", DRAW: "draw", LOSS: "loss", None: "not covered"}[bitbases.probe_wdl(chess.Board(sys.argv[2]))])
+    else:
+        print("usage: python endgameBitbases.py generate [directory]\n"
+              "       python endgameBitbases.py probe fen [directory]")
@@ -1,14 +1,18 @@
 # Authors: Drake Moore, John Lam, Nathan Cheng
-# searchAgents.py
+# evaluation.py
 
 
 from myChess import MyChess
-from multiplier import Multiplier, Adder
+from multiplier import Adder, pieceIndex, flattenTables
 import chess
 from enum import Enum
 
 CHECKMATEVAL = 1000000
 
+# The score of a position the endgame bitbases know to be won, before the usual evaluation is added to it (so that the
+# search still steers toward the mate). Always well below CHECKMATEVAL, so a found mate is preferred.
+BITBASE_WIN_VAL = CHECKMATEVAL // 2
+
 class Values(Enum):
     PAWN = 100
     KNIGHT = 320
@@ -17,7 +21,12 @@ class Values(Enum):
     QUEEN = 900
     KING = 20000
 
-adder = Adder()
+# (piece_type, color) for each piece index used by the flattened tables (see multiplier.pieceIndex)
+PIECE_KEYS = [(piece_type, color) for color in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+
+# Material plus Adder bonus of every piece on every square, as a flat 12x64 table signed in white's favor, built once
+# at import. Indexed by pieceIndex(piece_type, color) * 64 + square.
+ADDER_TABLE = flattenTables(Adder, [value.value for value in Values], 'i')
 
 
 
@@ -30,13 +39,9 @@ adder = Adder()
 # positive integer means the color is winning. negative means losing
 # 0 means the game is even.
 def evaluate(chess_state: MyChess, color=None):
-    board = chess_state.get_board()
     color = chess_state.get_turn() if color is None else color
-    int_vals = MyChess.convert_to_int(board)
 
-    evaluation = 0
-    for val in int_vals:
-        evaluation += val
+    evaluation = chess_state.material_balance()
     return evaluation if color else -evaluation
 
 
@@ -45,56 +50,128 @@ def add_eval(chess_state: MyChess, color=None):
     board = chess_state.get_board()
     color = chess_state.get_turn() if color is None else color
 
-    if board.is_checkmate():
+    # A search has usually already computed the node's status for its terminal test
+    status = chess_state.node_status()
+    if status.checkmate:
         return CHECKMATEVAL if chess_state.get_turn() != color else -CHECKMATEVAL
-    if board.is_game_over():
+    if status.game_over:
         return 0
-    evaluation = 0
-    for col in range(8):
-        for row in range(8):
-            square = chess.square(col, row)
-            piece = board.piece_at(square)
-            if piece is not None:
-                evaluation += getValueAtLocation(piece, col, row)
+
+    # Searches keep a running score in an IncrementalEvaluator attached to the state; otherwise sum the whole board
+    if chess_state.evaluator is not None:
+        evaluation = chess_state.evaluator.score()
+    else:
+        evaluation = getBoardValue(board)
+
+    if chess_state.bitbases is not None:
+        bitbase_val = getBitbaseValue(chess_state.bitbases, board, evaluation)
+        if bitbase_val is not None:
+            evaluation = bitbase_val
 
     # if color is white, return white evaluation, otherwise return black.
     return evaluation if color else -evaluation
 
 
+# The value of each piece type (indexed by chess piece type) in the units of each evaluation function, for searches
+# that estimate material swings without evaluating (e.g. delta pruning)
+EVAL_PIECE_VALUES = {
+    evaluate: [0] + [abs(MyChess.mapped[chess.piece_symbol(piece_type).upper()]) for piece_type in chess.PIECE_TYPES],
+    add_eval: [0] + [value.value for value in Values],
+}
+
+
+# Returns the piece values of the given evaluation function (see EVAL_PIECE_VALUES); functions without an entry are
+# assumed to score in add_eval's units (centipawns)
+def getPieceValues(eval_func):
+    return EVAL_PIECE_VALUES.get(eval_func, EVAL_PIECE_VALUES[add_eval])
+
+
+# Returns the score (positive for white) of the given chess.Board according to the given
+# endgameBitbases.EndgameBitbases, or None if they don't cover it. A won position scores BITBASE_WIN_VAL plus the given
+# evaluation (positive for white) for the winning side, and a drawn one scores 0.
+def getBitbaseValue(bitbases, board, evaluation):
+    result = bitbases.probe_wdl(board)
+    if result is None:
+        return None
+    if result == 0:
+        return 0
+    white_wins = (result > 0) == board.turn
+    return BITBASE_WIN_VAL + evaluation if white_wins else -BITBASE_WIN_VAL + evaluation
+
+
+# Returns the sum of getValueAtLocation over every piece on the board (positive values favor white)
+def getBoardValue(board):
+    evaluation = 0
+    for (index, (piece_type, piece_color)) in enumerate(PIECE_KEYS):
+        offset = index * 64
+        for square in chess.SquareSet(board.pieces_mask(piece_type, piece_color)):
+            evaluation += ADDER_TABLE[offset + square]
+    return evaluation
+
+
+# Returns the material plus Adder bonus of the given piece at (col, row), positive for white pieces and negative for
+# black pieces
 def getValueAtLocation(piece, col, row):
-    pieceSymbol = piece.symbol()
-    pieceType = piece.piece_type
-    global adder
-
-    value = 0
-    if pieceType == chess.PAWN:
-        value = Values.PAWN.value
-        value += getLocationValue(pieceSymbol, adder.pawn, col, row)
-    elif pieceType == chess.BISHOP:
-        value = Values.BISHOP.value
-        value += getLocationValue(pieceSymbol, adder.bishop, col, row)
-    elif pieceType == chess.KNIGHT:
-        value = Values.KNIGHT.value
-        value += getLocationValue(pieceSymbol, adder.knight, col, row)
-    elif pieceType == chess.ROOK:
-        value = Values.ROOK.value
-        value += getLocationValue(pieceSymbol, adder.rook, col, row)
-    elif pieceType == chess.QUEEN:
-        value = Values.QUEEN.value
-        value += getLocationValue(pieceSymbol, adder.queen, col, row)
-    elif pieceType == chess.KING:
-        value = Values.KING.value
-        value += getLocationValue(pieceSymbol, adder.king, col, row)
-    return value if pieceSymbol.isupper() else -value
-
-
-def getLocationValue(pieceSymbol, table, col, row):
-    if pieceSymbol.isupper():
-        invertedRow = 7 - row
-        return table[invertedRow][col]
-    else:
-        return table[row][col]
+    return ADDER_TABLE[pieceIndex(piece.piece_type, piece.color) * 64 + chess.square(col, row)]
 
 
+# Returns getValueAtLocation for the given piece on the given square
+def getValueAtSquare(piece, square):
+    return ADDER_TABLE[pieceIndex(piece.piece_type, piece.color) * 64 + square]
 
 
+# Returns how much the given (legal) move changes getBoardValue, computed from the board before the move is made
+def getMoveDelta(board, move):
+    # A null move doesn't change any pieces
+    if not move:
+        return 0
+
+    piece = board.piece_at(move.from_square)
+    delta = -getValueAtSquare(piece, move.from_square)
+
+    if board.is_castling(move):
+        # The king lands on the g or c file, and the rook on the f or d file. The rook starts on the square the king
+        # "captures" if the move is encoded as king-takes-rook, and in the corner otherwise.
+        rank = chess.square_rank(move.from_square)
+        kingside = board.is_kingside_castling(move)
+        rook = chess.Piece(chess.ROOK, piece.color)
+        if board.piece_at(move.to_square) == rook:
+            rook_from = move.to_square
+        else:
+            rook_from = chess.square(7 if kingside else 0, rank)
+        king_to = chess.square(6 if kingside else 2, rank)
+        rook_to = chess.square(5 if kingside else 3, rank)
+        return delta + getValueAtSquare(piece, king_to) \
+            - getValueAtSquare(rook, rook_from) + getValueAtSquare(rook, rook_to)
+
+    if board.is_en_passant(move):
+        captured_square = move.to_square - 8 if piece.color == chess.WHITE else move.to_square + 8
+    else:
+        captured_square = move.to_square
+    captured = board.piece_at(captured_square)
+    if captured is not None:
+        delta -= getValueAtSquare(captured, captured_square)
+
+    if move.promotion:
+        piece = chess.Piece(move.promotion, piece.color)
+    return delta + getValueAtSquare(piece, move.to_square)
+
+
+# Keeps a running getBoardValue for a board that moves are pushed onto and popped off of, updating it by each move's
+# delta instead of rescanning the board. Attach one to a MyChess (chess_state.evaluator) and add_eval reads the
+# running score in O(1).
+class IncrementalEvaluator():
+    def __init__(self, board):
+        self.scores = [getBoardValue(board)]
+
+    # Returns getBoardValue of the board's current position
+    def score(self):
+        return self.scores[-1]
+
+    # Updates the score for the given move. Must be called before the move is pushed onto the board.
+    def push(self, board, move):
+        self.scores.append(self.scores[-1] + getMoveDelta(board, move))
+
+    # Reverts the score of the last pushed move
+    def pop(self):
+        self.scores.pop()
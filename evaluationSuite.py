@@ -0,0 +1,205 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# evaluationSuite.py
+
+import chess
+import evaluation
+import batchEvaluation
+from endgameBitbases import EndgameBitbases, MAX_PIECES, DEFAULT_DIRECTORY
+from myChess import MyChess
+from performanceAnalysis import BOARD_CLASSES
+import argparse
+import random
+import sys
+
+# The positions the random sequences start from, picked so that castling, en passant and promotions all come up
+EVALUATION_POSITIONS = [
+    chess.STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+    "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N w - - 0 1",
+]
+
+# The default number of random sequences played from each position, and the number of pushes and pops in each
+DEFAULT_SEQUENCES = 20
+DEFAULT_LENGTH = 60
+
+# The chance that a step of a sequence pops the last move (if there is one) instead of pushing a new one, and the
+# chance that a push is a null move (if the side to move isn't in check)
+POP_CHANCE = 0.3
+NULL_CHANCE = 0.1
+
+# The kinds of moves every run must push at least once
+MOVE_KINDS = ["castling", "en passant", "promotion", "null"]
+
+# The number of random endgame positions (with one piece more than the bitbases cover) check_batch scores the
+# children of
+DEFAULT_ENDGAMES = 100
+
+
+# Returns the kind (one of MOVE_KINDS) of the given move on the given board, or None for any other move
+def move_kind(board, move):
+    if not move:
+        return "null"
+    if move.promotion:
+        return "promotion"
+    if board.is_castling(move):
+        return "castling"
+    if board.is_en_passant(move):
+        return "en passant"
+    return None
+
+
+# Returns a message if add_eval of the given MyChess (scored by its IncrementalEvaluator) differs from add_eval of the
+# same board scored from scratch, or None if they agree
+def check_state(chess_state, step):
+    expected = evaluation.add_eval(MyChess(chess_state.board), chess.WHITE)
+    value = evaluation.add_eval(chess_state, chess.WHITE)
+    if value == expected:
+        return None
+    return "after {} ({}): add_eval {} with the IncrementalEvaluator, expected {}".format(
+        step, chess_state.board.fen(), value, expected)
+
+
+# Plays a random sequence of length pushes and pops from the given FEN on a MyChess with an IncrementalEvaluator,
+# checking add_eval after every one, and adds the kinds of the pushed moves to the given counts. Returns the first
+# mismatch message, or None.
+def check_sequence(fen, rng, counts, length=DEFAULT_LENGTH, board_class=None):
+    board = chess.Board(fen)
+    chess_state = MyChess(board if board_class is None else board_class.from_board(board))
+    chess_state.evaluator = evaluation.IncrementalEvaluator(chess_state.board)
+
+    for _ in range(length):
+        board = chess_state.board
+        if board.move_stack and rng.random() < POP_CHANCE:
+            step = "pop {}".format(chess_state.pop())
+        else:
+            moves = list(board.generate_legal_moves())
+            if not moves:
+                continue
+            if not board.is_check() and rng.random() < NULL_CHANCE:
+                move = chess.Move.null()
+            else:
+                move = rng.choice(moves)
+            kind = move_kind(board, move)
+            if kind is not None:
+                counts[kind] += 1
+            chess_state.push(move)
+            step = "push {}".format(move)
+
+        mismatch = check_state(chess_state, step)
+        if mismatch is not None:
+            return mismatch
+    return None
+
+
+# Plays sequences random sequences from every position of EVALUATION_POSITIONS on the board named board_name (a key
+# of performanceAnalysis.BOARD_CLASSES), printing a line per position. Returns the number of failures: positions with
+# a mismatch, plus any kind of MOVE_KINDS that was never pushed.
+def run_suite(sequences=DEFAULT_SEQUENCES, length=DEFAULT_LENGTH, seed=0, board_name="python-chess",
+              out=sys.stdout):
+    rng = random.Random(seed)
+    board_class = BOARD_CLASSES[board_name]
+    counts = dict.fromkeys(MOVE_KINDS, 0)
+    failures = 0
+
+    for fen in EVALUATION_POSITIONS:
+        mismatch = None
+        for _ in range(sequences):
+            mismatch = check_sequence(fen, rng, counts, length, board_class)
+            if mismatch is not None:
+                break
+        failures += mismatch is not None
+        out.write("{} {}\n".format("ok  " if mismatch is None else "FAIL", fen))
+        if mismatch is not None:
+            out.write("     {}\n".format(mismatch))
+
+    for kind in MOVE_KINDS:
+        failures += counts[kind] == 0
+        out.write("{} {} moves pushed: {}\n".format("ok  " if counts[kind] else "FAIL", kind, counts[kind]))
+    return failures
+
+
+# Returns count random legal positions (as chess.Boards, not game over) with both kings and MAX_PIECES - 1 other
+# pieces (no pawns) of random colors, so that captures lead into endgames the bitbases cover
+def endgame_positions(count, rng):
+    positions = []
+    while len(positions) < count:
+        board = chess.Board(None)
+        squares = rng.sample(chess.SQUARES, MAX_PIECES + 1)
+        board.set_piece_at(squares[0], chess.Piece(chess.KING, chess.WHITE))
+        board.set_piece_at(squares[1], chess.Piece(chess.KING, chess.BLACK))
+        for square in squares[2:]:
+            board.set_piece_at(square, chess.Piece(rng.choice(chess.PIECE_TYPES[1:5]), rng.choice(chess.COLORS)))
+        board.turn = rng.choice(chess.COLORS)
+        if board.is_valid() and not board.is_game_over():
+            positions.append(board)
+    return positions
+
+
+# Checks batchEvaluation.batchChildValues and batchAddEval against add_eval of every child of EVALUATION_POSITIONS
+# and of endgames random endgame positions, with the given endgameBitbases.EndgameBitbases attached. Prints a line per
+# kind of position; returns the number of positions with a mismatch.
+def check_batch(bitbases, endgames=DEFAULT_ENDGAMES, seed=0, out=sys.stdout):
+    # Without bitbase files, only the draws by insufficient material are covered
+    if not bitbases.available():
+        out.write("note no bitbase files in {} (generate them with python endgameBitbases.py generate)\n".format(
+            bitbases.directory))
+    rng = random.Random(seed)
+    kinds = [("positions", [chess.Board(fen) for fen in EVALUATION_POSITIONS]),
+             ("endgames", endgame_positions(endgames, rng))]
+    failures = 0
+
+    for (kind, boards) in kinds:
+        mismatch = None
+        for board in boards:
+            chess_state = MyChess(board)
+            chess_state.bitbases = bitbases
+            moves = chess_state.legal_moves()
+            expected = []
+            children = []
+            for move in moves:
+                chess_state.push(move)
+                expected.append(evaluation.add_eval(chess_state, chess.WHITE))
+                child = MyChess(chess_state.board.copy())
+                child.bitbases = bitbases
+                children.append(child)
+                chess_state.pop()
+
+            for (name, values) in [("batchChildValues", batchEvaluation.batchChildValues(chess_state, moves,
+                                                                                          chess.WHITE)),
+                                   ("batchAddEval", batchEvaluation.batchAddEval(children, chess.WHITE))]:
+                for (move, value, expected_value) in zip(moves, values, expected):
+                    if value != expected_value and mismatch is None:
+                        mismatch = "{} of {} after {}: {}, expected add_eval {}".format(
+                            name, board.fen(), move, value, expected_value)
+            if mismatch is not None:
+                failures += 1
+                break
+        out.write("{} batch evaluation of {} {}\n".format("ok  " if mismatch is None else "FAIL", len(boards), kind))
+        if mismatch is not None:
+            out.write("     {}\n".format(mismatch))
+    return failures
+
+
+# Usage:
+#   python evaluationSuite.py [--sequences N] [--length N] [--seed N] [--board python-chess|compact]
+#                             [--bitbases DIRECTORY]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checks evaluation.IncrementalEvaluator against add_eval over random "
+                                                 "push/pop sequences, and batched evaluation against add_eval with "
+                                                 "the endgame bitbases attached")
+    parser.add_argument("--sequences", type=int, default=DEFAULT_SEQUENCES, help="random sequences per position")
+    parser.add_argument("--length", type=int, default=DEFAULT_LENGTH, help="pushes and pops per sequence")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--board", choices=list(BOARD_CLASSES), default="python-chess")
+    parser.add_argument("--bitbases", default=DEFAULT_DIRECTORY,
+                        help="directory of the bitbases attached while checking batched evaluation against add_eval")
+    args = parser.parse_args(argv)
+    failures = run_suite(args.sequences, args.length, args.seed, args.board)
+    failures += check_batch(EndgameBitbases(args.bitbases), seed=args.seed)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
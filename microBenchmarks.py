@@ -0,0 +1,182 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# microBenchmarks.py
+
+import chess
+import evaluation
+from myChess import MyChess
+from performanceAnalysis import BOARD_CLASSES, SUITE_PATH, SUITE_VERSION, load_suite
+import argparse
+import json
+import os
+import platform
+import sys
+from time import perf_counter
+
+# The default number of times each primitive is timed on every position (the fastest run is kept), and the number of
+# calls per run
+DEFAULT_REPEAT = 5
+DEFAULT_CALLS = 200
+
+# compare flags a primitive whose ops/sec dropped by more than this fraction
+DEFAULT_THRESHOLD = 0.10
+
+
+# Returns a MyChess over a fresh board of the given chess.Board's position, on the given board class
+def make_state(board, board_class=None):
+    if board_class is None:
+        return MyChess(board.copy())
+    return MyChess(board_class.from_board(board))
+
+
+# Returns the first legal move (in UCI order) of the given chess.Board, the move the primitives make, try or check
+def first_move(board):
+    return min(move.uci() for move in board.legal_moves)
+
+
+# Makes and unmakes the given move on the given MyChess
+def push_pop(chess_state, move):
+    chess_state.push(move)
+    chess_state.pop()
+
+
+# The primitives to time, as (name, setup, call). setup(board, board_class) runs untimed and returns the argument of
+# a single call; call(argument) is the operation timed.
+PRIMITIVES = [
+    ("MyChess.str_legal_moves",
+     lambda board, board_class: make_state(board, board_class),
+     lambda chess_state: chess_state.str_legal_moves()),
+    ("MyChess.is_move_legal",
+     lambda board, board_class: (make_state(board, board_class), first_move(board)),
+     lambda argument: argument[0].is_move_legal(argument[1])),
+    ("MyChess.try_move",
+     lambda board, board_class: (make_state(board, board_class), first_move(board)),
+     lambda argument: argument[0].try_move(argument[1])),
+    ("MyChess.execute_move",
+     lambda board, board_class: (make_state(board, board_class), first_move(board)),
+     lambda argument: argument[0].execute_move(argument[1])),
+    ("MyChess.legal_moves",
+     lambda board, board_class: make_state(board, board_class),
+     lambda chess_state: chess_state.legal_moves()),
+    ("MyChess.push+pop",
+     lambda board, board_class: (make_state(board, board_class), chess.Move.from_uci(first_move(board))),
+     lambda argument: push_pop(*argument)),
+    ("MyChess.node_status",
+     lambda board, board_class: make_state(board, board_class),
+     lambda chess_state: chess_state.node_status()),
+    ("MyChess.search_copy",
+     lambda board, board_class: make_state(board, board_class),
+     lambda chess_state: chess_state.search_copy()),
+    ("evaluation.evaluate",
+     lambda board, board_class: make_state(board, board_class),
+     lambda chess_state: evaluation.evaluate(chess_state, chess.WHITE)),
+    ("evaluation.add_eval",
+     lambda board, board_class: make_state(board, board_class),
+     lambda chess_state: evaluation.add_eval(chess_state, chess.WHITE)),
+]
+
+# The primitives that change or cache state in their argument, and so need a fresh one per call
+FRESH_PRIMITIVES = {"MyChess.execute_move", "MyChess.node_status", "evaluation.add_eval"}
+
+
+# Returns the fastest of repeat timings (in seconds) of calls calls of the given primitive on the given chess.Board
+def time_primitive(name, setup, call, board, board_class=None, repeat=DEFAULT_REPEAT, calls=DEFAULT_CALLS):
+    best = None
+    for _ in range(repeat):
+        if name in FRESH_PRIMITIVES:
+            arguments = [setup(board, board_class) for _ in range(calls)]
+        else:
+            arguments = [setup(board, board_class)] * calls
+        start = perf_counter()
+        for argument in arguments:
+            call(argument)
+        seconds = perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+# Times every primitive (of the given names, or all of them) on every position of the suite, on the board named
+# board_name (a key of performanceAnalysis.BOARD_CLASSES), printing a line per primitive. Returns the report as a dict.
+def run_benchmarks(names=None, repeat=DEFAULT_REPEAT, calls=DEFAULT_CALLS, suite_path=SUITE_PATH,
+                   board_name="python-chess", out=sys.stdout):
+    positions = [board for (_, _, board) in load_suite(suite_path) if not board.is_game_over()]
+    board_class = BOARD_CLASSES[board_name]
+    primitives = {}
+
+    for (name, setup, call) in PRIMITIVES:
+        if names is not None and name not in names:
+            continue
+        seconds = sum(time_primitive(name, setup, call, board, board_class, repeat, calls) for board in positions)
+        ops = calls * len(positions)
+        primitives[name] = {"ops": ops, "seconds": seconds, "ops_per_sec": ops / seconds if seconds > 0 else None}
+        out.write("{:<26} {:>10.0f} ops/s\n".format(name, primitives[name]["ops_per_sec"] or 0))
+        out.flush()
+
+    return {
+        "suite": os.path.basename(suite_path),
+        "suite_version": SUITE_VERSION,
+        "python": platform.python_version(),
+        "chess": chess.__version__,
+        "board": board_name,
+        "repeat": repeat,
+        "calls": calls,
+        "primitives": primitives,
+    }
+
+
+# Compares a report against a baseline report (both as dicts from run_benchmarks). Returns a list of
+# (primitive, message) for every primitive present in both whose ops/sec dropped by more than threshold (a fraction).
+def compare_reports(baseline, current, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    if baseline.get("suite") != current.get("suite"):
+        regressions.append(("suite", "baseline is {} but current is {}".format(baseline.get("suite"),
+                                                                                current.get("suite"))))
+        return regressions
+
+    for (name, base) in baseline["primitives"].items():
+        now = current["primitives"].get(name)
+        if now is None or not base["ops_per_sec"] or not now["ops_per_sec"]:
+            continue
+        if now["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            regressions.append((name, "ops/s {:.0f} -> {:.0f} ({:+.1%})".format(
+                base["ops_per_sec"], now["ops_per_sec"], now["ops_per_sec"] / base["ops_per_sec"] - 1)))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Times each MyChess and evaluation primitive in isolation")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="time the primitives and write a JSON report")
+    run_parser.add_argument("--primitives", nargs="+", default=None, choices=[name for (name, _, _) in PRIMITIVES])
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs per position; the fastest is kept")
+    run_parser.add_argument("--calls", type=int, default=DEFAULT_CALLS, help="calls per run")
+    run_parser.add_argument("--suite", default=SUITE_PATH, help="EPD file of positions")
+    run_parser.add_argument("--board", choices=list(BOARD_CLASSES), default="python-chess",
+                            help="the board the primitives run on")
+    run_parser.add_argument("-o", "--output", default=None, help="file to write the JSON report to")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions of a report against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="allowed fractional drop in ops/sec")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run_benchmarks(args.primitives, args.repeat, args.calls, args.suite, args.board)
+        if args.output is not None:
+            with open(args.output, "w") as report_file:
+                json.dump(report, report_file, indent=2)
+        return 0
+
+    with open(args.baseline) as baseline_file, open(args.current) as current_file:
+        regressions = compare_reports(json.load(baseline_file), json.load(current_file), args.threshold)
+    for (name, message) in regressions:
+        print("REGRESSION {}: {}".format(name, message))
+    if not regressions:
+        print("no regressions beyond {:.0%}".format(args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
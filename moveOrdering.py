@@ -0,0 +1,112 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# moveOrdering.py
+
+import chess
+from staticExchange import is_losing_capture
+
+# Piece values used to rank captures (most valuable victim, least valuable attacker), indexed by piece type
+MVV_LVA_VALUES = [0, 1, 3, 3, 5, 9, 20]
+
+# Sort keys of each class of move. Within a class, moves are ranked as described in MoveOrderer.order; the classes
+# are spaced so that their ranges never overlap.
+FIRST_MOVE_SCORE = 1 << 40
+CAPTURE_SCORE = 1 << 36
+PROMOTION_SCORE = 1 << 34
+KILLER_SCORE = 1 << 32
+BAD_CAPTURE_SCORE = 1 << 30
+
+# The number of killer moves kept per ply
+NUM_KILLERS = 2
+
+# Once a history score passes this, the whole history table is halved, which keeps every history score far below
+# BAD_CAPTURE_SCORE (a single cutoff adds at most MAX_SEARCH_DEPTH squared)
+MAX_HISTORY = 1 << 20
+
+
+# Orders moves so that alpha-beta cutoffs happen as early as possible. Moves are searched in the order:
+#  1. the first move given (the transposition table or principal variation move)
+#  2. captures that don't lose material (see staticExchange), by most valuable victim and then least valuable attacker
+#     (MVV-LVA)
+#  3. promotions, queen first
+#  4. killer moves: quiet moves that caused a cutoff at the same ply elsewhere in the tree
+#  5. captures that lose material, by MVV-LVA
+#  6. the remaining quiet moves, by how often (and how deep) they have caused cutoffs (the history heuristic)
+# It also counts cutoffs, to measure how often the first move searched is good enough to cut off.
+class MoveOrderer():
+    def __init__(self):
+        self.killers = []
+        # Indexed by color * 4096 + from_square * 64 + to_square, and bounded by MAX_HISTORY
+        self.history = [0] * (2 * 64 * 64)
+        self.reset_counters()
+
+    # Resets the cutoff counters
+    def reset_counters(self):
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    # Prepares for a new search: clears the killers, ages the history and resets the counters
+    def new_search(self):
+        self.killers = []
+        self.history = [value // 2 for value in self.history]
+        self.reset_counters()
+
+    # Returns the sort key of the given move from the given board position, at the given ply
+    def score_move(self, board, move, ply, first_move):
+        if move == first_move:
+            return FIRST_MOVE_SCORE
+
+        if board.is_capture(move):
+            # En passant is the only capture with an empty destination square
+            victim = board.piece_type_at(move.to_square) or chess.PAWN
+            attacker = board.piece_type_at(move.from_square)
+            promotion = MVV_LVA_VALUES[move.promotion] if move.promotion else 0
+            score = (MVV_LVA_VALUES[victim] + promotion) * 64 - MVV_LVA_VALUES[attacker]
+            return (BAD_CAPTURE_SCORE if is_losing_capture(board, move) else CAPTURE_SCORE) + score
+
+        if move.promotion:
+            return PROMOTION_SCORE + move.promotion
+
+        if ply < len(self.killers) and move in self.killers[ply]:
+            return KILLER_SCORE + NUM_KILLERS - self.killers[ply].index(move)
+
+        return self.history[board.turn * 4096 + move.from_square * 64 + move.to_square]
+
+    # Returns the given moves from the given board position (at the given ply of the search), sorted in the order
+    # they should be searched. If first_move is given, it is searched first.
+    def order(self, board, moves, ply, first_move=None):
+        return sorted(moves, key=lambda move: self.score_move(board, move, ply, first_move), reverse=True)
+
+    # Records that the given move (the index-th move searched) caused a cutoff at the given ply, with the given
+    # remaining depth. Must be called with the board in the position the move was made from.
+    def record_cutoff(self, board, move, ply, depth, index):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        # Only quiet moves are remembered, since captures and promotions are searched early anyway
+        if board.is_capture(move) or move.promotion:
+            return
+
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[NUM_KILLERS:]
+
+        index = board.turn * 4096 + move.from_square * 64 + move.to_square
+        self.history[index] += depth * depth
+        if self.history[index] > MAX_HISTORY:
+            self.history = [value // 2 for value in self.history]
+
+    # Returns the fraction of cutoffs caused by the first move searched
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    # Returns the cutoff counters as a dict
+    def get_stats(self):
+        return {
+            "cutoffs": self.cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate(),
+        }
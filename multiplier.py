@@ -1,127 +1,157 @@
 # Authors: Drake Moore, John Lam, Nathan Cheng
 # multiplier.py
 
+from array import array
+
+# The tables below are laid out as seen from white's side of the board: table[0] is the 8th rank, and table[7] the
+# 1st. Black reads the same tables flipped vertically.
+PIECE_NAMES = ["pawn", "knight", "bishop", "rook", "queen", "king"]
+
+
+# Returns the piece index (0-11) used by the flattened tables: 0-5 for white and 6-11 for black, in the order of
+# PIECE_NAMES (which matches chess.PAWN through chess.KING)
+def pieceIndex(piece_type, color):
+    return piece_type - 1 if color else piece_type + 5
+
+
+# Flattens the per-piece 8x8 tables of the given class (Adder or Multiplier) into one 12x64 array indexed by
+# pieceIndex(piece_type, color) * 64 + square (squares as in python-chess, a1 = 0 to h8 = 63).
+# If material is given (a list of six values in the order of PIECE_NAMES), it is added to every entry, and the
+# black half of the table is negated so that entries are signed in white's favor.
+def flattenTables(tables, material=None, typecode='d'):
+    flat = array(typecode, [0] * (12 * 64))
+    for (type_index, name) in enumerate(PIECE_NAMES):
+        table = getattr(tables, name)
+        for square in range(64):
+            col, row = square % 8, square // 8
+            white_value = table[7 - row][col]
+            black_value = table[row][col]
+            if material is not None:
+                white_value = material[type_index] + white_value
+                black_value = -(material[type_index] + black_value)
+            flat[type_index * 64 + square] = white_value
+            flat[(type_index + 6) * 64 + square] = black_value
+    return flat
+
+
 class Multiplier():
+    king = \
+        [[-4.0, -5.0, -5.0, -6.0, -6.0, -5.0, -5.0, -4.0],
+         [-4.0, -5.0, -5.0, -6.0, -6.0, -5.0, -5.0, -4.0],
+         [-4.0, -5.0, -5.0, -6.0, -6.0, -5.0, -5.0, -4.0],
+         [-4.0, -5.0, -5.0, -6.0, -6.0, -5.0, -5.0, -4.0],
+         [-3.0, -4.0, -4.0, -5.0, -5.0, -4.0, -4.0, -3.0],
+         [-2.0, -3.0, -3.0, -3.0, -3.0, -3.0, -3.0, -2.0],
+         [3.0, 3.0, 1.0, 1.0, 1.0, 1.0, 3.0, 3.0],
+         [3.0, 4.0, 2.0, 1.0, 1.0, 2.0, 4.0, 3.0]]
+
+    queen = \
+        [[-3.0, -2.0, -2.0, -1.5, -1.5, -2.0, -2.0, -3.0],
+         [-2.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -2.0],
+         [-2.0, 1.0, 1.5, 1.5, 1.5, 1.5, 1.0, -2.0],
+         [-1.5, 1.0, 1.5, 1.5, 1.5, 1.5, 1.0, -1.5],
+         [1.0, 1.0, 1.5, 1.5, 1.5, 1.5, 1.0, -1.5],
+         [-2.0, 1.5, 1.5, 1.5, 1.5, 1.5, 1.0, -2.0],
+         [-2.0, 1.0, 1.5, 1.0, 1.0, 1.0, 1.0, -2.0],
+         [-3.0, -2.0, -2.0, -1.5, -1.5, -2.0, -2.0, -3.0]]
 
-    def __init__(self):
-        self.king = \
-            [[-4.0, -5.0, -5.0, -6.0, -6.0, -5.0, -5.0, -4.0],
-             [-4.0, -5.0, -5.0, -6.0, -6.0, -5.0, -5.0, -4.0],
-             [-4.0, -5.0, -5.0, -6.0, -6.0, -5.0, -5.0, -4.0],
-             [-4.0, -5.0, -5.0, -6.0, -6.0, -5.0, -5.0, -4.0],
-             [-3.0, -4.0, -4.0, -5.0, -5.0, -4.0, -4.0, -3.0],
-             [-2.0, -3.0, -3.0, -3.0, -3.0, -3.0, -3.0, -2.0],
-             [3.0, 3.0, 1.0, 1.0, 1.0, 1.0, 3.0, 3.0],
-             [3.0, 4.0, 2.0, 1.0, 1.0, 2.0, 4.0, 3.0]]
-
-        self.queen = \
-            [[-3.0, -2.0, -2.0, -1.5, -1.5, -2.0, -2.0, -3.0],
-             [-2.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -2.0],
-             [-2.0, 1.0, 1.5, 1.5, 1.5, 1.5, 1.0, -2.0],
-             [-1.5, 1.0, 1.5, 1.5, 1.5, 1.5, 1.0, -1.5],
-             [1.0, 1.0, 1.5, 1.5, 1.5, 1.5, 1.0, -1.5],
-             [-2.0, 1.5, 1.5, 1.5, 1.5, 1.5, 1.0, -2.0],
-             [-2.0, 1.0, 1.5, 1.0, 1.0, 1.0, 1.0, -2.0],
-             [-3.0, -2.0, -2.0, -1.5, -1.5, -2.0, -2.0, -3.0]]
-
-        self.rook = \
-            [[1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-             [1.5, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 1.5],
-             [-1.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.5],
-             [-1.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.5],
-             [-1.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.5],
-             [-1.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.5],
-             [-1.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.5],
-             [1.0, 1.0, 1.0, 1.5, 1.5, 1.0, 1.0, 1.0]]
-
-        self.bishop = \
-            [[-3.0, -2.0, -2.0, -2.0, -2.0, -2.0, -2.0, -3.0],
-             [-2.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -2.0],
-             [-2.0, 1.0, 1.5, 2.0, 2.0, 1.5, 1.0, -2.0],
-             [-2.0, 1.5, 1.5, 2.0, 2.0, 1.5, 1.5, -2.0],
-             [-2.0, 1.0, 2.0, 2.0, 2.0, 2.0, 1.0, -2.0],
-             [-2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, -2.0],
-             [-2.0, 1.5, 1.0, 1.0, 1.0, 1.0, 1.5, -2.0],
-             [-3.0, -2.0, -2.0, -2.0, -2.0, -2.0, -2.0, -3.0]]
-
-        self.knight = \
-            [[-6.0, -5.0, -4.0, -4.0, -4.0, -4.0, -5.0, -6.0],
-             [-5.0, -3.0, 1.0, 1.0, 1.0, 1.0, -3.0, -5.0],
-             [-4.0, 1.0, 2.0, 2.5, 2.5, 2.0, 1.0, -4.0],
-             [-4.0, 1.5, 2.5, 3.0, 3.0, 2.5, 1.0, -4.0],
-             [-4.0, 1.0, 2.5, 3.0, 3.0, 2.5, 1.0, -4.0],
-             [-4.0, 1.5, 2.0, 2.5, 2.5, 2.0, 1.5, -4.0],
-             [-5.0, -3.0, 1.0, 1.5, 1.5, 1.0, -3.0, -5.0],
-             [-6.0, -5.0, -4.0, -4.0, -4.0, -4.0, -5.0, -6.0]]
-
-        self.pawn = \
-            [[1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-             [6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0],
-             [2.0, 2.0, 3.0, 4.0, 4.0, 3.0, 2.0, 2.0],
-             [1.5, 1.5, 2.0, 3.0, 3.0, 2.0, 1.5, 1.5],
-             [1.0, 1.0, 1.0, 3.0, 3.0, 1.0, 1.0, 1.0],
-             [1.5, -1.5, -2.0, 1.0, 1.0, -2.0, -1.5, 1.5],
-             [1.5, 2.0, 2.0, -3.0, -3.0, 2.0, 2.0, 1.5],
-             [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0]]
+    rook = \
+        [[1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+         [1.5, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 1.5],
+         [-1.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.5],
+         [-1.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.5],
+         [-1.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.5],
+         [-1.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.5],
+         [-1.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.5],
+         [1.0, 1.0, 1.0, 1.5, 1.5, 1.0, 1.0, 1.0]]
+
+    bishop = \
+        [[-3.0, -2.0, -2.0, -2.0, -2.0, -2.0, -2.0, -3.0],
+         [-2.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -2.0],
+         [-2.0, 1.0, 1.5, 2.0, 2.0, 1.5, 1.0, -2.0],
+         [-2.0, 1.5, 1.5, 2.0, 2.0, 1.5, 1.5, -2.0],
+         [-2.0, 1.0, 2.0, 2.0, 2.0, 2.0, 1.0, -2.0],
+         [-2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, -2.0],
+         [-2.0, 1.5, 1.0, 1.0, 1.0, 1.0, 1.5, -2.0],
+         [-3.0, -2.0, -2.0, -2.0, -2.0, -2.0, -2.0, -3.0]]
+
+    knight = \
+        [[-6.0, -5.0, -4.0, -4.0, -4.0, -4.0, -5.0, -6.0],
+         [-5.0, -3.0, 1.0, 1.0, 1.0, 1.0, -3.0, -5.0],
+         [-4.0, 1.0, 2.0, 2.5, 2.5, 2.0, 1.0, -4.0],
+         [-4.0, 1.5, 2.5, 3.0, 3.0, 2.5, 1.0, -4.0],
+         [-4.0, 1.0, 2.5, 3.0, 3.0, 2.5, 1.0, -4.0],
+         [-4.0, 1.5, 2.0, 2.5, 2.5, 2.0, 1.5, -4.0],
+         [-5.0, -3.0, 1.0, 1.5, 1.5, 1.0, -3.0, -5.0],
+         [-6.0, -5.0, -4.0, -4.0, -4.0, -4.0, -5.0, -6.0]]
+
+    pawn = \
+        [[1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+         [6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0, 6.0],
+         [2.0, 2.0, 3.0, 4.0, 4.0, 3.0, 2.0, 2.0],
+         [1.5, 1.5, 2.0, 3.0, 3.0, 2.0, 1.5, 1.5],
+         [1.0, 1.0, 1.0, 3.0, 3.0, 1.0, 1.0, 1.0],
+         [1.5, -1.5, -2.0, 1.0, 1.0, -2.0, -1.5, 1.5],
+         [1.5, 2.0, 2.0, -3.0, -3.0, 2.0, 2.0, 1.5],
+         [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0]]
 
 class Adder():
-    def __init__(self):
-        self.king = \
-            [[-30, -40, -40, -50, -50, -40, -40, -30],
-             [-30, -40, -40, -50, -50, -40, -40, -30],
-             [-30, -40, -40, -50, -50, -40, -40, -30],
-             [-30, -40, -40, -50, -50, -40, -40, -30],
-             [-20, -30, -30, -40, -40, -30, -30, -20],
-             [-10, -20, -20, -20, -20, -20, -20, -10],
-             [20, 20, 0, 0, 0, 0, 20, 20],
-             [20, 30, 10, 0, 0, 10, 30, 20]]
-
-        self.queen = \
-            [[-20, -10, -10, -5, -5, -10, -10, -20],
-             [-10,  0,  0,  0,  0,  0,  0, -10],
-             [-10,  0,  5,  5,  5,  5,  0, -10],
-             [-5,  0,  5,  5,  5,  5,  0, -5],
-             [0,  0,  5,  5,  5,  5,  0, -5],
-             [-10,  5,  5,  5,  5,  5,  0, -10],
-             [-10,  0,  5,  0,  0,  0,  0, -10],
-             [-20, -10, -10, -5, -5, -10, -10, -20]]
-
-        self.rook = \
-            [[0,  0,  0,  0,  0,  0,  0,  0],
-             [5, 10, 10, 10, 10, 10, 10,  5],
-             [-5,  0,  0,  0,  0,  0,  0, -5],
-             [-5,  0,  0,  0,  0,  0,  0, -5],
-             [-5,  0,  0,  0,  0,  0,  0, -5],
-             [-5,  0,  0,  0,  0,  0,  0, -5],
-             [-5,  0,  0,  0,  0,  0,  0, -5],
-             [0,  0,  0,  5,  5,  0,  0,  0]]
-
-        self.bishop = \
-            [[-20, -10, -10, -10, -10, -10, -10, -20],
-            [-10,  0,  0,  0,  0,  0,  0, -10],
-            [-10,  0,  5, 10, 10,  5,  0, -10],
-            [-10,  5,  5, 10, 10,  5,  5, -10],
-            [-10,  0, 10, 10, 10, 10,  0, -10],
-            [-10, 10, 10, 10, 10, 10, 10, -10],
-            [-10,  5,  0,  0,  0,  0,  5, -10],
-            [-20, -10, -10, -10, -10, -10, -10, -20]]
-
-        self.knight = \
-            [[-50, -40, -30, -30, -30, -30, -40, -50],
-            [-40, -20,  0,  0,  0,  0, -20, -40],
-            [-30,  0, 10, 15, 15, 10,  0, -30],
-            [-30,  5, 15, 20, 20, 15,  5, -30],
-            [-30,  0, 15, 20, 20, 15,  0, -30],
-            [-30,  5, 10, 15, 15, 10,  5, -30],
-            [-40, -20,  0,  5,  5,  0, -20, -40],
-            [-50, -40, -30, -30, -30, -30, -40, -50]]
-
-        self.pawn = \
-            [[0,  0,  0,  0,  0,  0,  0,  0],
-            [50, 50, 50, 50, 50, 50, 50, 50],
-            [10, 10, 20, 30, 30, 20, 10, 10],
-            [5,  5, 10, 25, 25, 10,  5,  5],
-            [0,  0,  0, 20, 20,  0,  0,  0],
-            [5, -5, -10,  0,  0, -10, -5,  5],
-            [5, 10, 10, -20, -20, 10, 10,  5],
-            [0,  0,  0,  0,  0,  0,  0,  0]]
\ No newline at end of file
+    king = \
+        [[-30, -40, -40, -50, -50, -40, -40, -30],
+         [-30, -40, -40, -50, -50, -40, -40, -30],
+         [-30, -40, -40, -50, -50, -40, -40, -30],
+         [-30, -40, -40, -50, -50, -40, -40, -30],
+         [-20, -30, -30, -40, -40, -30, -30, -20],
+         [-10, -20, -20, -20, -20, -20, -20, -10],
+         [20, 20, 0, 0, 0, 0, 20, 20],
+         [20, 30, 10, 0, 0, 10, 30, 20]]
+
+    queen = \
+        [[-20, -10, -10, -5, -5, -10, -10, -20],
+         [-10,  0,  0,  0,  0,  0,  0, -10],
+         [-10,  0,  5,  5,  5,  5,  0, -10],
+         [-5,  0,  5,  5,  5,  5,  0, -5],
+         [0,  0,  5,  5,  5,  5,  0, -5],
+         [-10,  5,  5,  5,  5,  5,  0, -10],
+         [-10,  0,  5,  0,  0,  0,  0, -10],
+         [-20, -10, -10, -5, -5, -10, -10, -20]]
+
+    rook = \
+        [[0,  0,  0,  0,  0,  0,  0,  0],
+         [5, 10, 10, 10, 10, 10, 10,  5],
+         [-5,  0,  0,  0,  0,  0,  0, -5],
+         [-5,  0,  0,  0,  0,  0,  0, -5],
+         [-5,  0,  0,  0,  0,  0,  0, -5],
+         [-5,  0,  0,  0,  0,  0,  0, -5],
+         [-5,  0,  0,  0,  0,  0,  0, -5],
+         [0,  0,  0,  5,  5,  0,  0,  0]]
+
+    bishop = \
+        [[-20, -10, -10, -10, -10, -10, -10, -20],
+        [-10,  0,  0,  0,  0,  0,  0, -10],
+        [-10,  0,  5, 10, 10,  5,  0, -10],
+        [-10,  5,  5, 10, 10,  5,  5, -10],
+        [-10,  0, 10, 10, 10, 10,  0, -10],
+        [-10, 10, 10, 10, 10, 10, 10, -10],
+        [-10,  5,  0,  0,  0,  0,  5, -10],
+        [-20, -10, -10, -10, -10, -10, -10, -20]]
+
+    knight = \
+        [[-50, -40, -30, -30, -30, -30, -40, -50],
+        [-40, -20,  0,  0,  0,  0, -20, -40],
+        [-30,  0, 10, 15, 15, 10,  0, -30],
+        [-30,  5, 15, 20, 20, 15,  5, -30],
+        [-30,  0, 15, 20, 20, 15,  0, -30],
+        [-30,  5, 10, 15, 15, 10,  5, -30],
+        [-40, -20,  0,  5,  5,  0, -20, -40],
+        [-50, -40, -30, -30, -30, -30, -40, -50]]
+
+    pawn = \
+        [[0,  0,  0,  0,  0,  0,  0,  0],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [10, 10, 20, 30, 30, 20, 10, 10],
+        [5,  5, 10, 25, 25, 10,  5,  5],
+        [0,  0,  0, 20, 20,  0,  0,  0],
+        [5, -5, -10,  0,  0, -10, -5,  5],
+        [5, 10, 10, -20, -20, 10, 10,  5],
+        [0,  0,  0,  0,  0,  0,  0,  0]]
\ No newline at end of file
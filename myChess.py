@@ -6,6 +6,31 @@ import chess
 import chess.pgn
 
 
+# The status of a single position, computed once and shared by everything that asks about the node: the terminal
+# test, the evaluation and move iteration. The legal moves are only generated in full when asked for, and must be
+# asked for before the board changes. If check_repetition is False, fivefold repetition is not checked for (the cheap
+# mode searches use, since scanning the move stack at every node is costly and repetitions rarely matter in a search).
+class NodeStatus():
+    def __init__(self, board, check_repetition=True):
+        self.board = board
+        self.moves = None
+        self.in_check = board.is_check()
+        self.has_moves = any(board.generate_legal_moves())
+        self.checkmate = self.in_check and not self.has_moves
+        self.stalemate = not self.in_check and not self.has_moves
+        # The draws board.is_game_over() recognizes without a claim
+        self.draw = self.stalemate or board.is_insufficient_material() or \
+            (board.halfmove_clock >= 150 and self.has_moves) or \
+            (check_repetition and board.is_fivefold_repetition())
+        self.game_over = self.checkmate or self.draw
+
+    # returns the legal moves of the position as chess.Move objects, generated on the first call
+    def legal_moves(self):
+        if self.moves is None:
+            self.moves = list(self.board.generate_legal_moves()) if self.has_moves else []
+        return self.moves
+
+
 class MyChess():
     # maps values to each of the pieces
     mapped = {
@@ -23,14 +48,29 @@ class MyChess():
         'k': -100  # Black King
     }
 
+    # The value of each piece type (indexed by chess piece type), as in mapped
+    PIECE_VALUES = [0, 1, 3, 3, 5, 9, 100]
+
+    # MyChess objects are created at every search and copied for every search thread, so they keep a fixed set of
+    # attributes and only create the pgn game once a move is executed
+    __slots__ = ("board", "pgnGame", "pgn", "evaluator", "bitbases", "status", "check_repetition")
+
     def __init__(self, board=None):
         if board is None:
             board = chess.Board()
 
         self.board = board
-        self.pgnGame = chess.pgn.Game()
-        self.pgn = self.pgnGame
-
+        # The pgn game of the moves executed on this object, and its current node (created by get_pgn)
+        self.pgnGame = None
+        self.pgn = None
+        # An optional evaluation.IncrementalEvaluator, kept up to date with every move made through this object
+        self.evaluator = None
+        # An optional endgameBitbases.EndgameBitbases, which add_eval checks for a known result in endgames
+        self.bitbases = None
+        # The NodeStatus of the current position, once asked for (cleared by every move made or unmade through this
+        # object), and whether it checks for repetitions
+        self.status = None
+        self.check_repetition = True
 
     # gets the current board
     def get_board(self):
@@ -70,46 +110,69 @@ class MyChess():
 
     # gets the pgn of the whole game
     def get_pgn(self):
+        if self.pgnGame is None:
+            self.pgnGame = chess.pgn.Game()
+            self.pgn = self.pgnGame
         return self.pgnGame
 
-    # returns an integer representation of the board based on piece values
+    # The methods below query the position straight from the board's bitboards (chess.SquareSet masks, with bit i set
+    # for a piece on square i)
+
+    # returns the bitboard of the given color's pieces of the given type
+    def piece_mask(self, piece_type, color):
+        return self.board.pieces_mask(piece_type, color)
+
+    # returns the number of the given color's pieces of the given type
+    def count_pieces(self, piece_type, color):
+        return chess.popcount(self.board.pieces_mask(piece_type, color))
+
+    # returns the number of each of the given color's piece types, as a list indexed by chess piece type
+    def piece_counts(self, color):
+        board = self.board
+        occupied = board.occupied_co[color]
+        return [0, chess.popcount(board.pawns & occupied), chess.popcount(board.knights & occupied),
+                chess.popcount(board.bishops & occupied), chess.popcount(board.rooks & occupied),
+                chess.popcount(board.queens & occupied), chess.popcount(board.kings & occupied)]
+
+    # returns the material (in PIECE_VALUES, without the king) of the given color
+    def material(self, color):
+        counts = self.piece_counts(color)
+        values = MyChess.PIECE_VALUES
+        return sum(values[piece_type] * counts[piece_type] for piece_type in range(chess.PAWN, chess.KING))
+
+    # returns the material (in PIECE_VALUES) of the given color's knights, bishops, rooks and queens
+    def non_pawn_material(self, color):
+        return self.material(color) - self.count_pieces(chess.PAWN, color) * MyChess.PIECE_VALUES[chess.PAWN]
+
+    # returns the material of white minus the material of black
+    def material_balance(self):
+        return self.material(chess.WHITE) - self.material(chess.BLACK)
+
+    # returns an integer representation of the board based on piece values: the mapped value of the piece on each
+    # square (0 if empty), from a8 to h8 down to a1 to h1
     @staticmethod
     def convert_to_int(board):
-        epd_string = board.epd()
-        list_int = []
-        for i in epd_string:
-            if i == " ":
-                return list_int
-            elif i != "/":
-                if i in MyChess.mapped:
-                    list_int.append(MyChess.mapped[i])
-                else:
-                    for counter in range(0, int(i)):
-                        list_int.append(0)
+        list_int = [0] * 64
+        for (square, piece) in board.piece_map().items():
+            list_int[chess.square_mirror(square)] = MyChess.mapped[piece.symbol()]
+        return list_int
 
     # returns a list of all the pieces on the board in the form of (piece, (x, y))
     # piece is a string in {'P', 'B', 'N', 'R', 'Q', 'K', 'p', 'b', 'n', 'r', 'q', 'k'}. Uppercase letters represent
     # white pieces, and lowercase black pieces.
     # (x, y) are the of the piece's location (top-left is (0, 0)).
     def get_piece_list(self):
-        epd_string = self.board.epd()
-
-        piece_list = []
-        cur_x, cur_y = 0, 0
-        for char in epd_string:
-            if char == " ":
-                return piece_list
-            elif char != "/":
-                if char.isnumeric():
-                    cur_x += int(char) - 1
-                else:
-                    piece_list.append((char, (cur_x, cur_y)))
-
-                if cur_x == 7:
-                    cur_x = 0
-                    cur_y += 1
-                else:
-                    cur_x += 1
+        board = self.board
+        pieces = []
+        for color in chess.COLORS:
+            for piece_type in chess.PIECE_TYPES:
+                symbol = chess.piece_symbol(piece_type)
+                symbol = symbol.upper() if color else symbol
+                # Mirrored squares sort from a8 to h8 down to a1 to h1, the reading order of the board
+                pieces.extend((chess.square_mirror(square), symbol)
+                              for square in chess.scan_forward(board.pieces_mask(piece_type, color)))
+        pieces.sort()
+        return [(symbol, (square & 7, square >> 3)) for (square, symbol) in pieces]
 
     # Gets the piece at the given pos (in the format of 'filerank' as a string, such as 'a1'),
     # or None if none exists
@@ -135,7 +198,11 @@ class MyChess():
         if not self.is_move_legal(move):
             raise ValueError("{} is not a legal move".format(move))
 
+        if self.evaluator is not None:
+            self.evaluator.push(self.board, chess.Move.from_uci(move))
         self.board.push(chess.Move.from_uci(move))
+        self.status = None
+        self.get_pgn()
         self.pgn = self.pgn.add_variation(chess.Move.from_uci(move))
         return self.board
 
@@ -151,7 +218,7 @@ class MyChess():
 
     # returns a list of legal moves in string format
     def str_legal_moves(self):
-        legal_moves = list(self.board.legal_moves)
+        legal_moves = list(self.board.generate_legal_moves())
         str_legal_moves = list(map(str, legal_moves))
         return str_legal_moves
 
@@ -159,17 +226,47 @@ class MyChess():
     def is_move_legal(self, move):
         return move in self.str_legal_moves()
 
+    # The methods below are the search-internal mode: a search makes and unmakes chess.Move objects on one shared
+    # board, with no string conversion, legality re-check, board copy or pgn bookkeeping per move. Moves passed to
+    # push must come from legal_moves.
+
+    # returns a list of legal moves as chess.Move objects
+    def legal_moves(self):
+        if self.status is not None:
+            return list(self.status.legal_moves())
+        return list(self.board.generate_legal_moves())
+
+    # returns the NodeStatus of the current position, computing it on the first call after each move
+    def node_status(self):
+        if self.status is None:
+            self.status = NodeStatus(self.board, self.check_repetition)
+        return self.status
+
+    # makes the given legal move on the current board (note that this modifies the current gamestate)
+    def push(self, move: chess.Move):
+        if self.evaluator is not None:
+            self.evaluator.push(self.board, move)
+        self.board.push(move)
+        self.status = None
+
+    # unmakes the last move made on the current board, and returns it
+    def pop(self):
+        if self.evaluator is not None:
+            self.evaluator.pop()
+        self.status = None
+        return self.board.pop()
+
+    # returns a new MyChess holding a copy of the current board, for a search to push/pop moves on. If board_class is
+    # given (e.g. compactBoard.CompactBoard), the copy is converted to it with board_class.from_board.
+    def search_copy(self, board_class=None):
+        if board_class is None:
+            return MyChess(self.board.copy())
+        return MyChess(board_class.from_board(self.board))
+
     def __str__(self):
         return str(self.board)
 
+    # returns the number of the given color's pieces other than pawns (including the king)
     def get_num_pieces(self, color):
-        num = 0
-        for val in self.convert_to_int(self.board):
-            if color:
-                if val > 2:
-                    num += 1
-            else:
-                if val < -2:
-                    num += 1
-        return num
-
+        board = self.board
+        return chess.popcount(board.occupied_co[color] & ~board.pawns)
@@ -0,0 +1,195 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# openingBook.py
+
+import chess
+import chess.pgn
+from transpositionTable import zobrist_key
+from random import Random
+import mmap
+import struct
+import sys
+
+# A Polyglot book is a file of 16 byte entries sorted by key: the Zobrist key of the position (the same key as
+# transpositionTable.zobrist_key), the encoded move, its weight and a learn field (unused here), all big-endian
+ENTRY_STRUCT = struct.Struct(">QHHI")
+ENTRY_SIZE = ENTRY_STRUCT.size
+
+# Book moves are picked with one of these selection modes:
+#  - "weighted": at random, in proportion to the moves' weights
+#  - "best": always the move with the highest weight (the first one in the book on ties)
+SELECTION_MODES = ("weighted", "best")
+
+# The largest weight a book entry can hold
+MAX_WEIGHT = 0xFFFF
+
+# The promotion piece types, by their Polyglot code (bits 12-14 of a move)
+PROMOTION_CODES = [None, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]
+
+
+# Decodes a Polyglot move on the given chess.Board into a chess.Move. Polyglot writes castling as the king capturing
+# its own rook (e.g. e1h1), which is converted back to the standard king move (e1g1).
+def decode_move(board, raw_move):
+    to_square = raw_move & 0x3F
+    from_square = (raw_move >> 6) & 0x3F
+    promotion = PROMOTION_CODES[(raw_move >> 12) & 0x7]
+
+    if from_square in (chess.E1, chess.E8) and board.piece_type_at(from_square) == chess.KING \
+            and board.piece_type_at(to_square) == chess.ROOK and board.color_at(to_square) == board.turn:
+        to_square = from_square + 2 if to_square > from_square else from_square - 2
+    return chess.Move(from_square, to_square, promotion)
+
+
+# Encodes the given chess.Move (legal on the given chess.Board) as a Polyglot move
+def encode_move(board, move):
+    to_square = move.to_square
+    if board.is_castling(move):
+        # The king's destination becomes the square of the rook it castles with
+        rook_file = 7 if move.to_square > move.from_square else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+    promotion = PROMOTION_CODES.index(move.promotion) if move.promotion else 0
+    return to_square | (move.from_square << 6) | (promotion << 12)
+
+
+# A read-only Polyglot opening book. The file is memory-mapped rather than read, and each lookup binary searches it
+# for the position's key, so only the pages that are touched are ever loaded.
+# seed seeds the random choices of the "weighted" selection mode.
+class OpeningBook():
+    def __init__(self, path, seed=None):
+        self.path = path
+        self.rng = Random(seed)
+        self.file = open(path, "rb")
+        self.size = self.file.seek(0, 2) // ENTRY_SIZE
+        # mmap can't map an empty file, and an empty book never has any moves anyway
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    # Closes the book file
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+        self.file.close()
+
+    # Returns the (key, raw move, weight, learn) entry at the given index
+    def read_entry(self, index):
+        return ENTRY_STRUCT.unpack_from(self.mmap, index * ENTRY_SIZE)
+
+    # Returns the key of the entry at the given index
+    def read_key(self, index):
+        return struct.unpack_from(">Q", self.mmap, index * ENTRY_SIZE)[0]
+
+    # Returns the index of the first entry with a key of at least the given key
+    def find_first(self, key):
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.read_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    # Returns a list of (move, weight) for every legal book move from the given chess.Board, in book order.
+    # Entries with a weight of 0 and moves that aren't legal (e.g. from a key collision) are skipped.
+    def get_moves(self, board):
+        if self.size == 0:
+            return []
+
+        key = zobrist_key(board)
+        moves = []
+        index = self.find_first(key)
+        while index < self.size:
+            entry_key, raw_move, weight, _ = self.read_entry(index)
+            if entry_key != key:
+                break
+            move = decode_move(board, raw_move)
+            if weight > 0 and board.is_legal(move):
+                moves.append((move, weight))
+            index += 1
+        return moves
+
+    # Returns a book move (a chess.Move) from the given chess.Board, picked with the given selection mode (one of
+    # SELECTION_MODES), or None if the position isn't in the book
+    def choose_move(self, board, mode="weighted"):
+        if mode not in SELECTION_MODES:
+            raise ValueError("{} is not a valid selection mode (expected one of {})".format(mode, SELECTION_MODES))
+
+        moves = self.get_moves(board)
+        if not moves:
+            return None
+        if mode == "best":
+            return max(moves, key=lambda entry: entry[1])[0]
+
+        choice = self.rng.randrange(sum(weight for (_, weight) in moves))
+        for (move, weight) in moves:
+            choice -= weight
+            if choice < 0:
+                return move
+
+
+# Builds a Polyglot book from the games in the PGN file at pgn_path, and writes it to out_path.
+# Every move in the first max_ply plies of each game is counted, weighted by the result for the side that played it
+# (2 for a win, 1 for a draw, 0 for a loss or an unfinished game), and moves played fewer than min_games times are
+# left out. Weights are scaled down to fit in MAX_WEIGHT if needed. Returns the number of entries written.
+def build_book(pgn_path, out_path, max_ply=20, min_games=1):
+    # Maps (key, raw move) to [times played, total weight]
+    counts = {}
+    with open(pgn_path) as pgn_file:
+        while True:
+            game = chess.pgn.read_game(pgn_file)
+            if game is None:
+                break
+            result = game.headers.get("Result", "*")
+            scores = {
+                "1-0": {chess.WHITE: 2, chess.BLACK: 0},
+                "0-1": {chess.WHITE: 0, chess.BLACK: 2},
+                "1/2-1/2": {chess.WHITE: 1, chess.BLACK: 1},
+            }.get(result, {chess.WHITE: 0, chess.BLACK: 0})
+
+            board = game.board()
+            for (ply, move) in enumerate(game.mainline_moves()):
+                if ply >= max_ply:
+                    break
+                entry = counts.setdefault((zobrist_key(board), encode_move(board, move)), [0, 0])
+                entry[0] += 1
+                entry[1] += scores[board.turn]
+                board.push(move)
+
+    entries = [(key, raw_move, weight) for ((key, raw_move), (played, weight)) in counts.items()
+               if played >= min_games]
+    max_weight = max((weight for (_, _, weight) in entries), default=0)
+    scale = MAX_WEIGHT / max_weight if max_weight > MAX_WEIGHT else 1
+
+    # Within a position, the heaviest moves come first
+    entries.sort(key=lambda entry: (entry[0], -entry[2], entry[1]))
+    with open(out_path, "wb") as out_file:
+        for (key, raw_move, weight) in entries:
+            out_file.write(ENTRY_STRUCT.pack(key, raw_move, int(weight * scale), 0))
+    return len(entries)
+
+
+# Usage:
+#   python openingBook.py build games.pgn book.bin [max_ply] [min_games]
+#   python openingBook.py probe book.bin [fen]
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "build":
+        max_ply = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+        min_games = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+        count = build_book(sys.argv[2], sys.argv[3], max_ply, min_games)
+        print("wrote {} entries to {}".format(count, sys.argv[3]))
+    elif len(sys.argv) >= 3 and sys.argv[1] == "probe":
+        board = chess.Board(sys.argv[3]) if len(sys.argv) > 3 else chess.Board()
+        with OpeningBook(sys.argv[2]) as book:
+            for (move, weight) in book.get_moves(board):
+                print("{}\t{}".format(board.san(move), weight))
+    else:
+        print("usage: python openingBook.py build games.pgn book.bin [max_ply] [min_games]\n"
+              "       python openingBook.py probe book.bin [fen]")
@@ -0,0 +1,274 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# parallelSearch.py
+
+import chess
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from myChess import MyChess
+from searchAgents import multiSearchAgent, alphaBetaPruningAgent, quietSearch, principalVariationAgent
+from searchLimits import SearchLimits, SearchTimeout
+from searchStats import SearchStats
+import evaluation
+from time import perf_counter
+import functools
+import os
+import sys
+
+# How often (in seconds) the main process checks for a stop while waiting for the workers
+STOP_POLL_INTERVAL = 0.05
+
+
+# Searches a single root move in a worker process. Builds an agent of the given class (with the given keyword
+# arguments), and searches the move on a copy of board as the agent's own root search would (see
+# multiSearchAgent.search_move), with the window (alpha, inf) to the given depth, within movetime seconds if given.
+# Returns a tuple of (value, nodes, stats), where value is None if the search ran out of time (or was stopped with the
+# given searchLimits.StopToken, which only works in the main process), and stats is the search's
+# searchStats.SearchStats if collect_stats, or None. A value <= alpha only means the move is no better than alpha.
+def search_root_move(agent_class, eval_func, board, move, depth, alpha, movetime=None, stop_token=None,
+                     agent_kwargs=None, collect_stats=False):
+    chess_state = MyChess(board)
+    agent = agent_class(chess_state, eval_func, depth, stats=SearchStats() if collect_stats else None,
+                        **(agent_kwargs or {}))
+    agent.color = board.turn
+    search_state = agent.begin_search(chess_state)
+    agent.stop_token = stop_token
+
+    if movetime is not None:
+        agent.limits = SearchLimits(movetime=movetime)
+        agent.limits.start()
+    try:
+        value = agent.search_move(0, depth, search_state, True, move, alpha, float('inf'))
+    except SearchTimeout:
+        value = None
+    agent.end_search(move)
+    return value, agent.nodes, agent.stats
+
+
+# The agent classes parallelSearchAgent can search with, and that check_agents compares against their serial search
+SUPPORTED_AGENTS = [alphaBetaPruningAgent, quietSearch, principalVariationAgent]
+
+
+# A root-parallel search: the root moves are split across a pool of worker processes, each running a full search of
+# one move with an agent of agent_class (one of SUPPORTED_AGENTS, or any other agent with a windowed search), and the
+# results are merged into a single move.
+# The main process first searches to depth - 1 to order the root moves, then searches the best of them to full depth
+# on its own to get a bound (alpha) that lets the workers prune the remaining moves.
+# To use with chessBot, bind the extra arguments first, e.g. functools.partial(parallelSearchAgent, workers=8).
+# The other arguments are as in multiSearchAgent, and are passed on to every agent_class agent, except that tt and
+# bitbases (an endgameBitbases.EndgameBitbases) are only used by the search in the main process. If stats is given,
+# the counters of every search (in the main process and in the workers) are merged into it.
+class parallelSearchAgent(multiSearchAgent):
+    def __init__(self, chess_state: MyChess, eval_func=evaluation.add_eval, max_depth=1, tt=None,
+                 agent_class=alphaBetaPruningAgent, workers=None, batch_frontier=False, bitbases=None, stats=None,
+                 check_repetition=False, board_class=None):
+        super().__init__(chess_state, eval_func, max_depth, tt, batch_frontier=batch_frontier, bitbases=bitbases,
+                         stats=stats, check_repetition=check_repetition, board_class=board_class)
+        self.agent_class = agent_class
+        self.workers = workers if workers is not None else os.cpu_count()
+        # The keyword arguments of every agent_class agent, in the main process and in the workers
+        self.agent_kwargs = {"batch_frontier": batch_frontier, "check_repetition": check_repetition,
+                             "board_class": board_class}
+        # The agent that searches in the main process, with its own stats to merge into self.stats
+        self.agent = agent_class(chess_state, eval_func, max_depth, tt, bitbases=bitbases,
+                                 stats=SearchStats() if stats is not None else None, **self.agent_kwargs)
+        # The worker pool is created on the first search and kept for later ones (see close)
+        self.executor = None
+
+    # Shuts down the worker processes
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    # Adds the nodes (and the stats, if self.stats) of a search to this search's
+    def add_search(self, nodes, stats):
+        self.nodes += nodes
+        if self.stats is not None and stats is not None:
+            self.stats.merge(stats)
+
+    # Fills in self.stats (if any) at the end of a search to the given depth that chose the given move (a UCI
+    # string), and returns the move
+    def end_parallel_search(self, move, depth):
+        if self.stats is not None:
+            self.stats.iterations = self.agent.stats.iterations + \
+                [(depth, self.nodes, perf_counter() - self.stats.start_time)]
+            self.stats.finish(move)
+        return move
+
+    # Gets the next best action, based on the given gamestate (myChess)
+    # Has an optional parameter limits (a searchLimits.SearchLimits). Its depth (if given) replaces max_depth, and its
+    # movetime bounds the workers, whose unfinished moves are treated as no better than the first move. There is no
+    # iterative deepening, so node limits are not supported.
+    # When the limits' stop token is stopped, the best move found so far is returned; worker searches that have
+    # already started run to the end in the background, and their results are ignored.
+    def get_action(self, chess_state: MyChess, max_depth=None, limits=None):
+        if limits is not None and limits.depth is not None:
+            max_depth = limits.depth
+        elif max_depth is None:
+            max_depth = self.max_depth
+        stop_token = None
+        if limits is not None:
+            limits.start()
+            stop_token = limits.stop_token
+        self.nodes = 0
+        if self.stats is not None:
+            self.stats.reset()
+
+        # Order the root moves with a search one ply shallower (stoppable, with the same stop token)
+        order_depth = max(1, max_depth - 1)
+        order_limits = SearchLimits(depth=order_depth, stop_token=stop_token) if stop_token is not None else None
+        ordering_move = self.agent.get_action(chess_state, order_depth, order_limits)
+        self.add_search(self.agent.nodes, self.agent.stats)
+        if max_depth <= 1 or (stop_token is not None and stop_token.stopped):
+            return self.end_parallel_search(ordering_move, order_depth)
+        root_values = self.agent.root_values or {}
+        root_moves = sorted(chess_state.legal_moves(), key=lambda move: root_values.get(move, float('-inf')),
+                            reverse=True)
+        # The depth the agent's own get_action would search to (e.g. deeper in endgames)
+        max_depth = self.agent.adjust_depth(chess_state, max_depth)
+        collect_stats = self.stats is not None
+
+        # Search the most promising move in full to get a bound for the rest
+        first_move = root_moves[0]
+        first_value, nodes, stats = search_root_move(
+            self.agent_class, self.eval_func, chess_state.board.copy(), first_move, max_depth, float('-inf'),
+            stop_token=stop_token, agent_kwargs=self.agent_kwargs, collect_stats=collect_stats)
+        self.add_search(nodes, stats)
+        if first_value is None:
+            return self.end_parallel_search(ordering_move, order_depth)
+        best_move, best_value = first_move, first_value
+        self.root_values = {first_move: first_value}
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        movetime = None
+        if limits is not None and limits.movetime is not None:
+            movetime = max(0.0, limits.movetime - limits.elapsed())
+
+        futures = {}
+        for move in root_moves[1:]:
+            futures[self.executor.submit(search_root_move, self.agent_class, self.eval_func, chess_state.board.copy(),
+                                         move, max_depth, first_value, movetime, agent_kwargs=self.agent_kwargs,
+                                         collect_stats=collect_stats)] = move
+
+        # Merge the results in root order, so that ties go to the move that was ordered first (as in a serial search)
+        pending = set(futures)
+        while pending:
+            if stop_token is not None and stop_token.stopped:
+                for future in pending:
+                    future.cancel()
+                break
+            done, pending = wait(pending, timeout=STOP_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                value, nodes, stats = future.result()
+                self.add_search(nodes, stats)
+                if value is not None:
+                    self.root_values[futures[future]] = value
+
+        for move in root_moves[1:]:
+            value = self.root_values.get(move)
+            if value is not None and value > best_value:
+                best_move, best_value = move, value
+
+        return self.end_parallel_search(best_move.uci(), max_depth)
+
+
+# Fixed positions the speedup benchmark is run on
+BENCHMARK_FENS = [
+    chess.STARTING_FEN,
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R w KQ - 0 8",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+]
+
+
+# Searches BENCHMARK_FENS at the given depth with a serial agent and with the parallel agent at each worker count,
+# and prints the time and speedup of each. Returns a list of (workers, seconds, speedup), where workers = 0 is the
+# serial agent.
+def benchmark(depth=4, worker_counts=(1, 2, 4, 8, 16), agent_class=alphaBetaPruningAgent):
+    results = []
+    serial_agent = agent_class(MyChess(), evaluation.add_eval, depth)
+    start = perf_counter()
+    serial_moves = [serial_agent.get_action(MyChess(chess.Board(fen)), depth) for fen in BENCHMARK_FENS]
+    serial_time = perf_counter() - start
+    results.append((0, serial_time, 1.0))
+    print("serial: {:.2f}s {}".format(serial_time, serial_moves))
+
+    for workers in worker_counts:
+        agent = parallelSearchAgent(MyChess(), evaluation.add_eval, depth, agent_class=agent_class, workers=workers)
+        # Start the pool before timing, so process start-up isn't counted
+        agent.executor = ProcessPoolExecutor(max_workers=workers)
+        list(agent.executor.map(abs, range(workers)))
+
+        start = perf_counter()
+        moves = [agent.get_action(MyChess(chess.Board(fen)), depth) for fen in BENCHMARK_FENS]
+        elapsed = perf_counter() - start
+        agent.close()
+
+        results.append((workers, elapsed, serial_time / elapsed))
+        print("{:>2} workers: {:.2f}s, speedup {:.2f}x {}".format(workers, elapsed, serial_time / elapsed, moves))
+    return results
+
+
+# The positions check_agents is run on: BENCHMARK_FENS, plus positions with captures at the root and endgames, where
+# quietSearch's root search differs from a plain alpha-beta search of each move
+CHECK_FENS = BENCHMARK_FENS + [
+    "r1bqkbnr/pppppp1p/8/8/5PpP/3P2P1/P1PP4/RNBQKBNR w KQkq - 0 6",
+    "rnbqk2r/3n2pp/1p1b4/p4p2/7P/2PPP3/PP2QPPR/RNB1K1N1 b Qkq - 0 10",
+    "2r3k1/p4p2/3Rp2p/1p2P1pK/8/1P4P1/P3Q2P/1q6 b - - 0 1",
+    "8/8/8/4k3/8/8/8/KBN5 w - - 0 1",
+    "8/8/4k3/8/2R5/8/5K2/3r4 w - - 0 1",
+]
+
+
+# Searches CHECK_FENS at the given depth with each of SUPPORTED_AGENTS, serially and with the parallel agent, and
+# prints a line per agent and position. Moves may differ between equally good moves, so the value of the parallel
+# agent's move is checked against the value of the serial agent's. Returns the number of mismatches.
+def check_agents(depth=2, workers=2, agent_classes=SUPPORTED_AGENTS, out=sys.stdout):
+    failures = 0
+    for agent_class in agent_classes:
+        agent = parallelSearchAgent(MyChess(), evaluation.add_eval, depth, agent_class=agent_class, workers=workers)
+        for fen in CHECK_FENS:
+            serial_agent = agent_class(MyChess(), evaluation.add_eval, depth)
+            serial_move = serial_agent.get_action(MyChess(chess.Board(fen)), depth)
+            serial_value = serial_agent.iterations[-1][2]
+            move = agent.get_action(MyChess(chess.Board(fen)), depth)
+            value = agent.root_values[chess.Move.from_uci(move)]
+            failures += value != serial_value
+            out.write("{} {:<24} serial {} ({}) parallel {} ({}) {}\n".format(
+                "ok  " if value == serial_value else "FAIL", agent_class.__name__, serial_move, serial_value, move,
+                value, fen))
+        agent.close()
+    return failures
+
+
+# Builds a chessBot with the parallel agent bound as in the class comment (and a SearchStats), lets it answer 1. e4,
+# and checks that the stats count the nodes of the whole search, workers included. Prints a line; returns the number
+# of failures.
+def check_chess_bot(depth=2, workers=2, out=sys.stdout):
+    # chessBot needs pygame (for its GUI), so it is only imported here
+    from chessBot import chessBot
+
+    stats = SearchStats()
+    bot = chessBot(MyChess(), functools.partial(parallelSearchAgent, workers=workers), evaluation.add_eval, depth, True,
+                   stats=stats)
+    bot.get_state().execute_move("e2e4")
+    move = bot.make_move()
+    bot.bot.close()
+
+    ok = stats.move == move and stats.nodes == bot.bot.nodes and stats.nodes > bot.bot.agent.nodes
+    out.write("{} chessBot with {} workers played {}: {} nodes, {} in stats\n".format(
+        "ok  " if ok else "FAIL", workers, move, bot.bot.nodes, stats.nodes))
+    return 0 if ok else 1
+
+
+# Usage:
+#   python parallelSearch.py [depth]          print the speedup of the parallel search against the number of workers
+#   python parallelSearch.py check [depth]    check the parallel search against the serial one (see check_agents), and
+#                                             check it as a chessBot's agent (see check_chess_bot)
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "check":
+        depth = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+        sys.exit(1 if check_agents(depth) + check_chess_bot(depth) else 0)
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
@@ -1,64 +1,192 @@
-from myChess import MyChess
-from searchAgents import minimaxAgent, alphaBetaPruningAgent, quietSearch, nullMoveAlphaBetaAgent
-from evaluation import evaluate, add_eval
-from random import randint
-from timeit import timeit
-from numpy import average, std, var, amin, amax, median
-import sys
-
-
-def run_agent(agent, eval_func, depth, move_count=None):
-    chess_state = MyChess()
-    chess_bot = agent(chess_state, eval_func)
-
-    if move_count is None:
-        move_count = randint(0, 20)
-
-    # Performs move_count random moves.
-    ii = 0
-    while ii < move_count:
-        moves = list(chess_state.get_board().legal_moves)
-        random_move = str(moves[randint(0, len(moves) - 1)])
-        chess_state.execute_move(random_move)
-        if chess_state.is_game_over():
-            chess_state.get_board().pop()
-            continue
-        ii += 1
-
-    move = chess_bot.get_action(chess_state, depth)
-    chess_state.execute_move(move)
-
-# Change these parameters to adjust testing metrics
-MAX_DEPTH = 3
-# Add values to this list if you want to test a customized set of depths (for example, [1, 2, 5, 10, 100])
-CUSTOM_DEPTHS = []
-EVAL_FUNC = add_eval
-AGENT = quietSearch
-# the number of moves to run before running the agent (these moves are chosen randomly)
-# number of turns = number of moves / 2. If set to None, will select a random number from 0 to 20 for each repetition.
-MOVE_COUNT = None
-REPETITIONS = 100
-
-max_depth_arr = CUSTOM_DEPTHS if CUSTOM_DEPTHS else list(range(1, MAX_DEPTH + 1))
-
-print("Testing agent \"{}\" with evaluation function \"{}\", at n = {}...\n"
-      .format(AGENT.__name__, EVAL_FUNC.__name__, REPETITIONS))
-
-for depth in max_depth_arr:
-    runtimes = []
-
-    for _ in range(0, REPETITIONS):
-        runtimes.append(timeit('run_agent(AGENT, EVAL_FUNC, depth, MOVE_COUNT)',
-                               'from __main__ import run_agent, AGENT, EVAL_FUNC, depth, MOVE_COUNT', number=1))
-
-    avg = average(runtimes) * 1000
-    stdev = std(runtimes) * 1000
-    variance = var(runtimes) * (1000 ** 2)
-    min = amin(runtimes) * 1000
-    med = median(runtimes) * 1000
-    max = amax(runtimes) * 1000
-
-    print("Depth = {}\nAverage: {}\nStDev: {}\nVar: {}\nMin: {}\nMedian: {}\nMax: {}\n"
-          .format(depth, avg, stdev, variance, min, med, max))
-
-
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# performanceAnalysis.py
+
+import chess
+from chessTournament import AGENTS, EVAL_FUNCS
+from compactBoard import CompactBoard
+from myChess import MyChess
+from searchLimits import SearchLimits
+import argparse
+import json
+import os
+import platform
+import sys
+
+# The benchmark positions: an EPD file where each position has an id and a category (c0) opcode. Any change to the
+# positions must go in a new file with a new version, so that results with the same version stay comparable.
+SUITE_VERSION = 1
+SUITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks",
+                          "suite_v{}.epd".format(SUITE_VERSION))
+
+# The agents, evaluation functions and depth run by default
+DEFAULT_AGENTS = ["minimax", "alphabeta", "pvs", "quiet", "nullmove"]
+DEFAULT_EVALS = ["add_eval", "evaluate"]
+DEFAULT_DEPTH = 3
+
+# The boards the searches can run on (see multiSearchAgent's board_class), by name
+BOARD_CLASSES = {"python-chess": None, "compact": CompactBoard}
+
+# compare flags a configuration whose node count grew, or whose NPS dropped, by more than this fraction
+DEFAULT_THRESHOLD = 0.10
+
+
+# Returns the positions of the EPD file at the given path, as a list of (id, category, chess.Board)
+def load_suite(path=SUITE_PATH):
+    positions = []
+    with open(path) as epd_file:
+        for line in epd_file:
+            if line.strip():
+                board, operations = chess.Board.from_epd(line.strip())
+                positions.append((operations["id"], operations["c0"], board))
+    return positions
+
+
+# Searches the given position to the given depth with a new agent, one iteration per depth (so that the nodes and
+# time of every depth are recorded). When repeat > 1, the search is run that many times and the fastest run is kept;
+# the node counts are the same every time. The search runs on a board of the given board_class (see BOARD_CLASSES).
+# Returns a dict of the results.
+def run_position(agent_class, eval_func, depth, board, repeat=1, board_class=None):
+    best = None
+    for _ in range(repeat):
+        agent = agent_class(MyChess(board.copy()), eval_func, depth, board_class=board_class)
+        move = agent.get_action(MyChess(board.copy()), limits=SearchLimits(depth=depth))
+        if best is None or agent.iterations[-1][4] < best[1][-1][4]:
+            best = (move, agent.iterations)
+
+    move, iterations = best
+    nodes = iterations[-1][3]
+    seconds = iterations[-1][4]
+    # The nodes searched by each iteration on its own, and the effective branching factor of the last one
+    depth_nodes = [iterations[0][3]] + [iterations[i][3] - iterations[i - 1][3] for i in range(1, len(iterations))]
+    branching = depth_nodes[-1] / depth_nodes[-2] if len(depth_nodes) > 1 and depth_nodes[-2] else None
+    return {
+        "move": move,
+        "nodes": nodes,
+        "seconds": seconds,
+        "nps": nodes / seconds if seconds > 0 else None,
+        "nodes_per_depth": depth_nodes,
+        "time_to_depth": [iteration[4] for iteration in iterations],
+        "branching_factor": branching,
+    }
+
+
+# Runs every combination of the given agent names, eval names and depths (keys of chessTournament.AGENTS and
+# EVAL_FUNCS) on every suite position, on the board named board_name (a key of BOARD_CLASSES), printing a line per
+# configuration as it finishes. Returns the report as a dict, with the results of every position and a summary of each
+# configuration.
+def run_suite(agent_names=DEFAULT_AGENTS, eval_names=DEFAULT_EVALS, depths=(DEFAULT_DEPTH,), repeat=1,
+              suite_path=SUITE_PATH, out=sys.stdout, board_name="python-chess"):
+    positions = load_suite(suite_path)
+    results = []
+    summary = {}
+
+    for agent_name in agent_names:
+        for eval_name in eval_names:
+            for depth in depths:
+                config = "{}/{}/{}".format(agent_name, eval_name, depth)
+                config_results = []
+                for (position_id, category, board) in positions:
+                    result = run_position(AGENTS[agent_name], EVAL_FUNCS[eval_name], depth, board, repeat,
+                                          BOARD_CLASSES[board_name])
+                    result.update({"agent": agent_name, "eval": eval_name, "depth": depth,
+                                   "position": position_id, "category": category})
+                    config_results.append(result)
+
+                nodes = sum(result["nodes"] for result in config_results)
+                seconds = sum(result["seconds"] for result in config_results)
+                factors = [result["branching_factor"] for result in config_results
+                           if result["branching_factor"] is not None]
+                summary[config] = {
+                    "nodes": nodes,
+                    "seconds": seconds,
+                    "nps": nodes / seconds if seconds > 0 else None,
+                    "branching_factor": sum(factors) / len(factors) if factors else None,
+                }
+                results.extend(config_results)
+                out.write("{:<28} nodes {:>9} time {:>8.3f}s nps {:>8.0f} ebf {}\n".format(
+                    config, nodes, seconds, summary[config]["nps"] or 0,
+                    "{:.2f}".format(summary[config]["branching_factor"]) if factors else "-"))
+                out.flush()
+
+    return {
+        "suite": os.path.basename(suite_path),
+        "suite_version": SUITE_VERSION,
+        "python": platform.python_version(),
+        "chess": chess.__version__,
+        "repeat": repeat,
+        "board": board_name,
+        "summary": summary,
+        "results": results,
+    }
+
+
+# Compares a report against a baseline report (both as dicts from run_suite). Returns a list of
+# (config, message) for every configuration present in both whose nodes grew or NPS dropped by more than threshold
+# (a fraction), or whose moves changed.
+def compare_reports(baseline, current, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    if baseline.get("suite") != current.get("suite"):
+        regressions.append(("suite", "baseline is {} but current is {}".format(baseline.get("suite"),
+                                                                                current.get("suite"))))
+        return regressions
+
+    for (config, base) in baseline["summary"].items():
+        now = current["summary"].get(config)
+        if now is None:
+            continue
+        if now["nodes"] > base["nodes"] * (1 + threshold):
+            regressions.append((config, "nodes {} -> {} ({:+.1%})".format(
+                base["nodes"], now["nodes"], now["nodes"] / base["nodes"] - 1)))
+        if base["nps"] and now["nps"] and now["nps"] < base["nps"] * (1 - threshold):
+            regressions.append((config, "nps {:.0f} -> {:.0f} ({:+.1%})".format(
+                base["nps"], now["nps"], now["nps"] / base["nps"] - 1)))
+
+    # The searches are deterministic, so a changed move means the search itself changed
+    base_moves = {(r["agent"], r["eval"], r["depth"], r["position"]): r["move"] for r in baseline["results"]}
+    for result in current["results"]:
+        key = (result["agent"], result["eval"], result["depth"], result["position"])
+        if key in base_moves and base_moves[key] != result["move"]:
+            regressions.append(("{}/{}/{}".format(*key[:3]), "{} plays {} instead of {}".format(
+                result["position"], result["move"], base_moves[key])))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deterministic search benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite and write a JSON report")
+    run_parser.add_argument("--agents", nargs="+", default=DEFAULT_AGENTS, choices=list(AGENTS))
+    run_parser.add_argument("--evals", nargs="+", default=DEFAULT_EVALS, choices=list(EVAL_FUNCS))
+    run_parser.add_argument("--depths", nargs="+", type=int, default=[DEFAULT_DEPTH])
+    run_parser.add_argument("--repeat", type=int, default=1, help="runs per search; the fastest is kept")
+    run_parser.add_argument("--suite", default=SUITE_PATH, help="EPD file of positions")
+    run_parser.add_argument("--board", choices=list(BOARD_CLASSES), default="python-chess",
+                            help="the board the searches run on")
+    run_parser.add_argument("-o", "--output", default=None, help="file to write the JSON report to")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions of a report against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="allowed fractional change in nodes and NPS")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run_suite(args.agents, args.evals, args.depths, args.repeat, args.suite, board_name=args.board)
+        if args.output is not None:
+            with open(args.output, "w") as report_file:
+                json.dump(report, report_file, indent=2)
+        return 0
+
+    with open(args.baseline) as baseline_file, open(args.current) as current_file:
+        regressions = compare_reports(json.load(baseline_file), json.load(current_file), args.threshold)
+    for (config, message) in regressions:
+        print("REGRESSION {}: {}".format(config, message))
+    if not regressions:
+        print("no regressions beyond {:.0%}".format(args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# perftSuite.py
+
+import chess
+from compactBoard import perft
+from performanceAnalysis import BOARD_CLASSES
+import argparse
+import sys
+from time import perf_counter
+
+# The standard perft positions, as (name, FEN, the number of leaf nodes at depth 1, 2, ...), from the published
+# results (https://www.chessprogramming.org/Perft_Results)
+PERFT_SUITE = [
+    ("start", chess.STARTING_FEN, [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603]),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+]
+
+# By default, each position is searched to the deepest depth with at most this many known nodes
+DEFAULT_MAX_NODES = 200000
+
+
+# Returns a board of the given FEN on the board class named board_name (a key of performanceAnalysis.BOARD_CLASSES)
+def make_board(fen, board_name="python-chess"):
+    board_class = BOARD_CLASSES[board_name]
+    return chess.Board(fen) if board_class is None else board_class.from_board(chess.Board(fen))
+
+
+# Returns the perft count of each legal move of the given board to the given depth, as a dict of UCI move -> nodes
+def divide(board, depth):
+    counts = {}
+    for move in list(board.generate_legal_moves()):
+        board.push(move)
+        counts[move.uci()] = perft(board, depth - 1)
+        board.pop()
+    return counts
+
+
+# Runs perft on every position of PERFT_SUITE, at every depth up to the given depth (or, if None, up to the deepest
+# depth with at most max_nodes known nodes), on the board named board_name, printing a line per depth. Returns the
+# number of counts that don't match the known ones.
+def run_suite(depth=None, max_nodes=DEFAULT_MAX_NODES, board_name="python-chess", out=sys.stdout):
+    failures = 0
+    for (name, fen, counts) in PERFT_SUITE:
+        max_depth = depth if depth is not None else \
+            max([1] + [index + 1 for (index, count) in enumerate(counts) if count <= max_nodes])
+        for curr_depth in range(1, min(max_depth, len(counts)) + 1):
+            board = make_board(fen, board_name)
+            start = perf_counter()
+            nodes = perft(board, curr_depth)
+            seconds = perf_counter() - start
+            expected = counts[curr_depth - 1]
+            failures += nodes != expected
+            out.write("{} {:<10} depth {} nodes {:>9} expected {:>9} time {:>7.3f}s nps {:>9.0f}\n".format(
+                "ok  " if nodes == expected else "FAIL", name, curr_depth, nodes, expected, seconds,
+                nodes / seconds if seconds > 0 else 0))
+            out.flush()
+    return failures
+
+
+# Usage:
+#   python perftSuite.py [--depth N] [--max-nodes N] [--board python-chess|compact]
+#   python perftSuite.py --divide FEN --depth N
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Counts the leaf nodes of the legal move tree of the standard perft "
+                                                 "positions, and checks them against the known counts")
+    parser.add_argument("--depth", type=int, default=None, help="the depth to search each position to")
+    parser.add_argument("--max-nodes", type=int, default=DEFAULT_MAX_NODES,
+                        help="without --depth, search each position to the deepest depth with at most this many nodes")
+    parser.add_argument("--board", choices=list(BOARD_CLASSES), default="python-chess")
+    parser.add_argument("--divide", metavar="FEN", default=None,
+                        help="print the count of each legal move of FEN to --depth instead")
+    args = parser.parse_args(argv)
+
+    if args.divide is not None:
+        counts = divide(make_board(args.divide, args.board), args.depth or 1)
+        for (move, nodes) in sorted(counts.items()):
+            print("{} {}".format(move, nodes))
+        print("total {}".format(sum(counts.values())))
+        return 0
+
+    return 1 if run_suite(args.depth, args.max_nodes, args.board) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
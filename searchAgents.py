@@ -4,9 +4,29 @@
 
 import chess
 from myChess import MyChess
-from multiplier import Multiplier
 import evaluation
+import batchEvaluation
+from moveOrdering import MoveOrderer
+from staticExchange import is_losing_capture
 import random
+from searchLimits import SearchLimits, SearchTimeout
+from time import perf_counter
+from endgameBitbases import MAX_PIECES
+from transpositionTable import zobrist_key, EXACT, LOWER, UPPER, BLACK_KEY_SALT, MIN_NODE_KEY_SALT
+
+# The margin (in pawns) that quietSearch.qSearch's delta pruning allows on top of a capture's material gain: a capture
+# that can't raise the score to within this margin of alpha (or beta) is skipped
+DELTA_MARGIN = 2
+
+# nullMoveAlphaBetaAgent's null-move pruning: the null move is tried at nodes with at least NULL_MOVE_MIN_DEPTH plies
+# left, and its reply is searched NULL_MOVE_REDUCTION plies shallower than a real move's would be (or
+# NULL_MOVE_DEEP_REDUCTION plies, at nodes with at least NULL_MOVE_DEEP_DEPTH plies left). A null-move cutoff is
+# verified when the side to move has fewer than ZUGZWANG_PIECES pieces.
+NULL_MOVE_MIN_DEPTH = 2
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_DEEP_REDUCTION = 3
+NULL_MOVE_DEEP_DEPTH = 6
+ZUGZWANG_PIECES = 5
 
 # -----------------------------------------------------------------------------------------------------------
 # Search Agents
@@ -14,55 +34,301 @@ import random
 
 class multiSearchAgent():
     # initializes the chessbot with an instance of myChess
-    def __init__(self, chess_state: MyChess, eval_func=evaluation.add_eval, max_depth=1):
+    # tt is an optional transpositionTable.TranspositionTable; if given, the search stores and reuses its results
+    # If batch_frontier is True and eval_func is add_eval, nodes one ply above the leaves score all of their children
+    # at once with batchEvaluation (used by alphaBetaPruningAgent)
+    # bitbases is an optional endgameBitbases.EndgameBitbases; if given, the search stops at endgame positions they
+    # cover, scoring them as add_eval does
+    # stats is an optional searchStats.SearchStats, which is reset and filled in by every call to get_action
+    # If check_repetition is False (the default), the search doesn't check for fivefold repetitions at its nodes (see
+    # myChess.NodeStatus)
+    # board_class is the board the search pushes and pops moves on: None for a copy of the chess.Board, or a class
+    # with the same interface and a from_board constructor (compactBoard.CompactBoard)
+    def __init__(self, chess_state: MyChess, eval_func=evaluation.add_eval, max_depth=1, tt=None,
+                 batch_frontier=False, bitbases=None, stats=None, check_repetition=False, board_class=None):
         self.myChess = chess_state
         self.board = self.myChess.board
         self.eval_func = eval_func
         self.max_depth = max_depth
+        self.tt = tt
+        self.batch_frontier = batch_frontier and eval_func is evaluation.add_eval
+        self.bitbases = bitbases
+        self.check_repetition = check_repetition
+        self.board_class = board_class
+        self.color = None
+        # The number of nodes visited by the last call to get_action
+        self.nodes = 0
+        # The searchLimits.SearchLimits being enforced, if any, and the StopToken of the running search, checked at
+        # every node (see iterative_deepening)
+        self.limits = None
+        self.stop_token = None
+        # The chess state the running search started from (see begin_search)
+        self.root_state = None
+        # The root moves in the order to search them (set between iterations), and the values the last root search
+        # gave to each of them
+        self.root_moves = None
+        self.root_values = None
+        # (depth, move, value, nodes, seconds) of each completed iteration of the last call to get_action, and an
+        # optional function called with each of them as soon as its iteration completes (e.g. to report progress)
+        self.iterations = []
+        self.iteration_callback = None
+        # Orders the moves at each node, and counts how often the first move searched causes a cutoff
+        self.orderer = MoveOrderer()
+        self.stats = stats
+        # The transposition table's (probes, hits) when the current search started
+        self.tt_counters = (0, 0)
 
     # Gets the next best action, based on the given gamestate (myChess), and whose turn we are selecting an action for
     def get_action(self, chess_state: MyChess, turn):
         raise NotImplementedError("multiSearchAgent.get_action is not defined; see child classes instead")
 
+    # Returns the depth get_action should search to, given its max_depth argument and optional search limits. If the
+    # limits only bound time or nodes, the search deepens until they run out (up to MAX_SEARCH_DEPTH).
+    def get_max_depth(self, max_depth, limits):
+        default_depth = self.max_depth if max_depth is None else max_depth
+        if limits is None:
+            return default_depth
+        depth = limits.get_max_depth(default_depth)
+        return depth if max_depth is None else min(depth, max_depth)
+
+    # Counts a node visited at the given ply (in a quiescence search if qsearch), and raises SearchTimeout if the
+    # search has been stopped or its limits have been exceeded
+    def count_node(self, ply=0, qsearch=False):
+        self.nodes += 1
+        if self.stats is not None:
+            self.stats.count_node(ply, qsearch)
+        if self.stop_token is not None and self.stop_token.stopped:
+            raise SearchTimeout()
+        if self.limits is not None and self.limits.exceeded(self.nodes):
+            raise SearchTimeout()
+
+    # Counts a call to the evaluation function
+    def count_eval(self, count=1):
+        if self.stats is not None:
+            self.stats.eval_calls += count
+
+    # Searches to max_depth and returns the best move. root_search(depth) must search the root to the given depth and
+    # return a tuple of (move, value).
+    # Without limits, this is a single search to max_depth. With limits, the root is searched to depth 1, 2, ...
+    # max_depth, with each iteration searching the root moves in the order of the previous iteration's values. Once
+    # the limits run out, the move from the last completed iteration is returned.
+    # The search can be stopped at any node with the limits' stop token; if it is stopped before the first iteration
+    # completes, the first root move in move ordering is returned.
+    def iterative_deepening(self, max_depth, limits, root_search):
+        self.iterations = []
+        start = perf_counter()
+
+        if limits is None:
+            move, value = root_search(max_depth)
+            self.iterations.append((max_depth, move, value, self.nodes, perf_counter() - start))
+            if self.iteration_callback is not None:
+                self.iteration_callback(self.iterations[-1])
+            self.end_search(move)
+            return move
+
+        limits.start()
+        self.stop_token = limits.stop_token
+        best_move = None
+        try:
+            for depth in range(1, max_depth + 1):
+                if best_move is not None and not limits.can_start_iteration(self.nodes):
+                    break
+                # The first iteration always runs to completion (unless stopped), so that there is a move to return
+                self.limits = limits if best_move is not None else None
+                self.root_values = None
+
+                best_move, value = root_search(depth)
+                self.iterations.append((depth, best_move, value, self.nodes, perf_counter() - start))
+                if self.iteration_callback is not None:
+                    self.iteration_callback(self.iterations[-1])
+
+                # Search the best moves of this iteration first in the next one
+                if self.root_values is not None:
+                    self.root_moves = sorted(self.root_values, key=self.root_values.get, reverse=True)
+        except SearchTimeout:
+            pass
+        finally:
+            self.limits = None
+            self.stop_token = None
+            self.root_moves = None
+
+        if best_move is None:
+            best_move = self.orderer.order(self.root_state.board, self.root_state.legal_moves(), 0)[0]
+        self.end_search(best_move)
+        return best_move
+
+    # Searches the given node with the window (alpha, beta) using this agent's main search, and returns a tuple of
+    # (move, value). Used to search root moves from outside the agent (see parallelSearch).
+    def search_node(self, curr_depth, target_depth, chess_state, max_turn, alpha, beta):
+        raise NotImplementedError("{} has no windowed search to run nodes with".format(type(self).__name__))
+
+    # Makes the given move at the given node, searches the resulting child the way this agent's search does from that
+    # node, with the window (alpha, beta), unmakes the move and returns the child's value. Used to search root moves
+    # from outside the agent (see parallelSearch).
+    def search_move(self, curr_depth, target_depth, chess_state, max_turn, move, alpha, beta):
+        chess_state.push(move)
+        value = self.search_node(curr_depth + 1, target_depth, chess_state, not max_turn, alpha, beta)[1]
+        chess_state.pop()
+        return value
+
+    # Returns the depth get_action searches the given root to when asked for max_depth. Agents that search endgames
+    # deeper override it.
+    def adjust_depth(self, chess_state: MyChess, max_depth):
+        return max_depth
+
+    # Sets up a new search from the given chess state, and returns the state the search should run on: a MyChess over
+    # a copy of the board, on which the search pushes and pops moves (see MyChess.push)
+    def begin_search(self, chess_state: MyChess):
+        self.nodes = 0
+        self.root_state = chess_state
+        self.orderer.new_search()
+        if self.tt is not None:
+            self.tt.new_search()
+            self.tt_counters = (self.tt.probes, self.tt.hits)
+        if self.stats is not None:
+            self.stats.reset()
+
+        search_state = chess_state.search_copy(self.board_class)
+        # add_eval can read its piece-square score from a running total instead of scanning the board at every leaf
+        if self.eval_func is evaluation.add_eval:
+            search_state.evaluator = evaluation.IncrementalEvaluator(search_state.board)
+        search_state.bitbases = self.bitbases
+        search_state.check_repetition = self.check_repetition
+        return search_state
+
+    # Fills in self.stats (if any) at the end of a search that chose the given move (a chess.Move)
+    def end_search(self, move):
+        if self.stats is None:
+            return
+        self.stats.beta_cutoffs = self.orderer.cutoffs
+        self.stats.first_move_cutoffs = self.orderer.first_move_cutoffs
+        if self.tt is not None:
+            self.stats.tt_probes = self.tt.probes - self.tt_counters[0]
+            self.stats.tt_hits = self.tt.hits - self.tt_counters[1]
+        self.stats.iterations = [(depth, nodes, seconds) for (depth, _, _, nodes, seconds) in self.iterations]
+        self.stats.finish(move.uci() if move is not None else None)
+
+    # Returns the value (relative to self.color) the endgame bitbases give the given chess state, or None if there
+    # are no bitbases or they don't cover it
+    def probe_bitbases(self, chess_state):
+        board = chess_state.board
+        if chess_state.bitbases is None or chess.popcount(board.occupied) > MAX_PIECES:
+            return None
+
+        if chess_state.evaluator is not None:
+            board_value = chess_state.evaluator.score()
+        else:
+            board_value = evaluation.getBoardValue(board)
+        value = evaluation.getBitbaseValue(chess_state.bitbases, board, board_value)
+        if value is None:
+            return None
+        return value if self.color else -value
+
+    # Returns the transposition table key of the given chess state. Scores are stored relative to self.color and
+    # to whether the node is maximizing, so both are mixed into the Zobrist key.
+    def tt_key(self, chess_state, max_turn):
+        key = zobrist_key(chess_state.board)
+        if not self.color:
+            key ^= BLACK_KEY_SALT
+        if not max_turn:
+            key ^= MIN_NODE_KEY_SALT
+        return key
+
+    # Looks up the given key in the transposition table. Returns a tuple of (move, value), where move is the stored
+    # best move (or None), and value is the stored score if it is deep enough and its bound settles this node
+    # for the window (alpha, beta), or None otherwise.
+    def probe_tt(self, key, depth, alpha, beta):
+        entry = self.tt.probe(key)
+        if entry is None:
+            return None, None
+
+        _, entry_depth, bound, value, move, _ = entry
+        if entry_depth >= depth:
+            if bound == EXACT or (bound == LOWER and value >= beta) or (bound == UPPER and value <= alpha):
+                return move, value
+        return move, None
+
+    # Stores the result of searching a node with the window (alpha, beta) to the given depth
+    def store_tt(self, key, depth, alpha, beta, move, value):
+        if value <= alpha:
+            bound = UPPER
+        elif value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(key, depth, bound, value, move)
+
+    # Scores every child of the given chess state (at the given ply) with one batched add_eval call. Returns a tuple
+    # of (move, value) of the best child for the maximizer (if max_turn) or the minimizer.
+    def frontier_minimax(self, chess_state, max_turn, ply):
+        moves = chess_state.legal_moves()
+        values = batchEvaluation.batchChildValues(chess_state, moves, self.color)
+        for _ in moves:
+            self.count_node(ply + 1)
+        self.count_eval(len(moves))
+
+        best_val = max(values) if max_turn else min(values)
+        return (moves[values.index(best_val)], best_val)
+
+    # Returns the legal moves (as chess.Moves) of the given chess state in the order to search them, with the given
+    # move (if legal) searched first. The root moves are searched in the order of the previous iteration, and the
+    # moves at other nodes are ordered by self.orderer.
+    def ordered_moves(self, chess_state, curr_depth, first_move):
+        if curr_depth == 0 and self.root_moves is not None:
+            moves = list(self.root_moves)
+            if first_move is not None and first_move in moves:
+                moves.remove(first_move)
+                moves.insert(0, first_move)
+            return moves
+        return self.orderer.order(chess_state.board, chess_state.legal_moves(), curr_depth, first_move)
+
 
 class minimaxAgent(multiSearchAgent):
 
     # Gets the next best action, based on the given gamestate (myChess), and whose turn we are selecting an action for
     # Has an optional parameter max_depth to choose a different depth than self.max_depth
     # TODO: Should we add an optional eval_func parameter here? Or just stick with self.eval_func?
-    def get_action(self, chess_state: MyChess, max_depth=None):
-        if max_depth is None:
-            max_depth = self.max_depth
+    # Has an optional parameter limits (a searchLimits.SearchLimits) to search with iterative deepening until a
+    # depth, time or node limit is reached
+    def get_action(self, chess_state: MyChess, max_depth=None, limits=None):
+        max_depth = self.get_max_depth(max_depth, limits)
+        search_state = self.begin_search(chess_state)
 
-        # The action from this method call is stored in the 0th index of the tuple
         # TODO: Make this choose randomly for bot tourneys?? At the moment, always chooses the first move
         #  for consistency (for testing)
-        return self.minimax(0, max_depth, chess_state, True)[0]
+        return self.iterative_deepening(
+            max_depth, limits, lambda depth: self.minimax(0, depth, search_state, True)).uci()
 
     # minimax evaluation function only returns best evaluation scores
     # max_turn defines is we are maxing white's turn or black's turn
     # returns a tuple of (move, value)
     def minimax(self, curr_depth, target_depth, chess_state, max_turn):
-        if curr_depth == target_depth or chess_state.is_game_over():
+        self.count_node(curr_depth)
+        if curr_depth == target_depth or chess_state.node_status().game_over:
+            self.count_eval()
             return None, self.eval_func(chess_state)
 
-        values = {}
-        if max_turn:
-            for move in chess_state.str_legal_moves():
-                next_board = chess_state.try_move(move)
-                # The value from the recursive call is stored in the 1st index of the tuple
-                values[move] = self.minimax(curr_depth + 1, target_depth, MyChess(next_board), False)[1]
-
-            best_val = max(values.values())
+        # Leaves are scored for the side to move at the leaf, so only an entry searched to exactly this depth holds
+        # a comparable value
+        depth = target_depth - curr_depth
+        if self.tt is not None:
+            key = self.tt_key(chess_state, max_turn)
+            entry = self.tt.probe(key)
+            if curr_depth > 0 and entry is not None and entry[1] == depth:
+                return entry[4], entry[3]
 
-        else: # it is currently the minimizer's turn
-            for move in chess_state.str_legal_moves():
-                next_board = chess_state.try_move(move)
-                values[move] = self.minimax(curr_depth + 1, target_depth, MyChess(next_board), True)[1]
+        values = {}
+        for move in chess_state.legal_moves():
+            chess_state.push(move)
+            # The value from the recursive call is stored in the 1st index of the tuple
+            values[move] = self.minimax(curr_depth + 1, target_depth, chess_state, not max_turn)[1]
+            chess_state.pop()
 
-            best_val = min(values.values())
+        best_val = max(values.values()) if max_turn else min(values.values())
 
         best_moves = [move for (move, value) in values.items() if value == best_val]
+        if self.tt is not None:
+            self.tt.store(key, depth, EXACT, best_val, best_moves[0])
         return (best_moves[0], best_val)
 
 
@@ -73,147 +339,371 @@ class alphaBetaPruningAgent(multiSearchAgent):
     # Gets the next best action, based on the given gamestate (myChess), and whose turn we are selecting an action for
     # Has an optional parameter max_depth to choose a different depth than self.max_depth
     # TODO: Should we add an optional eval_func parameter here? Or just stick with self.eval_func?
-    def get_action(self, chess_state: MyChess, max_depth=None):
-        if max_depth is None:
-            max_depth = self.max_depth
+    # Has an optional parameter limits (a searchLimits.SearchLimits) to search with iterative deepening until a
+    # depth, time or node limit is reached
+    def get_action(self, chess_state: MyChess, max_depth=None, limits=None):
+        max_depth = self.get_max_depth(max_depth, limits)
         self.color = chess_state.get_turn()
-        # The action from this method call is stored in the 0th index of the tuple
-        return self.alpha_beta_minimax(0, max_depth, chess_state, True, float('-inf'), float('inf'))[0]
+        search_state = self.begin_search(chess_state)
+        return self.iterative_deepening(max_depth, limits, lambda depth: self.alpha_beta_minimax(
+            0, depth, search_state, True, float('-inf'), float('inf'))).uci()
+
+    def search_node(self, curr_depth, target_depth, chess_state, max_turn, alpha, beta):
+        return self.alpha_beta_minimax(curr_depth, target_depth, chess_state, max_turn, alpha, beta)
 
     # Performs alpha-beta minimax on the given chess state. Returns a tuple of (move, value)
     def alpha_beta_minimax(self, curr_depth, target_depth, chess_state, max_turn, alpha, beta):
-        if curr_depth >= target_depth or chess_state.is_game_over():
+        self.count_node(curr_depth)
+        if curr_depth >= target_depth or chess_state.node_status().game_over:
+            self.count_eval()
             return None, self.eval_func(chess_state, self.color)
 
+        # The endgame bitbases settle the node without searching below it (except at the root, which needs a move)
+        if curr_depth > 0:
+            bitbase_val = self.probe_bitbases(chess_state)
+            if bitbase_val is not None:
+                return None, bitbase_val
+
+        depth = target_depth - curr_depth
+        tt_move = None
+        if self.tt is not None:
+            key = self.tt_key(chess_state, max_turn)
+            tt_move, tt_val = self.probe_tt(key, depth, alpha, beta)
+            # Never cut off the root, so that a move is always returned
+            if tt_val is not None and curr_depth > 0:
+                return tt_move, tt_val
+        orig_alpha, orig_beta = alpha, beta
+
+        if self.batch_frontier and depth == 1 and curr_depth > 0:
+            best_move, best_val = self.frontier_minimax(chess_state, max_turn, curr_depth)
+            if self.tt is not None:
+                self.store_tt(key, depth, orig_alpha, orig_beta, best_move, best_val)
+            return (best_move, best_val)
+
         values = {}
 
         if max_turn:
-            for move in chess_state.str_legal_moves():
-                next_board = chess_state.try_move(move)
+            for (index, move) in enumerate(self.ordered_moves(chess_state, curr_depth, tt_move)):
+                chess_state.push(move)
                 # The value from the recursive call is stored in the 1st index of the tuple
-                values[move] = self.alpha_beta_minimax(curr_depth + 1, target_depth, MyChess(next_board), False, alpha, beta)[1]
+                values[move] = self.alpha_beta_minimax(curr_depth + 1, target_depth, chess_state, False, alpha, beta)[1]
+                chess_state.pop()
                 alpha = max(alpha, values[move])
                 if beta <= alpha:
+                    self.orderer.record_cutoff(chess_state.board, move, curr_depth, depth, index)
                     break
 
             best_val = max(values.values())
 
         else:  # it is currently the minimizer's turn
-            for move in chess_state.str_legal_moves():
-                next_board = chess_state.try_move(move)
-                values[move] = self.alpha_beta_minimax(curr_depth + 1, target_depth, MyChess(next_board), True, alpha, beta)[1]
+            for (index, move) in enumerate(self.ordered_moves(chess_state, curr_depth, tt_move)):
+                chess_state.push(move)
+                values[move] = self.alpha_beta_minimax(curr_depth + 1, target_depth, chess_state, True, alpha, beta)[1]
+                chess_state.pop()
                 beta = min(beta, values[move])
                 if beta <= alpha:
+                    self.orderer.record_cutoff(chess_state.board, move, curr_depth, depth, index)
                     break
 
             best_val = min(values.values())
 
         best_moves = [move for (move, value) in values.items() if value == best_val]
+        if curr_depth == 0:
+            self.root_values = values
+        if self.tt is not None:
+            self.store_tt(key, depth, orig_alpha, orig_beta, best_moves[0], best_val)
         return (best_moves[0], best_val)
 
-class quietSearch(multiSearchAgent):
-
-    def isCaptureMove(self, chess_state, move):
-        return chess_state.board.piece_at(move.to_square) is not None
-
-    #all the moves to capture a piece
-    def getCaptureMoves(self, chess_state):
-        legalMoves = chess_state.str_legal_moves()
-        captureMoves = []
-
-        for move in legalMoves:
-            chessMove = chess.Move.from_uci(move)
-            if self.isCaptureMove(chess_state, chessMove):
-                captureMoves.append(move)
-
-        if captureMoves == []:
-            return None
-        return captureMoves
-
-    def get_action(self, chess_state: MyChess, max_depth=None):
-        if max_depth is None:
-            max_depth = self.max_depth
+class principalVariationAgent(alphaBetaPruningAgent):
+    # The half-width of the aspiration window placed around an earlier iteration's score at the root
+    ASPIRATION_WINDOW = 100
+
+    # Gets the next best action, based on the given gamestate (myChess)
+    # Always searches with iterative deepening (to max_depth, or to the given searchLimits.SearchLimits), since each
+    # iteration's root window is placed around the previous iteration's score
+    def get_action(self, chess_state: MyChess, max_depth=None, limits=None):
+        max_depth = self.get_max_depth(max_depth, limits)
+        if limits is None:
+            limits = SearchLimits(depth=max_depth)
         self.color = chess_state.get_turn()
-        num_pieces = chess_state.get_num_pieces(self.color)
-        if num_pieces <= 4:
-            max_depth = 4
-        # The action from this method call is stored in the 0th index of the tuple
-        return self.alpha_beta_minimax(0, max_depth, chess_state, True, float('-inf'), float('inf'))[0]
-
-    # Performs alpha-beta minimax on the given chess state. Returns a tuple of (move, value)
-    def qSearch(self, curr_depth, max_depth, chess_state, max_turn, alpha, beta):
-        capture_moves = self.getCaptureMoves(chess_state)
-        if chess_state.is_game_over() or capture_moves is None or curr_depth == max_depth:
+        search_state = self.begin_search(chess_state)
+        return self.iterative_deepening(
+            max_depth, limits, lambda depth: self.aspiration_search(search_state, depth)).uci()
+
+    def search_node(self, curr_depth, target_depth, chess_state, max_turn, alpha, beta):
+        return self.principal_variation_search(curr_depth, target_depth, chess_state, max_turn, alpha, beta)
+
+    # Searches the root to the given depth with an aspiration window around an earlier iteration's score, widening
+    # the failing side of the window and searching again until the score falls inside it. Returns a tuple of
+    # (move, value)
+    def aspiration_search(self, chess_state, depth):
+        if not self.iterations:
+            return self.principal_variation_search(0, depth, chess_state, True, float('-inf'), float('inf'))
+
+        # Without a quiescence search, scores swing between odd and even depths (whoever moved last is up a
+        # capture), so the window is centered on the last iteration of the same parity when there is one
+        previous_value = self.iterations[-2][2] if len(self.iterations) >= 2 else self.iterations[-1][2]
+        low_window = high_window = self.ASPIRATION_WINDOW
+        while True:
+            alpha, beta = previous_value - low_window, previous_value + high_window
+            move, value = self.principal_variation_search(0, depth, chess_state, True, alpha, beta)
+            if value <= alpha:
+                low_window = float('inf') if low_window * 4 > evaluation.CHECKMATEVAL else low_window * 4
+            elif value >= beta:
+                high_window = float('inf') if high_window * 4 > evaluation.CHECKMATEVAL else high_window * 4
+            else:
+                return move, value
+
+    # Performs principal variation search on the given chess state: the first move of each node is searched with
+    # the full (alpha, beta) window, and the rest with a null window that only proves whether they are worse than
+    # the best move so far. A move that turns out better is searched again with the full window.
+    # Returns a tuple of (move, value)
+    def principal_variation_search(self, curr_depth, target_depth, chess_state, max_turn, alpha, beta):
+        self.count_node(curr_depth)
+        if curr_depth >= target_depth or chess_state.node_status().game_over:
+            self.count_eval()
             return None, self.eval_func(chess_state, self.color)
 
+        # The endgame bitbases settle the node without searching below it (except at the root, which needs a move)
+        if curr_depth > 0:
+            bitbase_val = self.probe_bitbases(chess_state)
+            if bitbase_val is not None:
+                return None, bitbase_val
+
+        depth = target_depth - curr_depth
+        tt_move = None
+        if self.tt is not None:
+            key = self.tt_key(chess_state, max_turn)
+            tt_move, tt_val = self.probe_tt(key, depth, alpha, beta)
+            # Never cut off the root, so that a move is always returned
+            if tt_val is not None and curr_depth > 0:
+                return tt_move, tt_val
+        orig_alpha, orig_beta = alpha, beta
+
         values = {}
 
         if max_turn:
-            for move in capture_moves:
-                next_board = chess_state.try_move(move)
-                # The value from the recursive call is stored in the 1st index of the tuple
-                values[move] = \
-                self.qSearch(curr_depth + 1, max_depth, MyChess(next_board), False, alpha, beta)[1]
-                alpha = max(alpha, values[move])
+            for (index, move) in enumerate(self.ordered_moves(chess_state, curr_depth, tt_move)):
+                chess_state.push(move)
+                if index == 0:
+                    value = self.principal_variation_search(
+                        curr_depth + 1, target_depth, chess_state, False, alpha, beta)[1]
+                else:
+                    value = self.principal_variation_search(
+                        curr_depth + 1, target_depth, chess_state, False, alpha, alpha + 1)[1]
+                    if alpha < value < beta:
+                        value = self.principal_variation_search(
+                            curr_depth + 1, target_depth, chess_state, False, alpha, beta)[1]
+                chess_state.pop()
+                values[move] = value
+                alpha = max(alpha, value)
                 if beta <= alpha:
+                    self.orderer.record_cutoff(chess_state.board, move, curr_depth, depth, index)
                     break
 
             best_val = max(values.values())
 
         else:  # it is currently the minimizer's turn
-            for move in capture_moves:
-                next_board = chess_state.try_move(move)
-                values[move] = \
-                self.qSearch(curr_depth + 1, max_depth, MyChess(next_board), True, alpha, beta)[1]
-                beta = min(beta, values[move])
+            for (index, move) in enumerate(self.ordered_moves(chess_state, curr_depth, tt_move)):
+                chess_state.push(move)
+                if index == 0:
+                    value = self.principal_variation_search(
+                        curr_depth + 1, target_depth, chess_state, True, alpha, beta)[1]
+                else:
+                    value = self.principal_variation_search(
+                        curr_depth + 1, target_depth, chess_state, True, beta - 1, beta)[1]
+                    if alpha < value < beta:
+                        value = self.principal_variation_search(
+                            curr_depth + 1, target_depth, chess_state, True, alpha, beta)[1]
+                chess_state.pop()
+                values[move] = value
+                beta = min(beta, value)
                 if beta <= alpha:
+                    self.orderer.record_cutoff(chess_state.board, move, curr_depth, depth, index)
                     break
 
             best_val = min(values.values())
 
         best_moves = [move for (move, value) in values.items() if value == best_val]
-
+        if curr_depth == 0:
+            self.root_values = values
+        if self.tt is not None:
+            self.store_tt(key, depth, orig_alpha, orig_beta, best_moves[0], best_val)
         return (best_moves[0], best_val)
 
+class quietSearch(multiSearchAgent):
+
+    def isCaptureMove(self, chess_state, move):
+        return chess_state.board.is_capture(move)
+
+    # The moves a quiescence search looks at from the given state: captures (including en passant) and queen
+    # promotions, or every legal move when the side to move is in check
+    def getCaptureMoves(self, chess_state):
+        board = chess_state.board
+        if chess_state.node_status().in_check:
+            return chess_state.legal_moves()
+        moves = list(board.generate_legal_captures())
+        pawns = board.pawns & board.occupied_co[board.turn]
+        moves.extend(move for move in board.generate_legal_moves(pawns, chess.BB_BACKRANKS & ~board.occupied)
+                     if move.promotion == chess.QUEEN)
+        return moves
+
+    # Has an optional parameter limits (a searchLimits.SearchLimits) to search with iterative deepening until a
+    # depth, time or node limit is reached
+    def get_action(self, chess_state: MyChess, max_depth=None, limits=None):
+        max_depth = self.adjust_depth(chess_state, self.get_max_depth(max_depth, limits))
+        self.color = chess_state.get_turn()
+        search_state = self.begin_search(chess_state)
+        return self.iterative_deepening(max_depth, limits, lambda depth: self.alpha_beta_minimax(
+            0, depth, search_state, True, float('-inf'), float('inf'))).uci()
+
+    # Searches at least 4 plies deep when the side to move has 4 pieces or fewer (other than pawns)
+    def adjust_depth(self, chess_state: MyChess, max_depth):
+        if chess_state.get_num_pieces(chess_state.get_turn()) <= 4:
+            return max(max_depth, 4)
+        return max_depth
+
+    def search_node(self, curr_depth, target_depth, chess_state, max_turn, alpha, beta):
+        return self.alpha_beta_minimax(curr_depth, target_depth, chess_state, max_turn, alpha, beta)
+
+    # As alpha_beta_minimax does, a capture is followed by a quiescence search instead of a full-width one
+    def search_move(self, curr_depth, target_depth, chess_state, max_turn, move, alpha, beta):
+        is_capture = self.isCaptureMove(chess_state, move)
+        chess_state.push(move)
+        if is_capture:
+            value = self.qSearch(curr_depth + 1, chess_state, not max_turn, alpha, beta)[1]
+        else:
+            value = self.alpha_beta_minimax(curr_depth + 1, target_depth, chess_state, not max_turn, alpha, beta)[1]
+        chess_state.pop()
+        return value
+
+    # Performs a quiescence search on the given chess state: only captures and promotions are searched (every move when
+    # in check), until the position is quiet. The side to move may instead stand pat on the static evaluation, which
+    # bounds the node's value, so captures that lose material in the exchange (see staticExchange) and captures that
+    # can't bring the score near alpha (or beta) are skipped (delta pruning). Returns a tuple of (move, value), where
+    # move is None if standing pat was best.
+    def qSearch(self, curr_depth, chess_state, max_turn, alpha, beta):
+        self.count_node(curr_depth, qsearch=True)
+        board = chess_state.board
+        in_check = chess_state.node_status().in_check
+
+        best_move = None
+        if in_check:
+            best_val = float('-inf') if max_turn else float('inf')
+        else:
+            self.count_eval()
+            best_val = stand_pat = self.eval_func(chess_state, self.color)
+            if max_turn:
+                if stand_pat >= beta:
+                    return None, stand_pat
+                alpha = max(alpha, stand_pat)
+            else:
+                if stand_pat <= alpha:
+                    return None, stand_pat
+                beta = min(beta, stand_pat)
+
+        capture_moves = self.getCaptureMoves(chess_state)
+        if not capture_moves:
+            if in_check:
+                # Checkmate
+                self.count_eval()
+                return None, self.eval_func(chess_state, self.color)
+            return None, best_val
+        capture_moves = self.orderer.order(board, capture_moves, curr_depth)
+        piece_values = evaluation.getPieceValues(self.eval_func)
+        margin = DELTA_MARGIN * piece_values[chess.PAWN]
+
+        for (index, move) in enumerate(capture_moves):
+            if not in_check and is_losing_capture(board, move):
+                continue
+            if not in_check and not move.promotion:
+                victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+                gain = piece_values[victim] + margin
+                if (max_turn and stand_pat + gain <= alpha) or (not max_turn and stand_pat - gain >= beta):
+                    continue
+
+            chess_state.push(move)
+            value = self.qSearch(curr_depth + 1, chess_state, not max_turn, alpha, beta)[1]
+            chess_state.pop()
+            if (max_turn and value > best_val) or (not max_turn and value < best_val):
+                best_move, best_val = move, value
+            if max_turn:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if beta <= alpha:
+                self.orderer.record_cutoff(board, move, curr_depth, 0, index)
+                return best_move, best_val
+
+        return best_move, best_val
+
 
 
     # Performs alpha-beta minimax on the given chess state. Returns a tuple of (move, value)
     def alpha_beta_minimax(self, curr_depth, target_depth, chess_state, max_turn, alpha, beta):
-        if curr_depth >= target_depth or chess_state.is_game_over():
+        self.count_node(curr_depth)
+        if curr_depth >= target_depth or chess_state.node_status().game_over:
+            self.count_eval()
             return None, self.eval_func(chess_state, self.color)
 
+        # The endgame bitbases settle the node without searching below it (except at the root, which needs a move)
+        if curr_depth > 0:
+            bitbase_val = self.probe_bitbases(chess_state)
+            if bitbase_val is not None:
+                return None, bitbase_val
+
+        depth = target_depth - curr_depth
+        tt_move = None
+        if self.tt is not None:
+            key = self.tt_key(chess_state, max_turn)
+            tt_move, tt_val = self.probe_tt(key, depth, alpha, beta)
+            # Never cut off the root, so that a move is always returned
+            if tt_val is not None and curr_depth > 0:
+                return tt_move, tt_val
+        orig_alpha, orig_beta = alpha, beta
+
         values = {}
 
         if max_turn:
-            for move in chess_state.str_legal_moves():
-                next_board = chess_state.try_move(move)
-                if chess_state.board.piece_at(chess.Move.from_uci(move).to_square) is not None:
-                    values[move] = self.qSearch(curr_depth + 1, 10, MyChess(next_board), False, alpha, beta)[1]
+            for (index, move) in enumerate(self.ordered_moves(chess_state, curr_depth, tt_move)):
+                is_capture = self.isCaptureMove(chess_state, move)
+                chess_state.push(move)
+                if is_capture:
+                    values[move] = self.qSearch(curr_depth + 1, chess_state, False, alpha, beta)[1]
                 else:
                 # The value from the recursive call is stored in the 1st index of the tuple
-                    values[move] = self.alpha_beta_minimax(curr_depth + 1, target_depth, MyChess(next_board),
+                    values[move] = self.alpha_beta_minimax(curr_depth + 1, target_depth, chess_state,
                                                            False, alpha, beta)[1]
+                chess_state.pop()
                 alpha = max(alpha, values[move])
                 if beta <= alpha:
+                    self.orderer.record_cutoff(chess_state.board, move, curr_depth, depth, index)
                     break
 
             best_val = max(values.values())
 
         else:  # it is currently the minimizer's turn
-            for move in chess_state.str_legal_moves():
-                next_board = chess_state.try_move(move)
-                if chess_state.board.piece_at(chess.Move.from_uci(move).to_square) is not None:
-                    values[move] = self.qSearch(curr_depth + 1, 10, MyChess(next_board), True, alpha, beta)[1]
+            for (index, move) in enumerate(self.ordered_moves(chess_state, curr_depth, tt_move)):
+                is_capture = self.isCaptureMove(chess_state, move)
+                chess_state.push(move)
+                if is_capture:
+                    values[move] = self.qSearch(curr_depth + 1, chess_state, True, alpha, beta)[1]
                 else:
-                    values[move] = self.alpha_beta_minimax(curr_depth + 1, target_depth, MyChess(next_board),
+                    values[move] = self.alpha_beta_minimax(curr_depth + 1, target_depth, chess_state,
                                                            True, alpha, beta)[1]
+                chess_state.pop()
                 beta = min(beta, values[move])
                 if beta <= alpha:
+                    self.orderer.record_cutoff(chess_state.board, move, curr_depth, depth, index)
                     break
 
             best_val = min(list(values.values()))
 
         best_moves = [move for (move, value) in values.items() if value == best_val]
+        if curr_depth == 0:
+            self.root_values = values
+        if self.tt is not None:
+            self.store_tt(key, depth, orig_alpha, orig_beta, best_moves[0], best_val)
         return (best_moves[0], best_val)
 
 
@@ -225,94 +715,128 @@ class quietSearch(multiSearchAgent):
 
 class nullMoveAlphaBetaAgent(alphaBetaPruningAgent):
 
-    def get_action(self, chess_state: MyChess, max_depth=None):
-        if max_depth is None:
-            max_depth = self.max_depth
+    # Has an optional parameter limits (a searchLimits.SearchLimits) to search with iterative deepening until a
+    # depth, time or node limit is reached
+    def get_action(self, chess_state: MyChess, max_depth=None, limits=None):
+        max_depth = self.adjust_depth(chess_state, self.get_max_depth(max_depth, limits))
         self.color = chess_state.get_turn()
-        num_pieces = chess_state.get_num_pieces(self.color)
-        if num_pieces <= 4:
-            max_depth += 2
-        # The action from this method call is stored in the 0th index of the tuple
-        return self.alpha_beta_minimax(0, max_depth, chess_state, True, float('-inf'), float('inf'))[0]
+        search_state = self.begin_search(chess_state)
+        return self.iterative_deepening(max_depth, limits, lambda depth: self.alpha_beta_minimax(
+            0, depth, search_state, True, float('-inf'), float('inf'))).uci()
+
+    # Searches 2 plies deeper when the side to move has 4 pieces or fewer (other than pawns)
+    def adjust_depth(self, chess_state: MyChess, max_depth):
+        if chess_state.get_num_pieces(chess_state.get_turn()) <= 4:
+            return max_depth + 2
+        return max_depth
 
     # Performs alpha-beta minimax with a null heuristic on a chess state. Returns a single move
     def alpha_beta_minimax(self, curr_depth, target_depth, chess_state, max_turn, alpha, beta):
         return self.ab_null_heuristic_minimax(curr_depth, target_depth, chess_state, max_turn, alpha, beta, False)
 
-    # Performs alpha-beta minimax with a null heuristic on a chess state. Returns a tuple in the form of
-    # ((move, value), cutoff), where cutoff is a boolean that indicates if the condition beta <= alpha
-    # was ever reached.
+    # Performs alpha-beta minimax with null-move pruning on a chess state. Returns a tuple (move, value), where move
+    # is None at the leaves and at nodes cut off by a null move. last_move_was_null is True right after a null move
+    # (and while verifying one), so that the side to move never passes twice in a row.
     def ab_null_heuristic_minimax(
             self, curr_depth, target_depth, chess_state, max_turn, alpha, beta, last_move_was_null):
-        if curr_depth >= target_depth or chess_state.is_game_over():
-            return ((None, self.eval_func(chess_state, self.color)), False)
-
-
-        # Check for zugzwang. In other words, perform a shallow null-move alpha-beta search
-        # if and only if all of the conditions below are true:
-        #  - The side to move is not in check
-        #  - The side to move has only its king and pawns remaining
-        #  - The side to move has a small number (defined here as less than 5) pieces remaining
-        #  - The previous move in the search was also a null move
-        if not last_move_was_null and not self.is_zugzwang(chess_state):
-            move, val = self.ab_null_heuristic_minimax(
-                curr_depth + 1, target_depth // 2, chess_state, not max_turn, alpha, beta, True)
-            if beta <= val:
-                return (move, val)
+        self.count_node(curr_depth)
+        if curr_depth >= target_depth or chess_state.node_status().game_over:
+            self.count_eval()
+            return None, self.eval_func(chess_state, self.color)
+
+        # The endgame bitbases settle the node without searching below it (except at the root, which needs a move)
+        if curr_depth > 0:
+            bitbase_val = self.probe_bitbases(chess_state)
+            if bitbase_val is not None:
+                return None, bitbase_val
+
+        depth = target_depth - curr_depth
+        tt_move = None
+        if self.tt is not None:
+            key = self.tt_key(chess_state, max_turn)
+            tt_move, tt_val = self.probe_tt(key, depth, alpha, beta)
+            # Never cut off the root, so that a move is always returned
+            if tt_val is not None and curr_depth > 0:
+                return tt_move, tt_val
+        orig_alpha, orig_beta = alpha, beta
+
+        # Null-move pruning: let the side to move pass, and search the opponent's reply to a reduced depth with a null
+        # window around the bound the side to move is trying to pass (beta for the maximizer, alpha for the minimizer).
+        # If passing is already enough to pass it, a real move almost surely is too, and the node is cut off.
+        # It is skipped at the root, right after another null move, with an infinite bound, and near zugzwang (see
+        # is_zugzwang), where passing would be better than any real move.
+        bound = beta if max_turn else alpha
+        if curr_depth > 0 and depth >= NULL_MOVE_MIN_DEPTH and not last_move_was_null and \
+                abs(bound) != float('inf') and not self.is_zugzwang(chess_state):
+            reduction = NULL_MOVE_DEEP_REDUCTION if depth >= NULL_MOVE_DEEP_DEPTH else NULL_MOVE_REDUCTION
+            chess_state.push(chess.Move.null())
+            if max_turn:
+                val = self.ab_null_heuristic_minimax(
+                    curr_depth + 1, target_depth - reduction, chess_state, False, beta - 1, beta, True)[1]
+            else:
+                val = self.ab_null_heuristic_minimax(
+                    curr_depth + 1, target_depth - reduction, chess_state, True, alpha, alpha + 1, True)[1]
+            chess_state.pop()
+            cutoff = val >= beta if max_turn else val <= alpha
+
+            # With few pieces left, zugzwang is likelier, so the cutoff is only trusted if a real search of the node
+            # to the same reduced depth (with no null move at the node itself) also passes the bound
+            if cutoff and self.zugzwang_helper(chess_state):
+                val = self.ab_null_heuristic_minimax(
+                    curr_depth, target_depth - reduction, chess_state, max_turn, alpha, beta, True)[1]
+                cutoff = val >= beta if max_turn else val <= alpha
+
+            # The bound is returned rather than val, which may be a mate score the null move doesn't prove
+            if cutoff:
+                if self.tt is not None:
+                    self.store_tt(key, depth, orig_alpha, orig_beta, None, bound)
+                return None, bound
 
         values = {}
 
         if max_turn:
-            for move in chess_state.str_legal_moves():
-                next_board = chess_state.try_move(move)
+            for (index, move) in enumerate(self.ordered_moves(chess_state, curr_depth, tt_move)):
+                chess_state.push(move)
                 # The value from the recursive call is stored in the 1st index of the tuple
                 values[move] = self.ab_null_heuristic_minimax(
-                    curr_depth + 1, target_depth, MyChess(next_board), False, alpha, beta, False)[1]
+                    curr_depth + 1, target_depth, chess_state, False, alpha, beta, False)[1]
+                chess_state.pop()
                 alpha = max(alpha, values[move])
                 if beta <= alpha:
+                    self.orderer.record_cutoff(chess_state.board, move, curr_depth, depth, index)
                     break
 
             best_val = max(values.values())
 
         else:  # it is currently the minimizer's turn
-            for move in chess_state.str_legal_moves():
-                next_board = chess_state.try_move(move)
+            for (index, move) in enumerate(self.ordered_moves(chess_state, curr_depth, tt_move)):
+                chess_state.push(move)
                 values[move] = self.ab_null_heuristic_minimax(
-                    curr_depth + 1, target_depth, MyChess(next_board), True, alpha, beta, False)[1]
+                    curr_depth + 1, target_depth, chess_state, True, alpha, beta, False)[1]
+                chess_state.pop()
                 beta = min(beta, values[move])
                 if beta <= alpha:
+                    self.orderer.record_cutoff(chess_state.board, move, curr_depth, depth, index)
                     break
 
             best_val = min(values.values())
 
         best_moves = [move for (move, value) in values.items() if value == best_val]
+        if curr_depth == 0:
+            self.root_values = values
+        if self.tt is not None:
+            self.store_tt(key, depth, orig_alpha, orig_beta, best_moves[0], best_val)
         return (best_moves[0], best_val)
 
-    # Check for zugzwang. In other words, check if any one of the conditions below are true:
-    #  - The side to move is not in check
-    #  - The side to move has only its king and pawns remaining
-    #  - The side to move has a small number (defined here as less than 5) pieces remaining
-    #  - The previous move in the search was also a null move
+    # Checks if a null move is unsafe at the node, i.e. if either of the conditions below is true:
+    #  - The side to move is in check (passing would be illegal)
+    #  - The side to move has only its king and pawns remaining (zugzwang is common)
     def is_zugzwang(self, chess_state):
-        return chess_state.in_check() or self.zugzwang_helper(chess_state)
+        return chess_state.node_status().in_check or chess_state.non_pawn_material(chess_state.get_turn()) == 0
 
     # Checks if the side to move has only its king and pawns remaining, or if the side to move has less than
-    # 5 pieces remaining
+    # 5 pieces remaining (counting the king and pawns)
     def zugzwang_helper(self, chess_state):
-        piece_list = chess_state.get_piece_list()
         turn = chess_state.get_turn()
-        total_pieces = 0
-        only_king_and_pawns = True
-
-        for (piece, _) in piece_list:
-            if turn and piece.isupper():
-                if piece != "K" and piece != "P":
-                    only_king_and_pawns = False
-                total_pieces += 1
-
-            elif turn and piece.islower():
-                if piece != "k" and piece != "p":
-                    only_king_and_pawns = False
-                total_pieces += 1
-
-        return only_king_and_pawns or total_pieces < 5
+        return chess_state.non_pawn_material(turn) == 0 or \
+            chess.popcount(chess_state.board.occupied_co[turn]) < ZUGZWANG_PIECES
@@ -0,0 +1,91 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# searchLimits.py
+
+from time import perf_counter
+
+# The deepest iteration a search runs when only time or node limits are given
+MAX_SEARCH_DEPTH = 64
+
+# How many nodes are searched between checks of the clock
+TIME_CHECK_INTERVAL = 256
+
+
+# Raised inside a search when its limits have been exceeded, to unwind back to get_action
+class SearchTimeout(Exception):
+    pass
+
+
+# A flag that tells a search to stop, set from any thread with stop. Searches check it at every node (see
+# multiSearchAgent.count_node), and any number of SearchLimits can share one token, so that a single stop ends all of
+# their searches.
+class StopToken():
+    def __init__(self):
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+# Limits on a single get_action call. Any combination may be given; the search stops at whichever is reached first.
+#  - depth: the deepest iteration to search
+#  - movetime: the hard time limit in seconds; a running iteration is abandoned once it passes
+#  - nodes: the maximum number of nodes to search
+#  - soft_time: the soft time limit in seconds (defaults to movetime); no new iteration is started after it passes,
+#    since the next iteration would most likely not finish before the hard limit anyway
+# A search can also be ended early from another thread with stop, or with its stop_token (a StopToken, new if not
+# given); it then returns the best move it has found so far.
+class SearchLimits():
+    def __init__(self, depth=None, movetime=None, nodes=None, soft_time=None, stop_token=None):
+        if soft_time is None:
+            soft_time = movetime
+        elif movetime is not None and soft_time > movetime:
+            raise ValueError("soft_time ({}) must not be greater than movetime ({})".format(soft_time, movetime))
+
+        self.depth = depth
+        self.movetime = movetime
+        self.nodes = nodes
+        self.soft_time = soft_time
+        self.start_time = None
+        self.stop_token = stop_token if stop_token is not None else StopToken()
+
+    # Returns new limits with the same bounds as these, and the given stop token (or a new one)
+    def copy(self, stop_token=None):
+        return SearchLimits(self.depth, self.movetime, self.nodes, self.soft_time, stop_token)
+
+    # Starts the clock for a new search
+    def start(self):
+        self.start_time = perf_counter()
+
+    # Returns the number of seconds since start was called
+    def elapsed(self):
+        return perf_counter() - self.start_time
+
+    # Returns the deepest iteration to search, given the depth the agent would otherwise search to (or None)
+    def get_max_depth(self, default_depth=None):
+        if self.depth is not None:
+            return self.depth
+        if self.movetime is None and self.nodes is None and default_depth is not None:
+            return default_depth
+        return MAX_SEARCH_DEPTH
+
+    # Makes the search using these limits stop at its next node
+    def stop(self):
+        self.stop_token.stop()
+
+    # Returns if the search must stop now, given the number of nodes it has searched
+    def exceeded(self, nodes):
+        if self.nodes is not None and nodes >= self.nodes:
+            return True
+        if self.movetime is not None and nodes % TIME_CHECK_INTERVAL == 0:
+            return self.elapsed() >= self.movetime
+        return False
+
+    # Returns if a new iteration should be started, given the number of nodes searched so far
+    def can_start_iteration(self, nodes):
+        if self.stop_token.stopped:
+            return False
+        if self.nodes is not None and nodes >= self.nodes:
+            return False
+        if self.soft_time is not None and self.elapsed() >= self.soft_time:
+            return False
+        return True
@@ -0,0 +1,270 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# searchProfiler.py
+
+import chess
+from myChess import MyChess
+import cProfile
+import pstats
+import argparse
+import os
+import sys
+import threading
+from collections import Counter
+from time import perf_counter
+
+# Profiling modes:
+#  - "cprofile": deterministic profiling of every call with cProfile; written as a pstats file
+#  - "sampling": a background thread samples the searching thread's stack every interval seconds; written as collapsed
+#    stacks (one "frame;frame;frame count" line per distinct stack), the input format of flame graph tools
+MODES = ("cprofile", "sampling")
+EXTENSIONS = {"cprofile": ".prof", "sampling": ".collapsed"}
+
+# The seconds between samples in sampling mode. Python only switches threads every sys.getswitchinterval() seconds
+# (5ms by default), so shorter intervals don't give more samples.
+DEFAULT_INTERVAL = 0.005
+
+# The most passes pstatsCategories makes over the call graph to settle the category each function is called within
+CONTEXT_PASSES = 100
+
+# The categories time is attributed to, each with the (file name, function name) pairs that count as entering it.
+# Time is attributed to the first (outermost) category entered on the stack, so e.g. the move generation done by
+# is_game_over counts as is_game_over.
+CATEGORIES = [
+    ("evaluation", [("evaluation.py", None), ("batchEvaluation.py", None), ("endgameBitbases.py", "probe_wdl")]),
+    ("is_game_over", [("myChess.py", "is_game_over"), ("myChess.py", "node_status"), ("__init__.py", "is_game_over"),
+                      ("__init__.py", "outcome"), ("__init__.py", "is_checkmate"), ("__init__.py", "is_stalemate"),
+                      ("compactBoard.py", "is_game_over"), ("compactBoard.py", "is_checkmate"),
+                      ("compactBoard.py", "is_stalemate")]),
+    ("board copying", [("myChess.py", "try_move"), ("myChess.py", "search_copy"), ("__init__.py", "copy"),
+                       ("compactBoard.py", "copy"), ("compactBoard.py", "from_board")]),
+    ("move generation", [("myChess.py", "legal_moves"), ("myChess.py", "str_legal_moves"),
+                         ("myChess.py", "is_move_legal"), ("__init__.py", "generate_legal_moves"),
+                         ("__init__.py", "generate_legal_captures"), ("__init__.py", "is_legal"),
+                         ("__init__.py", "__iter__"), ("__init__.py", "count"),
+                         ("compactBoard.py", "generate_legal_moves"), ("compactBoard.py", "generate_legal_captures")]),
+    ("make/unmake", [("myChess.py", "push"), ("myChess.py", "pop"), ("myChess.py", "execute_move"),
+                     ("__init__.py", "push"), ("__init__.py", "pop"), ("compactBoard.py", "push"),
+                     ("compactBoard.py", "pop")]),
+]
+
+
+# Returns the category of the given code location (file path and function name), or None
+def categorize(filename, function):
+    basename = os.path.basename(filename)
+    for (category, entries) in CATEGORIES:
+        for (entry_file, entry_function) in entries:
+            if basename == entry_file and (entry_function is None or function == entry_function):
+                return category
+    return None
+
+
+# Profiles the calls to get_action it is wrapped around (with "with profiler:"), across any number of moves, in the
+# given mode (one of MODES). The results can be written with save and summarized by category with get_categories.
+class SearchProfiler():
+    def __init__(self, mode="cprofile", interval=DEFAULT_INTERVAL):
+        if mode not in MODES:
+            raise ValueError("{} is not a valid profiling mode (expected one of {})".format(mode, MODES))
+        self.mode = mode
+        self.interval = interval
+        self.profile = cProfile.Profile() if mode == "cprofile" else None
+        # Sampling mode: the count of each collapsed stack, and the sampling thread while one is running
+        self.stacks = Counter()
+        self.sampler = None
+        self.stop_event = None
+        # The number of profiled calls and the total seconds spent in them
+        self.calls = 0
+        self.seconds = 0.0
+        self.start_time = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # Starts profiling the current thread
+    def start(self):
+        self.start_time = perf_counter()
+        if self.mode == "cprofile":
+            self.profile.enable()
+            return
+
+        self.stop_event = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, args=(threading.get_ident(),), daemon=True)
+        self.sampler.start()
+
+    # Stops profiling
+    def stop(self):
+        if self.mode == "cprofile":
+            self.profile.disable()
+        else:
+            self.stop_event.set()
+            self.sampler.join()
+            self.sampler = None
+        self.calls += 1
+        self.seconds += perf_counter() - self.start_time
+
+    # Body of the sampling thread: records the stack of the given thread every self.interval seconds until stopped
+    def sample(self, thread_id):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{}:{}".format(os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    # Writes the profile to the given path (a pstats file in cprofile mode, collapsed stacks in sampling mode)
+    def save(self, path):
+        if self.mode == "cprofile":
+            self.profile.dump_stats(path)
+            return
+        with open(path, "w") as stacks_file:
+            for (stack, count) in sorted(self.stacks.items()):
+                stacks_file.write("{} {}\n".format(stack, count))
+
+    # Returns a dict mapping each category (plus "other") to the seconds attributed to it (exclusive of the other
+    # categories, so they sum to the profiled time)
+    def get_categories(self):
+        if self.mode == "cprofile":
+            return pstatsCategories(pstats.Stats(self.profile))
+        return collapsedCategories(self.stacks, self.interval)
+
+
+# Returns a dict mapping each category (None for none) to the share of the calls of the given function (a pstats
+# (file, line, function) key with the given callers) made within it: the outermost category entered on the stack when
+# it is called, or the function's own category if there is none. cProfile only records the direct callers of a
+# function, so its calls are split between the contexts of its callers (see contexts) by the time spent in each.
+def callContext(function, callers, contexts):
+    own = categorize(function[0], function[2])
+    shares = Counter()
+    for (caller, caller_stats) in callers.items():
+        for (category, share) in contexts.get(caller, {None: 1.0}).items():
+            shares[category if category is not None else own] += caller_stats[3] * share
+    total = sum(shares.values())
+    if not total:
+        return {own: 1.0}
+    return {category: weight / total for (category, weight) in shares.items()}
+
+
+# Returns a dict of the seconds of each category in the given pstats.Stats, as exclusive (self) time: the time spent
+# in each function itself counts toward the outermost category it was called within (see callContext), as in sampling
+# mode, so the categories don't overlap and, with "other", sum to the profile's total time.
+def pstatsCategories(stats):
+    # The call contexts of every function, refined until those of its callers settle (the search functions call
+    # themselves, so there is no order to compute them in)
+    contexts = {}
+    for _ in range(CONTEXT_PASSES):
+        previous = contexts
+        contexts = {function: callContext(function, callers, previous)
+                    for (function, (_, _, _, _, callers)) in stats.stats.items()}
+        if contexts == previous:
+            break
+
+    totals = {category: 0.0 for (category, _) in CATEGORIES}
+    totals["other"] = 0.0
+    for (function, (_, _, self_time, _, _)) in stats.stats.items():
+        for (category, share) in contexts[function].items():
+            totals[category if category is not None else "other"] += self_time * share
+    return totals
+
+
+# Returns a dict of the seconds of each category in the given collapsed stacks (a dict of stack -> sample count),
+# taken every interval seconds. Each sample counts toward the outermost category on its stack, or "other".
+def collapsedCategories(stacks, interval):
+    totals = {category: 0.0 for (category, _) in CATEGORIES}
+    totals["other"] = 0.0
+    for (stack, count) in stacks.items():
+        category = "other"
+        for frame in stack.split(";"):
+            filename, _, function = frame.rpartition(":")
+            frame_category = categorize(filename, function)
+            if frame_category is not None:
+                category = frame_category
+                break
+        totals[category] += count * interval
+    return totals
+
+
+# Returns the collapsed stacks in the given files, merged, as a Counter
+def readCollapsed(paths):
+    stacks = Counter()
+    for path in paths:
+        with open(path) as stacks_file:
+            for line in stacks_file:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                stacks[stack] += int(count)
+    return stacks
+
+
+# Prints the given category times (exclusive, as from pstatsCategories or collapsedCategories) as a table, with each
+# one's share of total (by default, of their sum)
+def printCategories(totals, out=sys.stdout, total=None):
+    total = (total if total is not None else sum(totals.values())) or 1.0
+    out.write("{:<16} {:>10} {:>6}\n".format("category", "self time", "share"))
+    for (category, seconds) in sorted(totals.items(), key=lambda item: -item[1]):
+        out.write("{:<16} {:>9.3f}s {:>6.1%}\n".format(category, seconds, seconds / total))
+
+
+# Prints the category breakdown (and, for pstats files, the top functions) of the given profile files, which must be
+# all pstats (.prof) or all collapsed stacks (.collapsed)
+def report(paths, top=20, interval=DEFAULT_INTERVAL, out=sys.stdout):
+    if all(path.endswith(EXTENSIONS["sampling"]) for path in paths):
+        printCategories(collapsedCategories(readCollapsed(paths), interval), out)
+        return
+    stats = pstats.Stats(*paths, stream=out)
+    printCategories(pstatsCategories(stats), out, stats.total_tt)
+    stats.sort_stats("cumulative").print_stats(top)
+
+
+# Profiles a single get_action call of the given agent class, eval function and depth from the given FEN, and writes
+# it to output (with the mode's extension added if it has none). Returns the profiler.
+def profileMove(fen, agent_class, eval_func, depth, mode="cprofile", output=None, interval=DEFAULT_INTERVAL):
+    chess_state = MyChess(chess.Board(fen))
+    agent = agent_class(chess_state, eval_func, depth)
+    profiler = SearchProfiler(mode, interval)
+    with profiler:
+        agent.get_action(chess_state)
+    if output is not None:
+        profiler.save(output if os.path.splitext(output)[1] else output + EXTENSIONS[mode])
+    return profiler
+
+
+# Usage:
+#   python searchProfiler.py move [fen] [--agent quiet:3] [--mode cprofile|sampling] [-o file]
+#   python searchProfiler.py report file [file ...]
+def main(argv=None):
+    from chessTournament import parse_player
+
+    parser = argparse.ArgumentParser(description="Profiles searches, and summarizes saved profiles")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    move_parser = commands.add_parser("move", help="profile a single move")
+    move_parser.add_argument("fen", nargs="?", default=chess.STARTING_FEN)
+    move_parser.add_argument("--agent", default="alphabeta:3", help="agent[:depth[:eval]], as in chessTournament")
+    move_parser.add_argument("--mode", choices=MODES, default="cprofile")
+    move_parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL)
+    move_parser.add_argument("-o", "--output", default=None, help="file to write the profile to")
+
+    report_parser = commands.add_parser("report", help="summarize saved profiles")
+    report_parser.add_argument("paths", nargs="+")
+    report_parser.add_argument("--top", type=int, default=20, help="functions to list (pstats files only)")
+    report_parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                               help="the sampling interval the collapsed stacks were taken with")
+    args = parser.parse_args(argv)
+
+    if args.command == "move":
+        player = parse_player(args.agent)
+        profiler = profileMove(args.fen, player.agent, player.eval_func, player.depth, args.mode, args.output,
+                               args.interval)
+        print("{} in {:.3f}s".format(args.agent, profiler.seconds))
+        printCategories(profiler.get_categories(), total=profiler.seconds if args.mode == "cprofile" else None)
+    else:
+        report(args.paths, args.top, args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# searchStats.py
+
+from time import perf_counter
+
+
+# Counters of a single get_action call, for an agent to fill in while it searches (see multiSearchAgent.stats).
+# An agent without a SearchStats attached skips all of this bookkeeping.
+# If callback is given, it is called with this object at the end of every search, e.g. to log or export it.
+#  - nodes: nodes visited, in total and at each ply (nodes_per_ply[ply])
+#  - qnodes: the nodes among them that were visited by a quiescence search
+#  - eval_calls: calls to the evaluation function
+#  - beta_cutoffs / first_move_cutoffs: cutoffs, and cutoffs caused by the first move searched at the node
+#  - tt_probes / tt_hits: transposition table lookups, and those that found the position
+#  - iterations: (depth, nodes, seconds) of each completed iteration (seconds since the search started)
+class SearchStats():
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.reset()
+
+    # Clears every counter, for a new search
+    def reset(self):
+        self.nodes = 0
+        self.nodes_per_ply = []
+        self.qnodes = 0
+        self.eval_calls = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.iterations = []
+        self.move = None
+        self.seconds = 0.0
+        self.start_time = perf_counter()
+
+    # Counts a node visited at the given ply
+    def count_node(self, ply, qsearch=False):
+        self.nodes += 1
+        if qsearch:
+            self.qnodes += 1
+        while len(self.nodes_per_ply) <= ply:
+            self.nodes_per_ply.append(0)
+        self.nodes_per_ply[ply] += 1
+
+    # Adds the counters of another SearchStats (e.g. of a search run in another process) to this one's. The
+    # iterations, move and time are left as they are.
+    def merge(self, other):
+        self.nodes += other.nodes
+        while len(self.nodes_per_ply) < len(other.nodes_per_ply):
+            self.nodes_per_ply.append(0)
+        for (ply, nodes) in enumerate(other.nodes_per_ply):
+            self.nodes_per_ply[ply] += nodes
+        self.qnodes += other.qnodes
+        self.eval_calls += other.eval_calls
+        self.beta_cutoffs += other.beta_cutoffs
+        self.first_move_cutoffs += other.first_move_cutoffs
+        self.tt_probes += other.tt_probes
+        self.tt_hits += other.tt_hits
+
+    # Records the end of a search that chose the given move, and calls the callback
+    def finish(self, move):
+        self.move = move
+        self.seconds = perf_counter() - self.start_time
+        if self.callback is not None:
+            self.callback(self)
+
+    # Returns the fraction of cutoffs caused by the first move searched
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    # Returns the fraction of transposition table lookups that found the position
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    # Returns the effective branching factor: the nodes of the last iteration over those of the one before it, or
+    # None with fewer than two iterations
+    def branching_factor(self):
+        if len(self.iterations) < 2:
+            return None
+        last = self.iterations[-1][1] - self.iterations[-2][1]
+        previous = self.iterations[-2][1] - (self.iterations[-3][1] if len(self.iterations) > 2 else 0)
+        return last / previous if previous else None
+
+    # Returns the nodes visited per second
+    def nps(self):
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    # Returns every counter as a dict (e.g. to dump as JSON)
+    def as_dict(self):
+        return {
+            "move": self.move,
+            "nodes": self.nodes,
+            "nodes_per_ply": list(self.nodes_per_ply),
+            "qnodes": self.qnodes,
+            "eval_calls": self.eval_calls,
+            "beta_cutoffs": self.beta_cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate(),
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_hit_rate": self.tt_hit_rate(),
+            "iterations": [list(iteration) for iteration in self.iterations],
+            "branching_factor": self.branching_factor(),
+            "seconds": self.seconds,
+            "nps": self.nps(),
+        }
+
+    def __str__(self):
+        factor = self.branching_factor()
+        return ("{} nodes ({} q) in {:.3f}s ({:.0f} nps), {} evals, {} cutoffs ({:.0%} first move), "
+                "tt {}/{} hits, ebf {}").format(
+            self.nodes, self.qnodes, self.seconds, self.nps(), self.eval_calls, self.beta_cutoffs,
+            self.first_move_cutoff_rate(), self.tt_hits, self.tt_probes,
+            "{:.2f}".format(factor) if factor is not None else "-")
@@ -0,0 +1,129 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# staticExchange.py
+
+import chess
+from evaluation import Values
+import sys
+
+# The value of each piece type (indexed by chess piece type) in an exchange, in centipawns
+SEE_VALUES = [0] + [value.value for value in Values]
+
+# Positions with a known SEE value, as (FEN, UCI move, value); run this file to check see against them
+SEE_POSITIONS = [
+    # The rook wins an undefended pawn
+    ("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "e1e5", 100),
+    # Every piece joins in on e5, and white ends up giving a knight for a pawn
+    ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3e5", -220),
+    # A pawn takes a knight defended by a pawn
+    ("4k3/8/3p4/4n3/3P4/8/8/4K3 w - - 0 1", "d4e5", 220),
+    # The queen takes a pawn defended by a pawn
+    ("4k3/8/3p4/4p3/8/8/8/4QK2 w - - 0 1", "e1e5", -800),
+    # The rook behind the capturing rook (an x-ray) keeps the pawn won after the rooks are traded
+    ("4k3/4r3/8/4p3/8/8/4R3/4R1K1 w - - 0 1", "e2e5", 100),
+    # En passant
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "e5d6", 100),
+    # The king can't recapture on a square the other king defends
+    ("8/8/8/8/8/2k5/3q4/3RK3 w - - 0 1", "d1d2", 900),
+    # A capture that promotes gains the promoted piece too
+    ("1n2k3/P7/8/8/8/8/8/4K3 w - - 0 1", "a7b8q", 1120),
+    # The rook takes a rook on the last rank, and the pawn that recaptures promotes
+    ("4k3/8/8/8/8/8/2p5/3r1RK1 w - - 0 1", "f1d1", -800),
+    # The bishop takes a knight defended by a pawn
+    ("4k3/8/2p5/3n4/8/8/6B1/4K3 w - - 0 1", "g2d5", -10),
+    # Not a capture, and nothing attacks the destination
+    (chess.STARTING_FEN, "e2e4", 0),
+]
+
+
+# Returns the mask of the pieces of both colors attacking the given square, with only the pieces in occupied
+# counted as present (so that sliders behind the pieces already traded off the square are found)
+def attackers(board, square, occupied):
+    rank_file = (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] |
+                 chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+    diagonal = chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    queens = board.queens
+    return occupied & (
+        (chess.BB_KING_ATTACKS[square] & board.kings) |
+        (chess.BB_KNIGHT_ATTACKS[square] & board.knights) |
+        (rank_file & (board.rooks | queens)) |
+        (diagonal & (board.bishops | queens)) |
+        (chess.BB_PAWN_ATTACKS[chess.WHITE][square] & board.pawns & board.occupied_co[chess.BLACK]) |
+        (chess.BB_PAWN_ATTACKS[chess.BLACK][square] & board.pawns & board.occupied_co[chess.WHITE]))
+
+
+# Returns the static exchange evaluation of the given move on the given chess.Board: the net material (in
+# SEE_VALUES) the side to move wins if both sides keep recapturing on the move's destination with their least
+# valuable piece, each stopping as soon as recapturing would lose material. Pins are ignored, a king only
+# recaptures if the other side has no attackers left, and a pawn that captures onto the last rank promotes to a queen.
+def see(board, move):
+    to_square = move.to_square
+    occupied = board.occupied & ~chess.BB_SQUARES[move.from_square]
+    if board.is_en_passant(move):
+        victim = chess.PAWN
+        occupied &= ~chess.BB_SQUARES[to_square + (-8 if board.turn == chess.WHITE else 8)]
+    elif board.is_castling(move):
+        return 0
+    else:
+        victim = board.piece_type_at(to_square)
+
+    # gains[i] is the material won by the side making the i-th capture, if the exchange stopped after it
+    gains = [SEE_VALUES[victim] if victim else 0]
+    on_square = board.piece_type_at(move.from_square)
+    if move.promotion:
+        gains[0] += SEE_VALUES[move.promotion] - SEE_VALUES[chess.PAWN]
+        on_square = move.promotion
+
+    side = not board.turn
+    attacking = attackers(board, to_square, occupied)
+    while True:
+        side_attackers = attacking & board.occupied_co[side]
+        if not side_attackers:
+            break
+        for piece_type in chess.PIECE_TYPES:
+            pieces = side_attackers & board.pieces_mask(piece_type, side)
+            if pieces:
+                break
+        if piece_type == chess.KING and attacking & board.occupied_co[not side]:
+            break
+
+        gain = SEE_VALUES[on_square] - gains[-1]
+        on_square = piece_type
+        if piece_type == chess.PAWN and chess.BB_SQUARES[to_square] & chess.BB_BACKRANKS:
+            gain += SEE_VALUES[chess.QUEEN] - SEE_VALUES[chess.PAWN]
+            on_square = chess.QUEEN
+        gains.append(gain)
+        occupied &= ~(pieces & -pieces)
+        attacking = attackers(board, to_square, occupied)
+        side = not side
+
+    # Either side can stop recapturing when that's better for it
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+    return gains[0]
+
+
+# Returns whether the given capture on the given chess.Board can be losing: only when the capturing piece is worth
+# more than the piece it takes (otherwise the exchange is at worst even) or the capture is on the last rank (where a
+# pawn recapture promotes), and then only if see is negative
+def is_losing_capture(board, move):
+    victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+    attacker = board.piece_type_at(move.from_square)
+    if victim is None or (SEE_VALUES[attacker] <= SEE_VALUES[victim] and
+                          not chess.BB_SQUARES[move.to_square] & chess.BB_BACKRANKS):
+        return False
+    return see(board, move) < 0
+
+
+# Checks see against SEE_POSITIONS, printing a line per position; returns the number of mismatches
+def check_positions(out=sys.stdout):
+    failures = 0
+    for (fen, uci, expected) in SEE_POSITIONS:
+        value = see(chess.Board(fen), chess.Move.from_uci(uci))
+        failures += value != expected
+        out.write("{} {:<6} see {:>5} expected {:>5} {}\n".format("ok  " if value == expected else "FAIL", uci,
+                                                                   value, expected, fen))
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check_positions() else 0)
@@ -0,0 +1,124 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# transpositionTable.py
+
+import chess
+import chess.polyglot
+
+# Bound types for a stored score
+EXACT = 0  # the score is the exact minimax value of the position
+LOWER = 1  # the search failed high, so the true value is at least the score
+UPPER = 2  # the search failed low, so the true value is at most the score
+
+# Approximate memory cost of one slot (the slot pointer plus the entry tuple and its contents). Used to turn a
+# memory cap (in MB) into a number of slots.
+ENTRY_BYTES = 128
+
+# Salts XORed into the Zobrist key, since the agents store scores relative to the color they are searching for
+# and to whether the node is a maximizing node.
+BLACK_KEY_SALT = 0x9D39247E33776D41
+MIN_NODE_KEY_SALT = 0x2AF7398005AAA5C7
+
+
+# Returns the (Polyglot) Zobrist hash of the given board: the board's own zobrist_hash() for boards that keep their
+# hash up to date as moves are made (e.g. compactBoard.CompactBoard), or chess.polyglot.zobrist_hash of a chess.Board
+def zobrist_key(board):
+    zobrist_hash = getattr(board, "zobrist_hash", None)
+    if zobrist_hash is not None:
+        return zobrist_hash()
+    return chess.polyglot.zobrist_hash(board)
+
+
+# A fixed-size, hash-indexed table of previously searched positions.
+# Each slot holds a tuple of (key, depth, bound, score, move, generation), where depth is the remaining search depth
+# the score was computed with, and generation is the search the entry was stored during (see new_search).
+# replacement is one of REPLACEMENT_POLICIES:
+#  - "always": a store always overwrites whatever is in the slot
+#  - "depth": a store only overwrites an entry from an older search, for the same position, or of equal or lesser depth
+class TranspositionTable():
+    REPLACEMENT_POLICIES = ("always", "depth")
+
+    def __init__(self, max_mb=16, replacement="depth"):
+        if replacement not in TranspositionTable.REPLACEMENT_POLICIES:
+            raise ValueError("{} is not a valid replacement policy (expected one of {})"
+                             .format(replacement, TranspositionTable.REPLACEMENT_POLICIES))
+        if max_mb <= 0:
+            raise ValueError("max_mb must be positive, got {}".format(max_mb))
+
+        # Round the number of slots down to a power of two so that a slot index is just key & mask
+        num_slots = max(1, int(max_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.size = 1 << (num_slots.bit_length() - 1)
+        self.mask = self.size - 1
+        self.replacement = replacement
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.reset_counters()
+
+    # Resets the hit/store/collision counters (the table contents are kept)
+    def reset_counters(self):
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.rejected = 0
+
+    # Empties the table and resets the counters
+    def clear(self):
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.reset_counters()
+
+    # Marks the start of a new search, so that entries from previous searches are replaced first
+    def new_search(self):
+        self.generation += 1
+
+    # Returns the entry stored for the given key, or None if there is none
+    def probe(self, key):
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is None:
+            return None
+        if entry[0] != key:
+            # The slot is taken by a different position
+            self.collisions += 1
+            return None
+        self.hits += 1
+        return entry
+
+    # Stores a search result for the given key, subject to the replacement policy
+    def store(self, key, depth, bound, score, move):
+        index = key & self.mask
+        old = self.entries[index]
+
+        if old is not None and old[0] != key:
+            if self.replacement == "depth" and old[5] == self.generation and old[1] > depth:
+                self.rejected += 1
+                return
+            self.overwrites += 1
+
+        # Keep the old best move if the new result doesn't have one
+        if move is None and old is not None and old[0] == key:
+            move = old[4]
+
+        self.entries[index] = (key, depth, bound, score, move, self.generation)
+        self.stores += 1
+
+    # Returns the fraction of slots in use (sampled from the first 1000 slots for large tables)
+    def fill_rate(self):
+        sample = self.entries[:1000]
+        return sum(1 for entry in sample if entry is not None) / len(sample)
+
+    # Returns the table's counters as a dict
+    def get_stats(self):
+        return {
+            "size": self.size,
+            "replacement": self.replacement,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "rejected": self.rejected,
+            "fill_rate": self.fill_rate(),
+        }
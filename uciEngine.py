@@ -0,0 +1,333 @@
+# Authors: Drake Moore, John Lam, Nathan Cheng
+# uciEngine.py
+
+import chess
+from chessTournament import AGENTS, EVAL_FUNCS
+from evaluation import CHECKMATEVAL, getPieceValues
+from moveOrdering import MoveOrderer
+from myChess import MyChess
+from searchLimits import SearchLimits, StopToken, MAX_SEARCH_DEPTH
+from transpositionTable import TranspositionTable
+from threading import Thread, Event, Lock, Timer
+import argparse
+import sys
+
+ENGINE_NAME = "chessBot"
+ENGINE_AUTHOR = "Drake Moore, John Lam, Nathan Cheng"
+
+# Time management for "go wtime/btime": the moves a clock is assumed to last for when the GUI doesn't send movestogo,
+# the seconds kept back per move for communication, and the shortest time a move is searched for
+DEFAULT_MOVES_TO_GO = 30
+MOVE_OVERHEAD = 0.05
+MIN_MOVETIME = 0.01
+
+# The options sent in reply to "uci", as (name, type, default, extra), where extra is the choices of a combo or the
+# (min, max) of a spin
+OPTIONS = [
+    ("Agent", "combo", "quiet", list(AGENTS)),
+    ("Eval", "combo", "add_eval", list(EVAL_FUNCS)),
+    ("Depth", "spin", 4, (1, MAX_SEARCH_DEPTH)),
+    ("Hash", "spin", 16, (1, 4096)),
+    ("Clear Hash", "button", None, None),
+    ("OwnBook", "check", False, None),
+    ("BookFile", "string", "<empty>", None),
+    ("Bitbases", "check", False, None),
+    ("Ponder", "check", False, None),
+]
+
+
+# Returns the SearchLimits for a "go" command's parameters (a dict of its keywords to their values), with the given
+# stop token. wtime/btime/winc/binc/movestogo are turned into a move time for the side to move (turn): a soft limit of
+# its share of the remaining time plus most of the increment, and a hard limit of twice that (but at most half of the
+# remaining time). With "infinite" or "ponder", there is no time limit (see UCIEngine.go).
+def go_limits(params, turn, stop_token):
+    depth = params.get("depth")
+    nodes = params.get("nodes")
+    movetime = params["movetime"] / 1000.0 if "movetime" in params else None
+    soft_time = None
+
+    time_left = params.get("wtime" if turn == chess.WHITE else "btime")
+    if movetime is None and time_left is not None:
+        time_left = max(0.0, time_left / 1000.0 - MOVE_OVERHEAD)
+        increment = params.get("winc" if turn == chess.WHITE else "binc", 0) / 1000.0
+        soft_time = time_left / params.get("movestogo", DEFAULT_MOVES_TO_GO) + 0.8 * increment
+        movetime = max(MIN_MOVETIME, min(soft_time * 2, time_left * 0.5))
+        soft_time = max(MIN_MOVETIME, min(soft_time, movetime))
+    elif movetime is not None:
+        movetime = max(MIN_MOVETIME, movetime - MOVE_OVERHEAD)
+
+    if "infinite" in params or "ponder" in params:
+        return SearchLimits(depth=depth or MAX_SEARCH_DEPTH, nodes=nodes, stop_token=stop_token), movetime
+    return SearchLimits(depth=depth, movetime=movetime, nodes=nodes, soft_time=soft_time,
+                        stop_token=stop_token), None
+
+
+# Parses the arguments of a "go" command (a list of words) into a dict of keyword to value (True for flags)
+def parse_go(words):
+    params = {}
+    index = 0
+    while index < len(words):
+        word = words[index]
+        if word in ("infinite", "ponder"):
+            params[word] = True
+        elif word in ("depth", "nodes", "movetime", "wtime", "btime", "winc", "binc", "movestogo") \
+                and index + 1 < len(words):
+            params[word] = int(words[index + 1])
+            index += 1
+        index += 1
+    return params
+
+
+# Returns the board for a "position" command's arguments (a list of words): "startpos" or "fen <fen>", optionally
+# followed by "moves" and the moves played since
+def parse_position(words):
+    if "moves" in words:
+        moves = words[words.index("moves") + 1:]
+        words = words[:words.index("moves")]
+    else:
+        moves = []
+
+    board = chess.Board() if words[:1] == ["startpos"] else chess.Board(" ".join(words[1:]))
+    for move in moves:
+        board.push_uci(move)
+    return board
+
+
+# A UCI engine around the multiSearchAgent classes. The process (and its agent, transposition table, opening book
+# and bitbases) lives across moves and games, so the caches stay warm; only "setoption" rebuilds them, when the
+# option they depend on changes. Searches run on a worker thread, so "stop", "isready" and "quit" are answered while
+# one is running. Everything is written to out.
+class UCIEngine():
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.output_lock = Lock()
+        self.options = {name: default for (name, _, default, _) in OPTIONS}
+        self.board = chess.Board()
+        self.tt = TranspositionTable(self.options["Hash"])
+        self.book = None
+        self.bitbases = None
+        self.agent = None
+        # The running search: its thread, its stop token, the event that lets an "infinite" or "ponder" search
+        # report its move (set by stop or ponderhit), and the move time a ponder search gets after a ponderhit
+        self.search_thread = None
+        self.stop_token = StopToken()
+        self.release = Event()
+        self.ponder_movetime = None
+
+    # Writes a line to the GUI
+    def send(self, line):
+        with self.output_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    # Returns the agent for the current options, building a new one if they changed since the last search
+    def get_agent(self):
+        agent_class = AGENTS[self.options["Agent"]]
+        eval_func = EVAL_FUNCS[self.options["Eval"]]
+        if self.agent is None or type(self.agent) is not agent_class or self.agent.eval_func is not eval_func:
+            self.agent = agent_class(MyChess(), eval_func, self.options["Depth"], self.tt, bitbases=self.bitbases)
+            self.agent.iteration_callback = self.send_info
+        self.agent.max_depth = self.options["Depth"]
+        return self.agent
+
+    # Handles one line of input. Returns False when the engine should quit.
+    def handle(self, line):
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+
+        if command == "uci":
+            self.send("id name {}".format(ENGINE_NAME))
+            self.send("id author {}".format(ENGINE_AUTHOR))
+            for (name, option_type, default, extra) in OPTIONS:
+                line = "option name {} type {}".format(name, option_type)
+                if option_type == "check":
+                    line += " default {}".format("true" if default else "false")
+                elif option_type in ("spin", "string", "combo"):
+                    line += " default {}".format(default)
+                if option_type == "spin":
+                    line += " min {} max {}".format(*extra)
+                elif option_type == "combo":
+                    line += "".join(" var {}".format(choice) for choice in extra)
+                self.send(line)
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.wait()
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.wait()
+            # The transposition table stays (its entries are keyed by position), but the move ordering's killers and
+            # history only fit the last game
+            if self.agent is not None:
+                self.agent.orderer = MoveOrderer()
+            self.board = chess.Board()
+        elif command == "position":
+            self.wait()
+            self.board = parse_position(args)
+        elif command == "go":
+            self.wait()
+            self.go(parse_go(args))
+        elif command == "stop":
+            self.stop()
+        elif command == "ponderhit":
+            # The GUI played the move pondered on: from now on, the search has the move time of a normal move
+            self.release.set()
+            if self.ponder_movetime is not None:
+                timer = Timer(self.ponder_movetime, self.stop_token.stop)
+                timer.daemon = True
+                timer.start()
+            else:
+                self.stop_token.stop()
+        elif command == "quit":
+            self.wait()
+            return False
+        return True
+
+    # Handles a "setoption name <name> [value <value>]" command (args are the words after "setoption")
+    def set_option(self, args):
+        if "name" not in args:
+            return
+        value_index = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:value_index])
+        value = " ".join(args[value_index + 1:])
+        types = {option_name: option_type for (option_name, option_type, _, _) in OPTIONS}
+        name = next((option for option in types if option.lower() == name.lower()), None)
+        if name is None:
+            return
+
+        if types[name] == "spin":
+            self.options[name] = int(value)
+        elif types[name] == "check":
+            self.options[name] = value.lower() == "true"
+        elif types[name] != "button":
+            self.options[name] = value
+
+        if name == "Hash":
+            self.tt = TranspositionTable(self.options["Hash"])
+            self.agent = None
+        elif name == "Clear Hash":
+            self.tt.clear()
+        elif name in ("OwnBook", "BookFile"):
+            from openingBook import OpeningBook
+            if self.book is not None:
+                self.book.close()
+            path = self.options["BookFile"]
+            self.book = OpeningBook(path) if self.options["OwnBook"] and path not in ("", "<empty>") else None
+        elif name == "Bitbases":
+            from endgameBitbases import EndgameBitbases
+            self.bitbases = EndgameBitbases() if self.options["Bitbases"] else None
+            self.agent = None
+
+    # Starts searching the current position on a worker thread, with the given "go" parameters (see parse_go)
+    def go(self, params):
+        self.stop_token = StopToken()
+        self.release = Event()
+        limits, self.ponder_movetime = go_limits(params, self.board.turn, self.stop_token)
+        # Normal searches report their move as soon as they end; "infinite" and "ponder" ones wait to be released
+        if "infinite" not in params and "ponder" not in params:
+            self.release.set()
+        self.search_thread = Thread(target=self.search, args=(self.board.copy(), limits), daemon=True)
+        self.search_thread.start()
+
+    # Body of the search thread: plays from the book if it can (outside of pondering), and otherwise searches the given
+    # board with the given limits, then reports the move once released
+    def search(self, board, limits):
+        move = None
+        if self.book is not None and self.release.is_set():
+            book_move = self.book.choose_move(board)
+            move = book_move.uci() if book_move is not None else None
+        if move is None and not board.is_game_over():
+            move = self.get_agent().get_action(MyChess(board), limits=limits)
+
+        self.release.wait()
+        if move is None:
+            self.send("bestmove 0000")
+            return
+        line = "bestmove {}".format(move)
+        ponder_move = self.predicted_reply(board, chess.Move.from_uci(move))
+        if ponder_move is not None:
+            line += " ponder {}".format(ponder_move.uci())
+        self.send(line)
+
+    # Writes an "info" line for an iteration of the search (a tuple of (depth, move, value, nodes, seconds), see
+    # multiSearchAgent.iterations)
+    def send_info(self, iteration):
+        depth, move, value, nodes, seconds = iteration
+        board = self.agent.root_state.board
+        pv = self.principal_variation(board, move, depth)
+        if abs(value) >= CHECKMATEVAL:
+            # The agents don't track the distance to mate: it is exact if the PV ends in the mate, and otherwise the
+            # iteration depth bounds it
+            mated = board.copy(stack=False)
+            for pv_move in pv:
+                mated.push(pv_move)
+            plies = len(pv) if mated.is_checkmate() else depth
+            score = "mate {}".format((plies + 1) // 2 if value > 0 else -((plies + 1) // 2))
+        else:
+            pawn = getPieceValues(self.agent.eval_func)[chess.PAWN]
+            score = "cp {}".format(int(round(value * 100.0 / pawn)))
+        self.send("info depth {} score {} nodes {} time {} nps {} pv {}".format(
+            depth, score, nodes, int(seconds * 1000), int(nodes / seconds) if seconds > 0 else 0,
+            " ".join(pv_move.uci() for pv_move in pv)))
+
+    # Returns the principal variation of up to depth moves from the given board, starting with the given move and
+    # continuing with the best moves the transposition table holds for the positions after it
+    def principal_variation(self, board, move, depth):
+        board = board.copy(stack=False)
+        pv = []
+        max_turn = True
+        while move is not None and len(pv) < depth and board.is_legal(move):
+            pv.append(move)
+            board.push(move)
+            max_turn = not max_turn
+            if board.is_repetition(2):
+                break
+            key = self.agent.tt_key(MyChess(board), max_turn)
+            entry = self.tt.entries[key & self.tt.mask]
+            move = entry[4] if entry is not None and entry[0] == key else None
+        return pv
+
+    # Returns the reply the transposition table expects after the given move from the given board, or None
+    def predicted_reply(self, board, move):
+        pv = self.principal_variation(board, move, 2) if self.agent is not None else []
+        return pv[1] if len(pv) > 1 else None
+
+    # Stops the running search, which then reports its best move so far
+    def stop(self):
+        self.stop_token.stop()
+        self.release.set()
+
+    # Stops the running search (if any) and waits for it to report its move
+    def wait(self):
+        if self.search_thread is not None:
+            self.stop()
+            self.search_thread.join()
+            self.search_thread = None
+
+    # Reads commands from the given input until "quit" or the end of the input
+    def run(self, commands=sys.stdin):
+        for line in commands:
+            if not self.handle(line.strip()):
+                break
+        self.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="UCI engine around the search agents")
+    parser.add_argument("--agent", choices=list(AGENTS), default=None, help="initial value of the Agent option")
+    parser.add_argument("--eval", choices=list(EVAL_FUNCS), default=None, help="initial value of the Eval option")
+    parser.add_argument("--depth", type=int, default=None, help="initial value of the Depth option")
+    args = parser.parse_args(argv)
+
+    engine = UCIEngine()
+    for (name, value) in (("Agent", args.agent), ("Eval", args.eval), ("Depth", args.depth)):
+        if value is not None:
+            engine.options[name] = value
+    engine.run()
+
+
+if __name__ == "__main__":
+    main()